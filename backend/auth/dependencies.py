@@ -3,19 +3,21 @@ from typing import Any
 
 from auth.exceptions import EmailTaken, RefreshTokenNotValid
 from auth.schemas import AuthUser, ValidateRefreshTokenResponse
-from auth.service import get_refresh_token, get_user_by_email
+from auth.service import get_refresh_token, user_exists
 from fastapi import Cookie
+from metrics import timed
 
 
 async def valid_user_create(
     user: AuthUser,
 ) -> AuthUser:
-    if await get_user_by_email(user.email):
+    if await user_exists(user.email):
         raise EmailTaken()
 
     return user
 
 
+@timed("auth")
 async def valid_refresh_token(
     refresh_token: str = Cookie(..., alias="refreshToken"),
 ) -> ValidateRefreshTokenResponse:
@@ -4,12 +4,13 @@ from auth.exceptions import InvalidCredentials
 from auth.schemas import AuthUser
 from auth.security import check_password, hash_password
 from auth.utils import calculate_refresh_token_expiry, generate_random_alphanum
-from db import get_db
+from db.repositories import RefreshTokenRepository, UserRepository
 from fastapi import HTTPException
 from logger import logger
+from pymongo.errors import DuplicateKeyError
 
-# Initialize the database connection and logger
-db = get_db()
+users = UserRepository()
+refresh_tokens = RefreshTokenRepository()
 
 
 async def create_user(user_data: AuthUser) -> Dict[str, Any]:
@@ -22,14 +23,19 @@ async def create_user(user_data: AuthUser) -> Dict[str, Any]:
         }
 
         # Check if user already exists
-        existing_user = await get_user_by_email(user_data.email.lower())
-        if existing_user:
+        if await users.exists(user_data.email):
             logger.warning(f"User already exists: {user_data.email}")
             raise HTTPException(status_code=400, detail="User already exists")
 
-        result = await db["users"].insert_one(created_user)
-        created_user["_id"] = result.inserted_id
+        created_user["_id"] = await users.insert(created_user)
         return created_user
+    except HTTPException:
+        raise
+    except DuplicateKeyError as e:
+        # A concurrent registration got past the check; the unique email index
+        # turned this one away
+        logger.warning(f"User already exists: {user_data.email}")
+        raise HTTPException(status_code=400, detail="User already exists") from e
     except Exception as e:
         logger.error(f"Error creating user: {str(e)}")
         raise HTTPException(status_code=500, detail="Internal Server Error") from e
@@ -37,7 +43,7 @@ async def create_user(user_data: AuthUser) -> Dict[str, Any]:
 
 async def authenticate_user(auth_data: AuthUser) -> Dict[str, Any]:
     try:
-        user = await get_user_by_email(auth_data.email.lower())
+        user = await users.get_credentials(auth_data.email)
         if not user or not check_password(auth_data.password, user["password"]):
             logger.warning(f"Invalid credentials for user: {auth_data.email}")
             raise InvalidCredentials()
@@ -61,13 +67,13 @@ async def create_refresh_token(
         "expires_at": calculate_refresh_token_expiry(),
         "user_id": user_id,
     }
-    await db["refresh_tokens"].insert_one(new_refresh_token)
+    await refresh_tokens.insert(new_refresh_token)
     return refresh_token or new_refresh_token["refresh_token"]
 
 
-async def get_user_by_email(email: str) -> Optional[Dict[str, Any]]:
-    return await db["users"].find_one({"email": email.lower()})
+async def user_exists(email: str) -> bool:
+    return await users.exists(email)
 
 
 async def get_refresh_token(refresh_token: str) -> Optional[Dict[str, Any]]:
-    return await db["refresh_tokens"].find_one({"refresh_token": refresh_token})
+    return await refresh_tokens.get(refresh_token)
@@ -0,0 +1,163 @@
+"""
+Search throughput: separate /qdrant/search calls vs /qdrant/search/batch.
+
+Starts the app and the stub OpenAI server with the local stand-ins (see
+`load_test`), uploads the labeled corpus, then runs the same queries three
+ways: one request at a time, `--concurrency` requests in flight, and batches
+of `--batch-size` queries. Reports queries per second and per-request
+latency for each, and checks that batch results match the single-query ones.
+
+Usage (from `backend/`):
+    python -m benchmarks.batch_search --queries 200 --batch-size 50
+"""
+
+import argparse
+import asyncio
+import time
+
+import httpx
+from benchmarks.common import percentiles, write_results
+from benchmarks.corpus import build_corpus
+from benchmarks.load_test import (
+    Recorder,
+    free_port,
+    register_users,
+    spawn,
+    stand_in_env,
+    upload,
+    wait_ready,
+)
+
+
+async def timed_post(
+    client: httpx.AsyncClient, url: str, body: dict, headers: dict, latencies: list
+) -> dict:
+    start = time.perf_counter()
+    response = await client.post(url, json=body, headers=headers)
+    latencies.append(time.perf_counter() - start)
+    response.raise_for_status()
+    return response.json()
+
+
+def summarize(elapsed: float, queries: int, latencies: list[float]) -> dict:
+    return {
+        "seconds": round(elapsed, 3),
+        "queries_per_second": round(queries / elapsed, 2),
+        "requests": len(latencies),
+        "request_latency": percentiles(latencies),
+    }
+
+
+def top_ids(points: list[dict]) -> list:
+    return [point["id"] for point in points]
+
+
+async def run(args: argparse.Namespace, client: httpx.AsyncClient) -> dict:
+    corpus = build_corpus(
+        documents=args.documents, queries=args.queries, seed=args.seed
+    )
+    recorder = Recorder()
+    (user,) = await register_users(client, recorder, 1)
+    for filename, data in corpus.documents.items():
+        await upload(client, recorder, user, filename, data)
+    queries = [query.text for query in corpus.queries]
+    body = {"k": args.k}
+    results: dict = {"queries": len(queries), "k": args.k}
+
+    latencies: list[float] = []
+    start = time.perf_counter()
+    single = [
+        await timed_post(
+            client, "/qdrant/search", {**body, "query": q}, user.headers, latencies
+        )
+        for q in queries
+    ]
+    results["sequential"] = summarize(
+        time.perf_counter() - start, len(queries), latencies
+    )
+
+    latencies = []
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def bounded(query: str) -> dict:
+        async with semaphore:
+            return await timed_post(
+                client,
+                "/qdrant/search",
+                {**body, "query": query},
+                user.headers,
+                latencies,
+            )
+
+    start = time.perf_counter()
+    await asyncio.gather(*(bounded(query) for query in queries))
+    results[f"concurrent_{args.concurrency}"] = summarize(
+        time.perf_counter() - start, len(queries), latencies
+    )
+
+    latencies = []
+    batched: list[list[dict]] = []
+    start = time.perf_counter()
+    for offset in range(0, len(queries), args.batch_size):
+        response = await timed_post(
+            client,
+            "/qdrant/search/batch",
+            {**body, "queries": queries[offset : offset + args.batch_size]},
+            user.headers,
+            latencies,
+        )
+        batched.extend(response["results"])
+    results[f"batch_{args.batch_size}"] = summarize(
+        time.perf_counter() - start, len(queries), latencies
+    )
+    results["batch_matches_single"] = round(
+        sum(
+            top_ids(one["results"]) == top_ids(many)
+            for one, many in zip(single, batched)
+        )
+        / len(queries),
+        4,
+    )
+    return results
+
+
+async def main(args: argparse.Namespace) -> None:
+    openai_port, app_port = free_port(), free_port()
+    env = stand_in_env(openai_port)
+    children = [
+        spawn("openai", openai_port, args, env),
+        spawn("app", app_port, args, env),
+    ]
+    try:
+        await wait_ready(f"http://127.0.0.1:{openai_port}/docs")
+        await wait_ready(f"http://127.0.0.1:{app_port}/health", timeout=120)
+        async with httpx.AsyncClient(
+            base_url=f"http://127.0.0.1:{app_port}",
+            timeout=120,
+            limits=httpx.Limits(max_connections=args.concurrency * 2),
+        ) as client:
+            results = await run(args, client)
+    finally:
+        for child in children:
+            child.terminate()
+        for child in children:
+            child.wait(timeout=10)
+
+    for name, value in results.items():
+        print(name, value)
+    print("Results written to", write_results("batch_search", results, args.output))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--documents", type=int, default=5)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--batch-size", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--embedding-latency-ms", type=float, default=100)
+    parser.add_argument("--chat-latency-ms", type=float, default=800)
+    parser.add_argument("--jitter", type=float, default=0.2, help="+/- fraction")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", default=None)
+    asyncio.run(main(parser.parse_args()))
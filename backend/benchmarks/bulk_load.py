@@ -0,0 +1,103 @@
+"""
+Time until a large ingestion is searchable, with incremental indexing and in bulk-load mode.
+
+Ingests the labeled corpus (see `retrieval`) into a fresh collection twice:
+
+- "incremental": one `document_ingestion` per PDF with indexing on, as
+  uploads always did, then a wait for Qdrant's optimizers to go idle.
+- "bulk": the same PDFs through `ingest_documents`, which switches indexing
+  off until the last one is written and then waits for the index.
+
+Reports ingestion time, indexing wait, total time to searchable, and dense
+query latency and recall@k afterwards. The in-memory Qdrant neither builds an
+HNSW index nor honours the optimizer settings, so only the flow is exercised
+there; pass `--qdrant-url` (and enough `--documents` to cross Qdrant's
+indexing threshold, about 3,000 chunks at 1536 dimensions) to measure it.
+
+Usage (from `backend/`):
+    python -m benchmarks.bulk_load --documents 20
+    python -m benchmarks.bulk_load --qdrant-url localhost --documents 400
+"""
+
+import argparse
+import asyncio
+import os
+import time
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+
+from benchmarks.common import write_results  # noqa: E402
+from benchmarks.corpus import build_corpus  # noqa: E402
+from benchmarks.offline import OfflineQdrantUtils  # noqa: E402
+from benchmarks.retrieval import COLLECTION, evaluate  # noqa: E402
+from vector_db.schemas import SearchMode  # noqa: E402
+
+
+async def load(utils, corpus, mode: str) -> dict:
+    await utils.delete_collection(COLLECTION)
+    await utils.create_collection(COLLECTION)
+    files = [
+        (filename, data, {"document_id": filename})
+        for filename, data in corpus.documents.items()
+    ]
+    start = time.perf_counter()
+    if mode == "bulk":
+        points = await utils.ingest_documents(COLLECTION, files, bulk_load=True)
+        # `ingest_documents` waited for the index before returning
+        ingested = indexed = time.perf_counter()
+    else:
+        points = 0
+        for filename, data, metadata in files:
+            points += await utils.document_ingestion(
+                collection_name=COLLECTION,
+                filename=filename,
+                file_content=data,
+                metadata=metadata,
+            )
+        ingested = time.perf_counter()
+        await utils.wait_until_indexed(COLLECTION)
+        indexed = time.perf_counter()
+    return {
+        "points": points,
+        "ingest_seconds": round(ingested - start, 3),
+        "index_wait_seconds": round(indexed - ingested, 3),
+        "time_to_searchable_seconds": round(indexed - start, 3),
+    }
+
+
+async def run(args: argparse.Namespace) -> dict:
+    corpus = build_corpus(
+        documents=args.documents, queries=args.queries, seed=args.seed
+    )
+    utils = OfflineQdrantUtils(url=args.qdrant_url)
+    results: dict = {
+        "qdrant": args.qdrant_url or "memory",
+        "documents": args.documents,
+        "modes": {},
+    }
+    for mode in args.modes:
+        result = await load(utils, corpus, mode)
+        result["dense"] = await evaluate(utils, corpus, SearchMode.DENSE, args.k)
+        results["modes"][mode] = result
+        print(mode, result)
+    await utils.delete_collection(COLLECTION)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--modes",
+        type=lambda value: value.split(","),
+        default=["incremental", "bulk"],
+        help="comma separated: incremental, bulk",
+    )
+    parser.add_argument("--qdrant-url", default=None, help="default: in-memory")
+    parser.add_argument("--documents", type=int, default=20)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+    results = asyncio.run(run(args))
+    print("Results written to", write_results("bulk_load", results, args.output))
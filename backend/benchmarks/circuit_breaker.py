@@ -0,0 +1,210 @@
+"""
+Chat latency and errors through an OpenAI outage, with and without circuit breakers and a fallback model.
+
+Starts the stub OpenAI server and one app worker (see `load_test`) per mode.
+`--users` users send chat messages back to back while gpt-4o is healthy for
+`--healthy` seconds, then fails every call with a 500 after
+`--outage-latency-ms` for `--outage` seconds, then recovers for `--recovery`
+seconds. Breakers use `--window`, `--open-seconds` and `--min-calls` so a
+short run shows the open, half-open and closed states.
+
+Modes:
+    off       no circuit breakers; every turn waits out gpt-4o's retries
+    on        breakers; turns are refused with a 503 while gpt-4o's is open
+    fallback  breakers, and completions go to `--fallback-model` meanwhile
+
+For each mode and phase it reports chat latency percentiles, answered, 503
+and failed turns, and the completions each model answered, plus the circuit
+transitions from the app's metrics.
+
+Usage (from `backend/`):
+    python -m benchmarks.circuit_breaker --users 8 --outage 20
+"""
+
+import argparse
+import asyncio
+import time
+from collections import defaultdict
+
+import httpx
+from benchmarks.common import percentiles, write_results
+from benchmarks.disconnect import metric
+from benchmarks.load_test import (
+    Recorder,
+    free_port,
+    register_users,
+    spawn,
+    stand_in_env,
+    wait_ready,
+)
+
+MODEL = "gpt-4o"
+PHASES = ("healthy", "outage", "recovery")
+QUESTIONS = [
+    "Does my plan cover physiotherapy after a knee replacement?",
+    "Am I eligible with a heart condition from three years ago?",
+    "What is the deductible for the silver plan?",
+]
+
+
+async def run_mode(mode: str, args: argparse.Namespace) -> dict:
+    openai_port, app_port = free_port(), free_port()
+    stub_url = f"http://127.0.0.1:{openai_port}"
+    env = {
+        **stand_in_env(openai_port),
+        "CIRCUIT_BREAKER_ENABLED": "false" if mode == "off" else "true",
+        "CIRCUIT_WINDOW_SECONDS": str(args.window),
+        "CIRCUIT_OPEN_SECONDS": str(args.open_seconds),
+        "CIRCUIT_MIN_CALLS": str(args.min_calls),
+        "CHAT_FALLBACK_MODEL": args.fallback_model if mode == "fallback" else "",
+    }
+    children = [
+        spawn("openai", openai_port, args, env),
+        spawn("app", app_port, args, env),
+    ]
+    try:
+        await wait_ready(f"{stub_url}/docs")
+        await wait_ready(f"http://127.0.0.1:{app_port}/health")
+        async with httpx.AsyncClient(
+            base_url=f"http://127.0.0.1:{app_port}", timeout=120
+        ) as client:
+            users = await register_users(client, Recorder(), args.users)
+            await client.post(
+                "/qdrant/collection/create",
+                json={"collection_name": "chatbot"},
+                headers=users[0].headers,
+            )
+            for user in users:
+                await client.post("/chatbot/chat/start", headers=user.headers)
+
+            phase = PHASES[0]
+            latencies: dict[str, list[float]] = defaultdict(list)
+            statuses: dict[str, dict[int, int]] = defaultdict(lambda: defaultdict(int))
+            by_model: dict[str, dict] = {}
+            done = False
+
+            async def chat(user) -> None:
+                turn = 0
+                while not done:
+                    started_in, start = phase, time.perf_counter()
+                    response = await client.post(
+                        "/chatbot/chat",
+                        json={"message": QUESTIONS[turn % len(QUESTIONS)]},
+                        headers=user.headers,
+                    )
+                    turn += 1
+                    latencies[started_in].append(time.perf_counter() - start)
+                    statuses[started_in][response.status_code] += 1
+                    if response.status_code == 503:
+                        # A client backing off as Retry-After asks, a little
+                        await asyncio.sleep(args.backoff)
+
+            async def stub_completions() -> dict:
+                stats = (await client.get(f"{stub_url}/stub/stats")).json()
+                return dict(stats["completions_by_model"])
+
+            workers = [asyncio.create_task(chat(user)) for user in users]
+            for phase, seconds in zip(
+                PHASES, (args.healthy, args.outage, args.recovery)
+            ):
+                if phase == "outage":
+                    await client.post(
+                        f"{stub_url}/stub/outage",
+                        json={
+                            "model": MODEL,
+                            "status": 500,
+                            "latency": args.outage_latency_ms / 1000,
+                        },
+                    )
+                elif phase == "recovery":
+                    await client.delete(f"{stub_url}/stub/outage/{MODEL}")
+                before = await stub_completions()
+                await asyncio.sleep(seconds)
+                after = await stub_completions()
+                by_model[phase] = {
+                    model: count - before.get(model, 0)
+                    for model, count in after.items()
+                    if count > before.get(model, 0)
+                }
+            done = True
+            await asyncio.gather(*workers)
+            metrics = (await client.get("/metrics")).text
+    finally:
+        for child in children:
+            child.terminate()
+        for child in children:
+            child.wait(timeout=10)
+
+    return {
+        "phases": {
+            phase: {
+                "latency": percentiles(latencies[phase]),
+                "answered": statuses[phase][200],
+                "shed_503": statuses[phase][503],
+                "failed": sum(
+                    count
+                    for status, count in statuses[phase].items()
+                    if status not in (200, 503)
+                ),
+                "completions_by_model": by_model[phase],
+            }
+            for phase in PHASES
+        },
+        "circuit_transitions": {
+            state: metric(
+                metrics,
+                "chatbot_circuit_transitions_total",
+                breaker=MODEL,
+                state=state,
+            )
+            for state in ("open", "half_open", "closed")
+        },
+        "fallback_completions": metric(metrics, "chatbot_fallback_completions_total"),
+    }
+
+
+async def main(args: argparse.Namespace) -> None:
+    results: dict = {
+        "users": args.users,
+        "healthy": args.healthy,
+        "outage": args.outage,
+        "recovery": args.recovery,
+        "outage_latency_ms": args.outage_latency_ms,
+        "chat_latency_ms": args.chat_latency_ms,
+        "window": args.window,
+        "open_seconds": args.open_seconds,
+        "fallback_model": args.fallback_model,
+        "modes": {},
+    }
+    for mode in args.modes:
+        results["modes"][mode] = await run_mode(mode, args)
+        print(mode, results["modes"][mode])
+    print("Results written to", write_results("circuit_breaker", results, args.output))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--modes",
+        type=lambda value: value.split(","),
+        default=["off", "on", "fallback"],
+        help="comma separated: off, on, fallback",
+    )
+    parser.add_argument("--users", type=int, default=8)
+    parser.add_argument("--healthy", type=float, default=10, help="seconds")
+    parser.add_argument("--outage", type=float, default=20, help="seconds")
+    parser.add_argument("--recovery", type=float, default=15, help="seconds")
+    parser.add_argument("--outage-latency-ms", type=float, default=2000)
+    parser.add_argument("--window", type=float, default=5, help="seconds")
+    parser.add_argument("--open-seconds", type=float, default=5)
+    parser.add_argument("--min-calls", type=int, default=5)
+    parser.add_argument("--fallback-model", default="gpt-4o-mini")
+    parser.add_argument(
+        "--backoff", type=float, default=0.5, help="seconds after a 503"
+    )
+    parser.add_argument("--chat-latency-ms", type=float, default=300)
+    parser.add_argument("--embedding-latency-ms", type=float, default=50)
+    parser.add_argument("--jitter", type=float, default=0.2, help="+/- fraction")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", default=None)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,53 @@
+import json
+import os
+import platform
+import statistics
+from datetime import datetime, timezone
+from typing import Any
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+
+def percentiles(samples: list[float]) -> dict[str, float]:
+    """
+    Summarize latency samples (in seconds) as milliseconds.
+    """
+    if not samples:
+        return {"count": 0, "mean_ms": 0.0, "p50_ms": 0.0, "p95_ms": 0.0, "p99_ms": 0.0}
+    ordered = sorted(samples)
+
+    def pick(q: float) -> float:
+        index = min(len(ordered) - 1, round(q * (len(ordered) - 1)))
+        return round(ordered[index] * 1000, 3)
+
+    return {
+        "count": len(ordered),
+        "mean_ms": round(statistics.fmean(ordered) * 1000, 3),
+        "p50_ms": pick(0.50),
+        "p95_ms": pick(0.95),
+        "p99_ms": pick(0.99),
+    }
+
+
+def write_results(name: str, results: dict[str, Any], output: str | None = None) -> str:
+    """
+    Write benchmark results as JSON and return the file path.
+
+    Results are wrapped with the run timestamp and interpreter details so files
+    from different machines can be told apart when comparing for regressions.
+    """
+    path = output or os.path.join(RESULTS_DIR, f"{name}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(
+            {
+                "benchmark": name,
+                "created_at": datetime.now(timezone.utc).isoformat(),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "results": results,
+            },
+            f,
+            indent=2,
+        )
+    return path
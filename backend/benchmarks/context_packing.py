@@ -0,0 +1,127 @@
+"""
+Chat context size before and after the context packer.
+
+Ingests the labeled corpus into an in-memory Qdrant (see `retrieval`), then
+for every query retrieves the chat's top k and compares the naive context
+(every excerpt in full) with `ContextPacker` at the given budgets. Reports
+context tokens per query, how often packing dedupes, trims or drops
+excerpts, how often the labeled page is still in the context, and how many
+of the query's terms the context still contains.
+
+Usage (from `backend/`):
+    python -m benchmarks.context_packing --budget 600 --excerpt-budget 150
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+
+from benchmarks.common import percentiles, write_results  # noqa: E402
+from benchmarks.corpus import build_corpus  # noqa: E402
+from benchmarks.offline import OfflineQdrantUtils  # noqa: E402
+from benchmarks.retrieval import COLLECTION, ingest  # noqa: E402
+from chat.chat import GPT4  # noqa: E402
+from chat.context import ContextPacker, get_token_counter  # noqa: E402
+from config import settings  # noqa: E402
+from vector_db.sparse import sparse_encoder  # noqa: E402
+
+
+def term_coverage(query: str, lines: list[str]) -> float:
+    terms = set(sparse_encoder.tokenize(query))
+    found = set(sparse_encoder.tokenize(" ".join(lines)))
+    return len(terms & found) / len(terms) if terms else 1.0
+
+
+def is_target(point, query) -> bool:
+    payload = point.payload or {}
+    return (
+        payload.get("source") == query.source
+        and payload.get("excerpt_page_number") == query.page
+    )
+
+
+async def main(args: argparse.Namespace) -> None:
+    corpus = build_corpus(
+        documents=args.documents, queries=args.queries, seed=args.seed
+    )
+    utils = OfflineQdrantUtils()
+    ingestion = await ingest(utils, corpus)
+    count = get_token_counter(GPT4)
+    packer = ContextPacker(GPT4, args.budget, args.excerpt_budget)
+
+    naive_tokens, packed_tokens, pack_seconds = [], [], []
+    naive_coverage, packed_coverage = [], []
+    retrieved_target = packed_target = 0
+    totals = {"duplicates": 0, "trimmed": 0, "dropped": 0}
+    for query in corpus.queries:
+        points = await utils.search_documents(
+            collection_name=COLLECTION, query=query.text, k=args.k
+        )
+        naive = [
+            f"[{index}] title: {(point.payload or {}).get('title')} "
+            f"content: {(point.payload or {}).get('excerpt')}"
+            for index, point in enumerate(points, 1)
+        ]
+        start = time.perf_counter()
+        packed = packer.pack(query.text, points)
+        pack_seconds.append(time.perf_counter() - start)
+
+        naive_tokens.append(sum(count(line) for line in naive))
+        packed_tokens.append(packed.tokens)
+        naive_coverage.append(term_coverage(query.text, naive))
+        packed_coverage.append(term_coverage(query.text, packed.lines))
+        retrieved_target += any(is_target(point, query) for point in points)
+        packed_target += any(is_target(point, query) for point in packed.points)
+        for name in totals:
+            totals[name] += getattr(packed, name)
+
+    def tokens(samples: list[int]) -> dict:
+        ordered = sorted(samples)
+        return {
+            "mean": round(statistics.fmean(ordered), 1),
+            "p50": ordered[len(ordered) // 2],
+            "max": ordered[-1],
+        }
+
+    total = len(corpus.queries) or 1
+    results = {
+        "k": args.k,
+        "budget": args.budget,
+        "excerpt_budget": args.excerpt_budget,
+        "token_counter": "tiktoken" if count("a b") != 1 else "estimate",
+        "ingestion": ingestion,
+        "naive": {
+            "tokens": tokens(naive_tokens),
+            "target_in_context": round(retrieved_target / total, 4),
+            "query_term_coverage": round(statistics.fmean(naive_coverage), 4),
+        },
+        "packed": {
+            "tokens": tokens(packed_tokens),
+            "target_in_context": round(packed_target / total, 4),
+            "query_term_coverage": round(statistics.fmean(packed_coverage), 4),
+            "per_query": {name: round(n / total, 3) for name, n in totals.items()},
+            "latency": percentiles(pack_seconds),
+        },
+    }
+    await utils.delete_collection(COLLECTION)
+    for name in ("naive", "packed"):
+        print(name, results[name])
+    print("Results written to", write_results("context_packing", results, args.output))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--documents", type=int, default=20)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--budget", type=int, default=settings.CHAT_CONTEXT_TOKENS)
+    parser.add_argument(
+        "--excerpt-budget", type=int, default=settings.CHAT_EXCERPT_TOKENS
+    )
+    parser.add_argument("--output", default=None)
+    asyncio.run(main(parser.parse_args()))
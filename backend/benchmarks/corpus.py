@@ -0,0 +1,151 @@
+"""
+Synthetic, labeled PDF corpus for retrieval and ingestion benchmarks.
+
+Each document describes one insurance plan and has one page per coverage
+topic. A query names a plan and a topic, so exactly one page is relevant:
+pages of the same plan share the plan vocabulary and pages of other plans share
+the topic vocabulary, which makes ranking the right page non-trivial.
+"""
+
+import json
+import os
+import random
+from dataclasses import dataclass, field
+
+import pymupdf
+
+PLAN_PREFIXES = [
+    "America's Choice",
+    "Liberty Shield",
+    "Summit Care",
+    "Harbor Health",
+    "Evergreen Select",
+    "Pioneer Plus",
+    "Keystone Value",
+    "Meridian Core",
+]
+PLAN_TIERS = ["Bronze", "Silver", "Gold", "Platinum"]
+PLAN_NUMBERS = ["500", "1000", "2500", "5000", "7500"]
+
+TOPICS: dict[str, list[str]] = {
+    "heart disease": ["cardiac", "bypass", "angioplasty", "cardiology", "arrhythmia"],
+    "cancer": ["oncology", "chemotherapy", "radiation", "tumor", "carcinoma"],
+    "pregnancy": ["maternity", "prenatal", "obstetric", "delivery", "newborn"],
+    "diabetes": ["insulin", "glucose", "endocrinology", "a1c", "metformin"],
+    "dialysis": ["kidney", "renal", "nephrology", "transplant", "hemodialysis"],
+    "autoimmune": ["lupus", "sclerosis", "rheumatoid", "immunology", "psoriasis"],
+    "respiratory": ["copd", "emphysema", "asthma", "pulmonary", "inhaler"],
+    "mental health": ["therapy", "psychiatry", "counseling", "depression", "anxiety"],
+    "substance abuse": ["rehabilitation", "detox", "addiction", "recovery", "opioid"],
+    "surgery": ["outpatient", "anesthesia", "orthopedic", "arthroscopy", "surgeon"],
+    "prescriptions": ["formulary", "generic", "pharmacy", "copay", "brand"],
+    "emergency": ["ambulance", "urgent", "trauma", "triage", "stabilization"],
+}
+FILLER = (
+    "member policy benefit coverage premium deductible claim network provider "
+    "eligibility enrollment period limit annual review approval document section "
+    "schedule referral authorization exclusion rider waiting applicant statement"
+).split()
+
+
+@dataclass
+class Query:
+    text: str
+    source: str
+    page: int  # 1-based, as stored in `excerpt_page_number`
+
+
+@dataclass
+class Corpus:
+    documents: dict[str, bytes] = field(default_factory=dict)
+    queries: list[Query] = field(default_factory=list)
+
+    @property
+    def page_count(self) -> int:
+        return sum(
+            pymupdf.open(stream=data, filetype="pdf").page_count
+            for data in self.documents.values()
+        )
+
+
+def _page_text(rng: random.Random, plan: str, topic: str) -> str:
+    keywords = TOPICS[topic]
+    sentences = [f"{plan} plan: {topic} coverage and eligibility."]
+    for _ in range(12):
+        words = rng.sample(FILLER, 6) + rng.sample(keywords, 2)
+        rng.shuffle(words)
+        sentences.append(" ".join(words).capitalize() + ".")
+    sentences.append(
+        f"Applicants to {plan} with a history of {topic} in the last 5 years "
+        f"must disclose {', '.join(keywords[:3])} treatment."
+    )
+    return " ".join(sentences)
+
+
+def _render_pdf(pages: list[str]) -> bytes:
+    doc = pymupdf.open()
+    for text in pages:
+        page = doc.new_page()
+        page.insert_textbox(page.rect + (50, 50, -50, -50), text, fontsize=9)
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+def build_corpus(
+    documents: int = 20,
+    pages_per_document: int = len(TOPICS),
+    queries: int = 200,
+    seed: int = 7,
+) -> Corpus:
+    rng = random.Random(seed)
+    plans = [
+        f"{prefix} {number} {tier}"
+        for prefix in PLAN_PREFIXES
+        for number in PLAN_NUMBERS
+        for tier in PLAN_TIERS
+    ]
+    rng.shuffle(plans)
+    corpus = Corpus()
+    layout: list[tuple[str, str, str, int]] = []
+
+    for plan in plans[:documents]:
+        filename = plan.lower().replace("'", "").replace(" ", "_") + ".pdf"
+        topics = rng.sample(list(TOPICS), min(pages_per_document, len(TOPICS)))
+        corpus.documents[filename] = _render_pdf([
+            _page_text(rng, plan, topic) for topic in topics
+        ])
+        layout.extend(
+            (filename, plan, topic, page) for page, topic in enumerate(topics, 1)
+        )
+
+    for filename, plan, topic, page in rng.choices(layout, k=queries):
+        keywords = rng.sample(TOPICS[topic], 2)
+        text = rng.choice([
+            f"Does the {plan} plan cover {keywords[0]} and {keywords[1]}?",
+            f"{topic} history {keywords[0]} eligibility {plan}",
+            f"Can someone with {topic} and {keywords[1]} get {plan}?",
+        ])
+        corpus.queries.append(Query(text=text, source=filename, page=page))
+    return corpus
+
+
+def load_fixtures(directory: str) -> Corpus:
+    """
+    Load `*.pdf` files and `queries.json` from a fixture directory.
+
+    `queries.json` is a list of `{"query": str, "source": str, "page": int}`.
+    """
+    corpus = Corpus()
+    for name in sorted(os.listdir(directory)):
+        if name.lower().endswith(".pdf"):
+            with open(os.path.join(directory, name), "rb") as f:
+                corpus.documents[name] = f.read()
+    queries_path = os.path.join(directory, "queries.json")
+    if os.path.exists(queries_path):
+        with open(queries_path, encoding="utf-8") as f:
+            corpus.queries = [
+                Query(text=item["query"], source=item["source"], page=item["page"])
+                for item in json.load(f)
+            ]
+    return corpus
@@ -0,0 +1,198 @@
+"""
+Search tail latency under slow upstream calls, with hedged requests and a retrieval deadline.
+
+Ingests the labeled corpus into the in-process Qdrant (see `retrieval`), then
+runs `--searches` hybrid searches, `--concurrency` at a time. Every embedding
+call and Qdrant query takes about `--latency-ms`, except a `--slow-fraction`
+of them that take `--slow-ms`, like an API call that hits a busy replica or a
+GC pause. `--warmup` searches first record how long calls usually take,
+which sets the hedge delay; a tail heavier than `1 - HEDGE_QUANTILE` pushes
+the delay into the slow calls.
+
+Modes:
+    off       no hedging, every search waits for its slowest call
+    hedge     calls still running after their p95 are sent once more
+    deadline  hedging, and searches give up (no context) after
+              `--retrieval-timeout-ms`, as a chat turn does
+
+For each mode it reports search latency percentiles, the hedges sent and won,
+the searches that ran out of time, and upstream calls per search.
+
+Usage (from `backend/`):
+    python -m benchmarks.deadlines --searches 600 --slow-fraction 0.03
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import time
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+
+from benchmarks.common import percentiles, write_results  # noqa: E402
+from benchmarks.corpus import build_corpus  # noqa: E402
+from benchmarks.offline import OfflineQdrantUtils  # noqa: E402
+from benchmarks.retrieval import COLLECTION, ingest  # noqa: E402
+from config import settings  # noqa: E402
+from deadlines import hedge_delay, within  # noqa: E402
+from metrics import DEGRADED_STAGES, HEDGED_REQUESTS  # noqa: E402
+from vector_db.embeddings import HashingEmbeddingProvider  # noqa: E402
+
+CALLS = ("embedding", "qdrant_query")
+
+
+class Upstream:
+    """
+    Simulated round trips with a heavy tail, counting calls.
+    """
+
+    def __init__(self, args: argparse.Namespace):
+        self.rng = random.Random(args.seed)
+        self.latency = args.latency_ms / 1000
+        self.slow = args.slow_ms / 1000
+        self.slow_fraction = args.slow_fraction
+        self.jitter = args.jitter
+        self.calls = 0
+
+    async def round_trip(self) -> None:
+        self.calls += 1
+        if self.rng.random() < self.slow_fraction:
+            await asyncio.sleep(self.slow)
+        else:
+            spread = self.rng.uniform(-self.jitter, self.jitter)
+            await asyncio.sleep(self.latency * (1 + spread))
+
+
+class SlowEmbeddingProvider(HashingEmbeddingProvider):
+    def __init__(self, upstream: Upstream):
+        super().__init__()
+        self.upstream = upstream
+
+    async def embed(self, texts, dimension=None):
+        await self.upstream.round_trip()
+        return await super().embed(texts, dimension)
+
+
+def slow_queries(utils: OfflineQdrantUtils, upstream: Upstream) -> None:
+    query_batch_points = utils.qdrant_client.query_batch_points
+
+    async def slow(*args, **kwargs):
+        await upstream.round_trip()
+        return await query_batch_points(*args, **kwargs)
+
+    utils.qdrant_client.query_batch_points = slow
+
+
+def hedges() -> dict:
+    return {
+        call: {
+            winner: int(HEDGED_REQUESTS.value(call=call, winner=winner))
+            for winner in ("primary", "hedge")
+        }
+        for call in CALLS
+    }
+
+
+async def run_searches(
+    utils: OfflineQdrantUtils, queries: list[str], args: argparse.Namespace, mode: str
+) -> list[float]:
+    semaphore = asyncio.Semaphore(args.concurrency)
+    timeout = args.retrieval_timeout_ms / 1000
+
+    async def search(query: str) -> float:
+        async with semaphore:
+            start = time.perf_counter()
+            work = utils.search_documents(collection_name=COLLECTION, query=query)
+            if mode == "deadline":
+                await within("retrieval", timeout, work)
+            else:
+                await work
+            return time.perf_counter() - start
+
+    return list(await asyncio.gather(*(search(query) for query in queries)))
+
+
+async def run(args: argparse.Namespace) -> dict:
+    corpus = build_corpus(documents=args.documents, queries=args.distinct, seed=7)
+    embedding_upstream, qdrant_upstream = Upstream(args), Upstream(args)
+    utils = OfflineQdrantUtils(embedder=SlowEmbeddingProvider(embedding_upstream))
+    await ingest(utils, corpus)
+    slow_queries(utils, qdrant_upstream)
+    rng = random.Random(args.seed)
+
+    def sample(count: int) -> list[str]:
+        return [rng.choice(corpus.queries).text for _ in range(count)]
+
+    settings.HEDGE_ENABLED = False
+    await run_searches(utils, sample(args.warmup), args, "off")
+
+    results: dict = {
+        "searches": args.searches,
+        "concurrency": args.concurrency,
+        "latency_ms": args.latency_ms,
+        "slow_ms": args.slow_ms,
+        "slow_fraction": args.slow_fraction,
+        "retrieval_timeout_ms": args.retrieval_timeout_ms,
+        "hedge_quantile": settings.HEDGE_QUANTILE,
+        "modes": {},
+    }
+    settings.HEDGE_ENABLED = True
+    results["hedge_delay_ms"] = {
+        call: round((hedge_delay(call) or 0) * 1000, 1) for call in CALLS
+    }
+    print("hedge delay", results["hedge_delay_ms"])
+    for mode in args.modes:
+        settings.HEDGE_ENABLED = mode != "off"
+        embedding_upstream.calls, qdrant_upstream.calls = 0, 0
+        hedged_before = hedges()
+        degraded_before = DEGRADED_STAGES.value(stage="retrieval")
+        latencies = await run_searches(utils, sample(args.searches), args, mode)
+        hedged_after = hedges()
+        results["modes"][mode] = {
+            "latency": percentiles(latencies),
+            "hedges_won": {
+                call: {
+                    winner: count - hedged_before[call][winner]
+                    for winner, count in winners.items()
+                }
+                for call, winners in hedged_after.items()
+            },
+            "timed_out": int(
+                DEGRADED_STAGES.value(stage="retrieval") - degraded_before
+            ),
+            "embedding_calls_per_search": round(
+                embedding_upstream.calls / args.searches, 3
+            ),
+            "qdrant_queries_per_search": round(
+                qdrant_upstream.calls / args.searches, 3
+            ),
+        }
+        print(mode, results["modes"][mode])
+    await utils.delete_collection(COLLECTION)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--modes",
+        type=lambda value: value.split(","),
+        default=["off", "hedge", "deadline"],
+        help="comma separated: off, hedge, deadline",
+    )
+    parser.add_argument("--searches", type=int, default=600)
+    parser.add_argument("--warmup", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--distinct", type=int, default=50, help="queries to draw")
+    parser.add_argument("--documents", type=int, default=10)
+    parser.add_argument("--latency-ms", type=float, default=20)
+    parser.add_argument("--jitter", type=float, default=0.2, help="+/- fraction")
+    parser.add_argument("--slow-ms", type=float, default=1000)
+    parser.add_argument("--slow-fraction", type=float, default=0.03)
+    parser.add_argument("--retrieval-timeout-ms", type=float, default=250)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+    results = asyncio.run(run(args))
+    print("Results written to", write_results("deadlines", results, args.output))
@@ -0,0 +1,197 @@
+"""
+Wasted OpenAI work and live-user latency when clients abandon chat turns, with and without cancel-on-disconnect.
+
+Starts the stub OpenAI server and one app worker (see `load_test`) per mode,
+with `CANCEL_ON_DISCONNECT` off and on. `--abandoning` users send chat
+messages and hang up after `--give-up-ms`, then send the next one at once,
+like a Streamlit user who reruns during "Thinking..."; `--live` users wait
+for every answer. The stub and the app's scheduler share `--rate-limit-rpm`
+per model, so abandoned turns compete with live ones for capacity.
+
+For each mode it reports live turn latency, the chat completions (rewrites
+included) the stub finished for a connected or a departed client, the turns
+cancelled and their wasted seconds from the app's metrics, and questions
+left unanswered in the abandoning users' histories.
+
+Usage (from `backend/`):
+    python -m benchmarks.disconnect --abandoning 8 --live 2 --duration 20
+"""
+
+import argparse
+import asyncio
+import time
+
+import httpx
+from benchmarks.common import percentiles, write_results
+from benchmarks.load_test import (
+    Recorder,
+    free_port,
+    register_users,
+    spawn,
+    stand_in_env,
+    wait_ready,
+)
+
+MODEL = "gpt-4o"
+QUESTIONS = [
+    "Does my plan cover physiotherapy after a knee replacement?",
+    "Am I eligible with a heart condition from three years ago?",
+    "What is the deductible for the silver plan?",
+]
+
+
+def metric(text: str, name: str, **labels: str) -> float:
+    """
+    Sum the samples of `name` in Prometheus text whose labels include `labels`.
+    """
+    total = 0.0
+    for line in text.splitlines():
+        if not line.startswith(name + "{") and not line.startswith(name + " "):
+            continue
+        series, _, value = line.rpartition(" ")
+        if all(f'{key}="{label}"' in series for key, label in labels.items()):
+            total += float(value)
+    return round(total, 3)
+
+
+def unanswered(messages: list[dict]) -> int:
+    roles = [message["role"] for message in messages]
+    return sum(
+        1
+        for index, role in enumerate(roles)
+        if role == "user" and (index + 1 == len(roles) or roles[index + 1] == "user")
+    )
+
+
+async def run_mode(mode: str, args: argparse.Namespace) -> dict:
+    openai_port, app_port = free_port(), free_port()
+    env = {
+        **stand_in_env(openai_port),
+        "CANCEL_ON_DISCONNECT": "true" if mode == "on" else "false",
+        "OPENAI_RATE_LIMITS": (
+            f"{MODEL}={args.rate_limit_rpm}/100000000" if args.rate_limit_rpm else ""
+        ),
+    }
+    children = [
+        spawn("openai", openai_port, args, env),
+        spawn("app", app_port, args, env),
+    ]
+    try:
+        await wait_ready(f"http://127.0.0.1:{openai_port}/docs")
+        await wait_ready(f"http://127.0.0.1:{app_port}/health")
+        async with httpx.AsyncClient(
+            base_url=f"http://127.0.0.1:{app_port}", timeout=120
+        ) as client:
+            users = await register_users(
+                client, Recorder(), args.abandoning + args.live
+            )
+            await client.post(
+                "/qdrant/collection/create",
+                json={"collection_name": "chatbot"},
+                headers=users[0].headers,
+            )
+            for user in users:
+                await client.post("/chatbot/chat/start", headers=user.headers)
+
+            deadline = time.monotonic() + args.duration
+            latencies: list[float] = []
+            abandoned, answered = 0, 0
+
+            async def chat(user, live: bool) -> None:
+                nonlocal abandoned, answered
+                turn = 0
+                while time.monotonic() < deadline:
+                    start = time.perf_counter()
+                    try:
+                        response = await client.post(
+                            "/chatbot/chat",
+                            json={"message": QUESTIONS[turn % len(QUESTIONS)]},
+                            headers=user.headers,
+                            timeout=120 if live else args.give_up_ms / 1000,
+                        )
+                    except httpx.TimeoutException:
+                        abandoned += 1
+                        continue
+                    finally:
+                        turn += 1
+                    if response.status_code == 200:
+                        answered += 1
+                        if live:
+                            latencies.append(time.perf_counter() - start)
+
+            await asyncio.gather(
+                *(chat(user, False) for user in users[: args.abandoning]),
+                *(chat(user, True) for user in users[args.abandoning :]),
+            )
+            # Let turns that were not cancelled run to the end
+            await asyncio.sleep(args.drain)
+            metrics = (await client.get("/metrics")).text
+            stub = (
+                await client.get(f"http://127.0.0.1:{openai_port}/stub/stats")
+            ).json()
+            histories = [
+                (await client.get("/chatbot/allChat", headers=user.headers)).json()
+                for user in users[: args.abandoning]
+            ]
+    finally:
+        for child in children:
+            child.terminate()
+        for child in children:
+            child.wait(timeout=10)
+
+    return {
+        "live_turn_latency": percentiles(latencies),
+        "answered_requests": answered,
+        "abandoned_requests": abandoned,
+        "stub_completions": stub["completions"],
+        "stub_completions_abandoned": stub["completions_abandoned"],
+        "rate_limited_responses": stub["rate_limited"],
+        "completion_tokens": metric(
+            metrics, "chatbot_llm_tokens_total", kind="completion"
+        ),
+        "client_disconnects": metric(metrics, "chatbot_client_disconnects_total"),
+        "wasted_chat_turn_seconds": metric(
+            metrics, "chatbot_wasted_work_seconds_total", stage="chat_turn"
+        ),
+        "unanswered_questions": sum(
+            unanswered(history["all_messages"]) for history in histories
+        ),
+    }
+
+
+async def main(args: argparse.Namespace) -> None:
+    results: dict = {
+        "abandoning": args.abandoning,
+        "live": args.live,
+        "give_up_ms": args.give_up_ms,
+        "chat_latency_ms": args.chat_latency_ms,
+        "rate_limit_rpm": args.rate_limit_rpm,
+        "duration": args.duration,
+        "modes": {},
+    }
+    for mode in args.modes:
+        results["modes"][mode] = await run_mode(mode, args)
+        print(mode, results["modes"][mode])
+    print("Results written to", write_results("disconnect", results, args.output))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--modes",
+        type=lambda value: value.split(","),
+        default=["off", "on"],
+        help="comma separated: off, on",
+    )
+    parser.add_argument("--abandoning", type=int, default=8)
+    parser.add_argument("--live", type=int, default=2)
+    parser.add_argument("--give-up-ms", type=float, default=1000)
+    parser.add_argument("--duration", type=float, default=20, help="seconds per mode")
+    parser.add_argument("--drain", type=float, default=5, help="seconds after load")
+    parser.add_argument("--chat-latency-ms", type=float, default=800)
+    parser.add_argument("--embedding-latency-ms", type=float, default=50)
+    parser.add_argument("--jitter", type=float, default=0.2, help="+/- fraction")
+    parser.add_argument("--rate-limit-rpm", type=int, default=300)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", default=None)
+    asyncio.run(main(parser.parse_args()))
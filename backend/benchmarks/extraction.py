@@ -0,0 +1,106 @@
+"""
+PDF text extraction throughput per extraction mode, with and without page-level parallelism.
+
+Extracts every PDF of the synthetic corpus (or `--fixtures DIR`) with each
+`--modes` entry, first document by document, then as one merged document so
+a single upload is large enough to split across `--processes` pool
+processes. Reports pages/s and the mean characters per page for each mode
+and process count (0 is the one-thread path).
+
+Usage (from `backend/`):
+    python -m benchmarks.extraction --modes text,words,markdown --processes 0,4
+    python -m benchmarks.extraction --fixtures ../fixtures --repeat 3
+"""
+
+import argparse
+import asyncio
+import os
+import time
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+
+from benchmarks.common import write_results  # noqa: E402
+from benchmarks.corpus import build_corpus, load_fixtures  # noqa: E402
+from config import settings  # noqa: E402
+from vector_db import extraction  # noqa: E402
+from vector_db.schemas import ExtractionMode  # noqa: E402
+
+
+def merge(documents: list[bytes]) -> bytes:
+    import pymupdf
+
+    merged = pymupdf.open()
+    for content in documents:
+        merged.insert_pdf(pymupdf.open(stream=content, filetype="pdf"))
+    return merged.tobytes()
+
+
+async def measure(documents: list[bytes], mode: ExtractionMode, repeat: int) -> dict:
+    pages, characters = 0, 0
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for content in documents:
+            extracted = await extraction.extract_pages(content, mode)
+            pages += len(extracted)
+            characters += sum(len(excerpt) for _, excerpt in extracted)
+    elapsed = time.perf_counter() - start
+    return {
+        "pages": pages // repeat,
+        "pages_per_second": round(pages / elapsed, 1),
+        "chars_per_page": round(characters / pages) if pages else 0,
+    }
+
+
+async def run(args: argparse.Namespace) -> dict:
+    corpus = (
+        load_fixtures(args.fixtures)
+        if args.fixtures
+        else build_corpus(documents=args.documents, seed=args.seed)
+    )
+    documents = list(corpus.documents.values())
+    inputs = {"per_document": documents, "merged": [merge(documents)]}
+    results: dict = {
+        "documents": len(documents),
+        "fixtures": args.fixtures,
+        "min_pages_per_process": settings.PDF_EXTRACTION_MIN_PAGES,
+        "modes": {},
+    }
+    for processes in args.processes:
+        settings.PDF_EXTRACTION_PROCESSES = processes
+        extraction.close_extraction_pool()
+        if processes:
+            # Start the pool's processes outside the measurement
+            await extraction.extract_pages(inputs["merged"][0], ExtractionMode.TEXT)
+        for mode in args.modes:
+            key = f"{mode.value} processes={processes}"
+            results["modes"][key] = {
+                name: await measure(batch, mode, args.repeat)
+                for name, batch in inputs.items()
+            }
+            print(key, results["modes"][key])
+    extraction.close_extraction_pool()
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--modes",
+        type=lambda value: [ExtractionMode(mode) for mode in value.split(",")],
+        default=list(ExtractionMode),
+        help="comma separated: text, words, markdown",
+    )
+    parser.add_argument(
+        "--processes",
+        type=lambda value: [int(count) for count in value.split(",")],
+        default=[0, os.cpu_count() or 1],
+        help="comma separated pool sizes; 0 extracts in one thread",
+    )
+    parser.add_argument("--fixtures", default=None, help="directory of PDFs")
+    parser.add_argument("--documents", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+    results = asyncio.run(run(args))
+    print("Results written to", write_results("extraction", results, args.output))
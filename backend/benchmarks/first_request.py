@@ -0,0 +1,105 @@
+"""
+First-request latency after startup, with and without the lifespan warmup.
+
+For each variant a fresh app process is started against the local stand-ins
+(see `load_test`), and the time until `/health` answers and `/ready` reports
+ready is measured. The first call to each endpoint is then compared with the
+median of the following calls, which shows how much of the cold-start cost
+the warmup moves out of the request path.
+
+Usage (from `backend/`):
+    python -m benchmarks.first_request --repeat 20
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+from benchmarks.common import write_results
+from benchmarks.corpus import build_corpus
+from benchmarks.load_test import (
+    Recorder,
+    act,
+    free_port,
+    register_users,
+    spawn,
+    stand_in_env,
+    wait_ready,
+)
+
+
+async def wait_until_ready(client: httpx.AsyncClient, timeout: float = 60) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if (await client.get("/ready")).status_code == 200:
+            return
+        await asyncio.sleep(0.05)
+    raise TimeoutError("/ready did not report ready")
+
+
+async def run_variant(args: argparse.Namespace, warmup: bool) -> dict:
+    openai_port, app_port = free_port(), free_port()
+    env = {**stand_in_env(openai_port), "WARMUP_ENABLED": str(warmup).lower()}
+    stub = spawn("openai", openai_port, args, env)
+    await wait_ready(f"http://127.0.0.1:{openai_port}/docs")
+
+    started = time.perf_counter()
+    app = spawn("app", app_port, args, env)
+    try:
+        await wait_ready(f"http://127.0.0.1:{app_port}/health", timeout=120)
+        listening = time.perf_counter() - started
+        async with httpx.AsyncClient(
+            base_url=f"http://127.0.0.1:{app_port}", timeout=120
+        ) as client:
+            await wait_until_ready(client)
+            ready = time.perf_counter() - started
+
+            corpus = build_corpus(documents=1, queries=args.repeat + 1, seed=args.seed)
+            document = next(iter(corpus.documents.items()))
+            recorder = Recorder()
+            (user,) = await register_users(client, recorder, 1)
+            # Search before any upload creates the collection through ingestion
+            for action in ("search", "chat", "upload"):
+                for query in corpus.queries[: args.repeat + 1]:
+                    await act(client, recorder, user, action, query, document)
+    finally:
+        for child in (app, stub):
+            child.terminate()
+            child.wait(timeout=10)
+
+    endpoints = {}
+    for label, samples in recorder.latencies.items():
+        first, rest = samples[0], samples[1:]
+        steady = statistics.median(rest) if rest else None
+        endpoints[label] = {
+            "first_ms": round(first * 1000, 2),
+            "steady_p50_ms": round(steady * 1000, 2) if steady else None,
+            "first_over_steady": round(first / steady, 2) if steady else None,
+        }
+    return {
+        "seconds_to_listening": round(listening, 3),
+        "seconds_to_ready": round(ready, 3),
+        "endpoints": endpoints,
+    }
+
+
+async def main(args: argparse.Namespace) -> None:
+    results: dict = {"repeat": args.repeat}
+    for warmup in (False, True):
+        name = "warmup" if warmup else "no_warmup"
+        results[name] = await run_variant(args, warmup)
+        print(name, results[name])
+    print("Results written to", write_results("first_request", results, args.output))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=10, help="calls after the first")
+    parser.add_argument("--chat-latency-ms", type=float, default=200)
+    parser.add_argument("--embedding-latency-ms", type=float, default=20)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", default=None)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,100 @@
+"""
+Import-time profile of the backend (`python -X importtime`).
+
+Each run imports `main` in a fresh interpreter and parses the `-X importtime`
+report. Two targets are measured: the app alone, which is what a worker pays
+before it can listen, and the app plus the modules it imports lazily
+(`health.LAZY_MODULES`), which is the cost deferred to warmup or first use.
+Reports the median total and the slowest top-level packages by self time,
+and fails loudly if a lazy module is imported with the app again.
+
+Usage (from `backend/`):
+    python -m benchmarks.import_time --repeat 5 --top 15
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+
+from benchmarks.common import write_results
+
+TARGETS = {
+    "app": "import main",
+    "app_and_lazy_modules": "import main, health; health.import_lazy_modules()",
+}
+
+
+def profile(code: str) -> dict[str, tuple[int, int]]:
+    """
+    Return `{module: (self_us, cumulative_us)}` for one fresh interpreter.
+    """
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        env={"OPENAI_API_KEY": "sk-import-time", **os.environ},
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    modules = {}
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line.removeprefix("import time:").split("|")
+        modules[name.strip()] = (int(self_us), int(cumulative_us))
+    return modules
+
+
+def summarize(runs: list[dict[str, tuple[int, int]]], top: int) -> dict:
+    totals = [
+        sum(self_us for self_us, _ in modules.values()) / 1000 for modules in runs
+    ]
+    packages: dict[str, list[float]] = defaultdict(list)
+    for modules in runs:
+        by_package: dict[str, int] = defaultdict(int)
+        for name, (self_us, _) in modules.items():
+            by_package[name.split(".")[0]] += self_us
+        for package, self_us in by_package.items():
+            packages[package].append(self_us / 1000)
+    medians = {package: statistics.median(ms) for package, ms in packages.items()}
+    return {
+        "total_ms": round(statistics.median(totals), 1),
+        "modules": round(statistics.median(len(modules) for modules in runs)),
+        "top_packages_ms": {
+            package: round(ms, 1)
+            for package, ms in sorted(medians.items(), key=lambda i: -i[1])[:top]
+        },
+    }
+
+
+def main(args: argparse.Namespace) -> None:
+    from health import LAZY_MODULES
+
+    results: dict = {"repeat": args.repeat, "targets": {}}
+    for target, code in TARGETS.items():
+        runs = [profile(code) for _ in range(args.repeat)]
+        summary = summarize(runs, args.top)
+        if target == "app":
+            summary["eager_lazy_modules"] = [
+                name for name in LAZY_MODULES if name in runs[0]
+            ]
+        results["targets"][target] = summary
+        print(f"{target}: {summary['total_ms']}ms, {summary['modules']} modules")
+        for package, ms in summary["top_packages_ms"].items():
+            print(f"  {package:<24} {ms}ms")
+
+    eager = results["targets"]["app"]["eager_lazy_modules"]
+    print("Results written to", write_results("import_time", results, args.output))
+    if eager:
+        sys.exit(f"Lazily loaded modules are imported with the app: {eager}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15, help="packages to report")
+    parser.add_argument("--output", default=None)
+    main(parser.parse_args())
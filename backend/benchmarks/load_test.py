@@ -0,0 +1,419 @@
+"""
+End-to-end load test of the FastAPI backend with local stand-ins.
+
+Starts two child processes: the stub OpenAI server (`stand_ins.openai_app`)
+and one uvicorn worker serving `main:app` with mongomock-motor, fakeredis and
+an in-memory Qdrant installed. A labeled PDF corpus is uploaded, then virtual
+users drive a weighted mix of login, chat, search and upload requests for a
+fixed duration at each concurrency level. Reports throughput and latency
+percentiles per endpoint and level, which shows where a single worker stops
+scaling.
+
+Pass `--target URL` to load test an already running deployment instead; the
+stand-ins are then not started and real services are used.
+
+Usage (from `backend/`):
+    python -m benchmarks.load_test --concurrency 1,8,32 --duration 20
+    python -m benchmarks.load_test --chat-latency-ms 1500 --mix chat=1
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+import uuid
+from collections import defaultdict
+from dataclasses import dataclass, field
+
+import httpx
+from benchmarks.common import percentiles, write_results
+from benchmarks.corpus import Query, build_corpus
+
+DEFAULT_MIX = "chat=4,search=4,login=1,upload=1"
+PASSWORD = "LoadTest#2024"
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def parse_mix(mix: str) -> dict[str, float]:
+    weights = {}
+    for item in mix.split(","):
+        name, _, weight = item.partition("=")
+        if name.strip() not in ("chat", "search", "login", "upload"):
+            raise ValueError(f"Unknown action in --mix: {name!r}")
+        weights[name.strip()] = float(weight or 1)
+    return weights
+
+
+# -- child processes ---------------------------------------------------------
+
+
+def serve_openai(args: argparse.Namespace) -> None:
+    import uvicorn
+    from benchmarks.stand_ins import openai_app
+
+    app = openai_app(
+        chat_latency=args.chat_latency_ms / 1000,
+        embedding_latency=args.embedding_latency_ms / 1000,
+        jitter=args.jitter,
+        seed=args.seed,
+        rate_limit_rpm=getattr(args, "rate_limit_rpm", 0),
+    )
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
+
+
+def serve_app(args: argparse.Namespace) -> None:
+    from benchmarks import stand_ins
+
+    stand_ins.install()
+
+    import uvicorn
+    from main import app
+
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
+
+
+def spawn(role: str, port: int, args: argparse.Namespace, env: dict[str, str]):
+    command = [
+        sys.executable,
+        "-m",
+        "benchmarks.load_test",
+        "--role",
+        role,
+        "--port",
+        str(port),
+        "--chat-latency-ms",
+        str(args.chat_latency_ms),
+        "--embedding-latency-ms",
+        str(args.embedding_latency_ms),
+        "--jitter",
+        str(args.jitter),
+        "--seed",
+        str(args.seed),
+        "--rate-limit-rpm",
+        str(getattr(args, "rate_limit_rpm", 0)),
+    ]
+    return subprocess.Popen(
+        command,
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        env={**os.environ, **env},
+        stdout=subprocess.DEVNULL,
+    )
+
+
+def stand_in_env(openai_port: int) -> dict[str, str]:
+    return {
+        "OPENAI_API_KEY": "sk-load-test",
+        "OPENAI_BASE_URL": f"http://127.0.0.1:{openai_port}/v1",
+        "JWT_SECRET": os.environ.get("JWT_SECRET") or uuid.uuid4().hex,
+        "JWT_ALG": os.environ.get("JWT_ALG") or "HS256",
+        "TRACE_ENABLED": os.environ.get("TRACE_ENABLED") or "false",
+    }
+
+
+async def wait_ready(url: str, timeout: float = 60) -> None:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                await client.get(url)
+                return
+            except httpx.TransportError:
+                await asyncio.sleep(0.2)
+    raise TimeoutError(f"{url} did not come up within {timeout}s")
+
+
+# -- load generation ---------------------------------------------------------
+
+
+@dataclass
+class Recorder:
+    latencies: dict[str, list[float]] = field(default_factory=lambda: defaultdict(list))
+    errors: dict[str, int] = field(default_factory=lambda: defaultdict(int))
+
+    async def request(
+        self, client: httpx.AsyncClient, label: str, method: str, url: str, **kwargs
+    ) -> httpx.Response | None:
+        start = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+        except httpx.HTTPError:
+            self.errors[label] += 1
+            return None
+        self.latencies[label].append(time.perf_counter() - start)
+        if response.status_code >= 400:
+            self.errors[label] += 1
+        return response
+
+    def summary(self, elapsed: float) -> dict:
+        endpoints = sorted(set(self.latencies) | set(self.errors))
+        return {
+            label: {
+                "throughput_rps": round(len(self.latencies[label]) / elapsed, 2),
+                "errors": self.errors[label],
+                **percentiles(self.latencies[label]),
+            }
+            for label in endpoints
+        }
+
+
+@dataclass
+class VirtualUser:
+    email: str
+    refresh_token: str = ""
+    chat_started: bool = False
+
+    @property
+    def headers(self) -> dict[str, str]:
+        # The refresh cookie is issued `secure` for the site domain, so a plain
+        # HTTP client would not send it back on its own.
+        return {"Cookie": f"refreshToken={self.refresh_token}"}
+
+
+async def login(client: httpx.AsyncClient, recorder: Recorder, user: VirtualUser):
+    response = await recorder.request(
+        client,
+        "POST /auth/login",
+        "POST",
+        "/auth/login",
+        json={"email": user.email, "password": PASSWORD, "name": "Load Test"},
+    )
+    if response is not None and response.status_code == 200:
+        user.refresh_token = response.json()["refresh_token"]
+
+
+async def register_users(
+    client: httpx.AsyncClient, recorder: Recorder, count: int
+) -> list[VirtualUser]:
+    users = [
+        VirtualUser(email=f"load-{uuid.uuid4().hex[:12]}@example.com")
+        for _ in range(count)
+    ]
+    for user in users:
+        await recorder.request(
+            client,
+            "POST /auth/register",
+            "POST",
+            "/auth/register",
+            json={"email": user.email, "password": PASSWORD, "name": "Load Test"},
+        )
+        await login(client, recorder, user)
+    return users
+
+
+async def upload(
+    client: httpx.AsyncClient,
+    recorder: Recorder,
+    user: VirtualUser,
+    filename: str,
+    data: bytes,
+) -> None:
+    await recorder.request(
+        client,
+        "POST /qdrant/document/upload",
+        "POST",
+        "/qdrant/document/upload",
+        files={"file": (filename, data, "application/pdf")},
+        headers=user.headers,
+    )
+
+
+async def act(
+    client: httpx.AsyncClient,
+    recorder: Recorder,
+    user: VirtualUser,
+    action: str,
+    query: Query,
+    document: tuple[str, bytes],
+) -> None:
+    if action == "login":
+        await login(client, recorder, user)
+    elif action == "search":
+        await recorder.request(
+            client,
+            "POST /qdrant/search",
+            "POST",
+            "/qdrant/search",
+            json={"query": query.text, "k": 5},
+            headers=user.headers,
+        )
+    elif action == "upload":
+        await upload(client, recorder, user, *document)
+    elif action == "chat":
+        if not user.chat_started:
+            await recorder.request(
+                client,
+                "POST /chatbot/chat/start",
+                "POST",
+                "/chatbot/chat/start",
+                headers=user.headers,
+            )
+            user.chat_started = True
+        await recorder.request(
+            client,
+            "POST /chatbot/chat",
+            "POST",
+            "/chatbot/chat",
+            json={"message": query.text},
+            headers=user.headers,
+        )
+
+
+async def run_level(
+    client: httpx.AsyncClient,
+    users: list[VirtualUser],
+    corpus,
+    mix: dict[str, float],
+    duration: float,
+    rng: random.Random,
+) -> dict:
+    recorder = Recorder()
+    actions, weights = list(mix), list(mix.values())
+    documents = list(corpus.documents.items())
+    deadline = time.monotonic() + duration
+
+    async def virtual_user(user: VirtualUser) -> None:
+        while time.monotonic() < deadline:
+            (action,) = rng.choices(actions, weights)
+            await act(
+                client,
+                recorder,
+                user,
+                action,
+                rng.choice(corpus.queries),
+                rng.choice(documents),
+            )
+
+    start = time.perf_counter()
+    await asyncio.gather(*(virtual_user(user) for user in users))
+    elapsed = time.perf_counter() - start
+    endpoints = recorder.summary(elapsed)
+    return {
+        "users": len(users),
+        "seconds": round(elapsed, 2),
+        "total_rps": round(
+            sum(len(samples) for samples in recorder.latencies.values()) / elapsed, 2
+        ),
+        "errors": sum(recorder.errors.values()),
+        "endpoints": endpoints,
+    }
+
+
+async def drive(args: argparse.Namespace, target: str) -> dict:
+    levels = [int(level) for level in args.concurrency.split(",")]
+    mix = parse_mix(args.mix)
+    rng = random.Random(args.seed)
+    corpus = build_corpus(
+        documents=args.documents, queries=args.queries, seed=args.seed
+    )
+
+    async with httpx.AsyncClient(
+        base_url=target,
+        timeout=args.timeout,
+        limits=httpx.Limits(max_connections=max(levels) * 2),
+    ) as client:
+        setup = Recorder()
+        users = await register_users(client, setup, max(levels))
+        await setup.request(
+            client,
+            "POST /qdrant/collection/create",
+            "POST",
+            "/qdrant/collection/create",
+            json={"collection_name": args.collection},
+            headers=users[0].headers,
+        )
+        for filename, data in corpus.documents.items():
+            await upload(client, setup, users[0], filename, data)
+        print("setup", {label: len(s) for label, s in setup.latencies.items()})
+
+        results: dict = {
+            "target": target,
+            "mix": mix,
+            "duration": args.duration,
+            "stand_ins": not args.target,
+            "chat_latency_ms": args.chat_latency_ms if not args.target else None,
+            "embedding_latency_ms": (
+                args.embedding_latency_ms if not args.target else None
+            ),
+            "setup": setup.summary(1.0),
+            "levels": {},
+        }
+        for level in levels:
+            summary = await run_level(
+                client, users[:level], corpus, mix, args.duration, rng
+            )
+            results["levels"][str(level)] = summary
+            print(
+                f"concurrency={level} total_rps={summary['total_rps']} "
+                f"errors={summary['errors']}"
+            )
+            for label, stats in summary["endpoints"].items():
+                print(
+                    f"  {label:<28} rps={stats['throughput_rps']:<8} "
+                    f"p50={stats['p50_ms']}ms p95={stats['p95_ms']}ms "
+                    f"p99={stats['p99_ms']}ms errors={stats['errors']}"
+                )
+    return results
+
+
+async def main(args: argparse.Namespace) -> None:
+    if args.target:
+        results = await drive(args, args.target)
+    else:
+        openai_port, app_port = free_port(), free_port()
+        env = stand_in_env(openai_port)
+        children = [
+            spawn("openai", openai_port, args, env),
+            spawn("app", app_port, args, env),
+        ]
+        try:
+            await wait_ready(f"http://127.0.0.1:{openai_port}/docs")
+            await wait_ready(f"http://127.0.0.1:{app_port}/health")
+            results = await drive(args, f"http://127.0.0.1:{app_port}")
+        finally:
+            for child in children:
+                child.terminate()
+            for child in children:
+                child.wait(timeout=10)
+
+    print("Results written to", write_results("load_test", results, args.output))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--concurrency", default="1,8,32", help="comma separated")
+    parser.add_argument("--duration", type=float, default=20, help="seconds per level")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="action=weight,...")
+    parser.add_argument("--documents", type=int, default=5, help="PDFs to preload")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--collection", default="chatbot")
+    parser.add_argument("--chat-latency-ms", type=float, default=800)
+    parser.add_argument("--embedding-latency-ms", type=float, default=100)
+    parser.add_argument("--jitter", type=float, default=0.2, help="+/- fraction")
+    parser.add_argument(
+        "--rate-limit-rpm", type=int, default=0, help="stub 429s per model, 0=off"
+    )
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--target", default=None, help="URL of a running backend")
+    parser.add_argument("--output", default=None)
+    parser.add_argument(
+        "--role", choices=["driver", "app", "openai"], default="driver", help="internal"
+    )
+    parser.add_argument("--port", type=int, default=0, help="internal")
+    args = parser.parse_args()
+
+    if args.role == "app":
+        serve_app(args)
+    elif args.role == "openai":
+        serve_openai(args)
+    else:
+        asyncio.run(main(args))
@@ -0,0 +1,130 @@
+"""
+Request overhead of the logging pipeline.
+
+Compares three setups on the real FastAPI app (through an in-process ASGI
+transport, so no sockets are involved):
+
+- `disabled`: logging switched off entirely, the baseline.
+- `sync_file`: the previous setup, a plain `FileHandler` on the root logger and
+  the chat payload logged eagerly at INFO.
+- `queue`: the current pipeline, records handed to the listener thread and the
+  payload logged through the sampled DEBUG path.
+
+Each request hits `/health` (one request log line) and a benchmark-only route
+that logs a chat-turn sized payload, mimicking `Chat.task_chat`.
+
+Usage (from `backend/`):
+    python -m benchmarks.logging_overhead --requests 2000
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import tempfile
+import time
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+
+import httpx  # noqa: E402
+import logger as app_logging  # noqa: E402
+from benchmarks.common import percentiles, write_results  # noqa: E402
+from main import app  # noqa: E402
+
+log = logging.getLogger("benchmarks.logging_overhead")
+
+
+def build_payload(turns: int, turn_size: int) -> list[dict[str, str]]:
+    return [
+        {
+            "role": "user" if i % 2 else "assistant",
+            "content": "policy text " * turn_size,
+        }
+        for i in range(turns)
+    ]
+
+
+def install(mode: str, log_dir: str) -> list[logging.Handler]:
+    """
+    Replace the root handlers for `mode` and return the previous ones.
+    """
+    root = logging.getLogger()
+    previous = root.handlers[:]
+    logging.disable(logging.NOTSET)
+    if mode == "disabled":
+        logging.disable(logging.CRITICAL)
+    elif mode == "sync_file":
+        handler = logging.FileHandler(os.path.join(log_dir, "sync.log"))
+        handler.setFormatter(logging.Formatter(app_logging.TEXT_FORMAT))
+        root.handlers = [handler]
+    return previous
+
+
+async def run_mode(mode: str, requests: int, payload) -> dict:
+    @app.get("/_bench/payload", include_in_schema=False)
+    async def payload_route():
+        if mode == "sync_file":
+            log.info({
+                "message_history_length": len(payload),
+                "message_history": payload,
+            })
+        else:
+            log.info(
+                "Chat context prepared", extra={"message_history_length": len(payload)}
+            )
+            log.debug(
+                "Chat turn payload", extra={"payload": {"message_history": payload}}
+            )
+        return {"status": "ok"}
+
+    transport = httpx.ASGITransport(app=app)
+    samples: dict[str, list[float]] = {"/health": [], "/_bench/payload": []}
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench"
+    ) as client:
+        for path in samples:
+            await client.get(path)  # warm up routing and middleware
+        for _ in range(requests):
+            for path, bucket in samples.items():
+                start = time.perf_counter()
+                await client.get(path)
+                bucket.append(time.perf_counter() - start)
+
+    app.router.routes = [
+        route
+        for route in app.router.routes
+        if getattr(route, "path", "") != "/_bench/payload"
+    ]
+    return {path: percentiles(values) for path, values in samples.items()}
+
+
+async def main(args: argparse.Namespace) -> None:
+    payload = build_payload(args.turns, args.turn_size)
+    results: dict = {"requests": args.requests, "payload_turns": args.turns}
+
+    with tempfile.TemporaryDirectory() as log_dir:
+        for mode in ("disabled", "sync_file", "queue"):
+            previous = install(mode, log_dir)
+            results[mode] = await run_mode(mode, args.requests, payload)
+            logging.getLogger().handlers = previous
+            logging.disable(logging.NOTSET)
+            print(mode, results[mode])
+    app_logging.stop_logs()
+
+    baseline = results["disabled"]
+    for mode in ("sync_file", "queue"):
+        results[f"{mode}_overhead_ms"] = {
+            path: round(stats["mean_ms"] - baseline[path]["mean_ms"], 3)
+            for path, stats in results[mode].items()
+        }
+
+    print("Results written to", write_results("logging_overhead", results, args.output))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--turns", type=int, default=40, help="messages in the payload")
+    parser.add_argument("--turn-size", type=int, default=400, help="words per message")
+    parser.add_argument("--output", default=None)
+    asyncio.run(main(parser.parse_args()))
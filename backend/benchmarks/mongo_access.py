@@ -0,0 +1,232 @@
+"""
+Bytes and latency of each MongoDB request path, with full documents and with the repositories' projections.
+
+Seeds `--users` users with `--turns` chat turns each (a system prompt of
+`--prompt-chars`, short questions, answers of `--answer-chars`), then runs
+every query a request makes twice: as the code did before `db.repositories`,
+fetching whole documents, and through the repositories. For each path it
+reports the BSON bytes returned per call and latency percentiles; for a
+message write, the round trips (an insert and a redundant update before, one
+insert now).
+
+mongomock answers in-process, so only the bytes are meaningful there. Pass
+`--mongo-uri` to measure latency against a server, and `--compressors` to
+compare wire compression.
+
+Usage (from `backend/`):
+    python -m benchmarks.mongo_access --users 20 --turns 20
+    python -m benchmarks.mongo_access --mongo-uri mongodb://localhost --compressors zlib
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import time
+from datetime import datetime, timedelta, timezone
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+
+import bson  # noqa: E402
+from benchmarks.common import percentiles, write_results  # noqa: E402
+from db.repositories import (  # noqa: E402
+    ChatMessageRepository,
+    RefreshTokenRepository,
+    UserRepository,
+)
+
+DATABASE = "benchmark_mongo_access"
+WORDS = "plan cover deductible premium eligibility claim hospital policy".split()
+ROLES = ["assistant", "user", "system"]
+
+
+def text(rng: random.Random, chars: int) -> str:
+    words: list[str] = []
+    while sum(len(word) + 1 for word in words) < chars:
+        words.append(rng.choice(WORDS))
+    return " ".join(words)
+
+
+def client(args: argparse.Namespace):
+    if not args.mongo_uri:
+        from mongomock_motor import AsyncMongoMockClient
+
+        return AsyncMongoMockClient()
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    return AsyncIOMotorClient(args.mongo_uri, compressors=args.compressors or None)
+
+
+async def seed(db, args: argparse.Namespace, rng: random.Random) -> list[dict]:
+    users = []
+    for index in range(args.users):
+        user = {
+            "name": f"User {index}",
+            "email": f"user{index}@example.com",
+            "password": "$2b$12$" + text(rng, 53),
+        }
+        user["_id"] = (await db.users.insert_one(user)).inserted_id
+        user["refresh_token"] = f"token-{index}"
+        await db.refresh_tokens.insert_one({
+            "refresh_token": user["refresh_token"],
+            "expires_at": datetime.utcnow() + timedelta(days=30),
+            "user_id": str(user["_id"]),
+        })
+        created_at = datetime.now(timezone.utc)
+        messages = [("system", args.prompt_chars)]
+        for _ in range(args.turns):
+            messages += [("user", 120), ("assistant", args.answer_chars)]
+        for role, chars in messages:
+            created_at += timedelta(seconds=1)
+            await db.chat_messages.insert_one({
+                "user_id": user["_id"],
+                "role": role,
+                "content": text(rng, chars),
+                "created_at": created_at,
+                "updated_at": created_at,
+            })
+        users.append(user)
+    return users
+
+
+def paths(db) -> dict:
+    """
+    name -> (full-document query, repository query), each taking a seeded user.
+    """
+    users = UserRepository(db)
+    tokens = RefreshTokenRepository(db)
+    messages = ChatMessageRepository(db)
+
+    def full_find(user, roles):
+        return (
+            db.chat_messages
+            .find({"user_id": user["_id"], "role": {"$in": roles}})
+            .sort("created_at", 1)
+            .to_list(length=None)
+        )
+
+    return {
+        "register_check": (
+            lambda user: db.users.find_one({"email": user["email"]}),
+            lambda user: users.exists(user["email"]),
+        ),
+        "login": (
+            lambda user: db.users.find_one({"email": user["email"]}),
+            lambda user: users.get_credentials(user["email"]),
+        ),
+        "refresh_token": (
+            lambda user: db.refresh_tokens.find_one({
+                "refresh_token": user["refresh_token"]
+            }),
+            lambda user: tokens.get(user["refresh_token"]),
+        ),
+        "chat_history": (
+            lambda user: full_find(user, ROLES),
+            lambda user: messages.history(user["_id"], ROLES),
+        ),
+        "all_chat": (
+            lambda user: full_find(user, ROLES[:2]),
+            lambda user: messages.messages(user["_id"], ROLES[:2]),
+        ),
+    }
+
+
+def size(result) -> int:
+    if isinstance(result, bool) or result is None:
+        # `exists` reads an {_id} document
+        return len(bson.encode({"_id": bson.ObjectId()})) if result else 0
+    documents = result if isinstance(result, list) else [result]
+    return sum(len(bson.encode(document)) for document in documents)
+
+
+async def measure(call, users: list[dict], repeat: int) -> dict:
+    latencies, sizes = [], []
+    for _ in range(repeat):
+        for user in users:
+            start = time.perf_counter()
+            result = await call(user)
+            latencies.append(time.perf_counter() - start)
+            sizes.append(size(result))
+    return {
+        "bytes_per_call": round(sum(sizes) / len(sizes)),
+        "latency": percentiles(latencies),
+    }
+
+
+async def writes(db, users: list[dict], repeat: int) -> dict:
+    async def before(user):
+        now = datetime.now(timezone.utc)
+        message = {
+            "user_id": user["_id"],
+            "role": "user",
+            "content": "Is physiotherapy covered?",
+            "created_at": now,
+            "updated_at": now,
+        }
+        message["_id"] = (await db.chat_messages.insert_one(message)).inserted_id
+        await db.chat_messages.update_one({"_id": message["_id"]}, {"$set": message})
+
+    repository = ChatMessageRepository(db)
+
+    async def after(user):
+        await repository.add(
+            user["_id"], "user", "Is physiotherapy covered?", datetime.now(timezone.utc)
+        )
+
+    results = {}
+    for name, call, round_trips in (("full", before, 2), ("projected", after, 1)):
+        latencies = []
+        for _ in range(repeat):
+            for user in users:
+                start = time.perf_counter()
+                await call(user)
+                latencies.append(time.perf_counter() - start)
+        results[name] = {"round_trips": round_trips, "latency": percentiles(latencies)}
+    return results
+
+
+async def run(args: argparse.Namespace) -> dict:
+    mongo = client(args)
+    await mongo.drop_database(DATABASE)
+    db = mongo[DATABASE]
+    users = await seed(db, args, random.Random(args.seed))
+
+    results: dict = {
+        "mongo": args.mongo_uri or "mongomock",
+        "compressors": args.compressors if args.mongo_uri else None,
+        "users": args.users,
+        "turns": args.turns,
+        "paths": {},
+    }
+    for name, (full, projected) in paths(db).items():
+        result = {
+            "full": await measure(full, users, args.repeat),
+            "projected": await measure(projected, users, args.repeat),
+        }
+        result["bytes_saved"] = round(
+            1
+            - result["projected"]["bytes_per_call"] / result["full"]["bytes_per_call"],
+            3,
+        )
+        results["paths"][name] = result
+        print(name, result)
+    results["message_write"] = await writes(db, users, args.repeat)
+    print("message_write", results["message_write"])
+    await mongo.drop_database(DATABASE)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--mongo-uri", default=None, help="default: mongomock")
+    parser.add_argument("--compressors", default="", help="e.g. zlib, zstd")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--turns", type=int, default=20)
+    parser.add_argument("--prompt-chars", type=int, default=3000)
+    parser.add_argument("--answer-chars", type=int, default=800)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+    results = asyncio.run(run(args))
+    print("Results written to", write_results("mongo_access", results, args.output))
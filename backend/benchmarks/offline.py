@@ -0,0 +1,32 @@
+import warnings
+
+from qdrant_client import AsyncQdrantClient
+from vector_db.embeddings import EmbeddingProvider, HashingEmbeddingProvider
+from vector_db.qdrant import QdrantUtils
+
+# Local mode always searches exactly and says so on every query.
+warnings.filterwarnings("ignore", message="Local mode performs exact")
+
+
+class OfflineQdrantUtils(QdrantUtils):
+    """
+    `QdrantUtils` wired to local stand-ins: an in-process Qdrant (or the given
+    server) and `HashingEmbeddingProvider` (or the given provider) instead of
+    OpenAI.
+    """
+
+    def __init__(
+        self,
+        embedder: EmbeddingProvider | None = None,
+        url: str | None = None,
+        api_key: str | None = None,
+    ):
+        self.url = url
+        self.api_key = api_key
+        self.qdrant_client = (
+            AsyncQdrantClient(url=url, api_key=api_key)
+            if url
+            else AsyncQdrantClient(location=":memory:")
+        )
+        self._layouts = {}
+        self.embedder = embedder or HashingEmbeddingProvider()
@@ -0,0 +1,193 @@
+"""
+Interactive OpenAI latency during a background embedding flood, with and without the scheduler.
+
+A rate-limited stub OpenAI server (`--rate-limit-rpm` per model, from
+`load_test`) is flooded with embedding batches by `--flood` concurrent
+background callers, as a bulk ingestion would. Meanwhile `--users`
+interactive callers run chat turns: one query embedding, then one chat
+completion. Each mode runs for `--duration` seconds:
+
+- `sdk`: calls go straight through the OpenAI SDK, with its default
+  per-call retries, as before the scheduler.
+- `scheduler`: calls go through `llm.scheduler.OpenAIScheduler`, told the
+  stub's limits; the flood runs at background priority.
+
+Reports turn latency percentiles, failed turns, background throughput and the
+429s the stub sent. Without `--redis` the buckets are per process (the
+fallback used when Redis is down); with it they are shared through REDIS_HOST.
+
+Usage (from `backend/`):
+    python -m benchmarks.openai_scheduler --rate-limit-rpm 1200 --flood 16
+    python -m benchmarks.openai_scheduler --redis --modes scheduler
+"""
+
+import argparse
+import asyncio
+import os
+import time
+
+import httpx
+from benchmarks.load_test import free_port, spawn, wait_ready
+
+EMBEDDING_MODEL = "text-embedding-3-small"
+CHAT_MODEL = "gpt-4o"
+QUERY = "Does my plan cover physiotherapy after a knee replacement?"
+
+
+async def run_mode(mode: str, args: argparse.Namespace, stub_url: str) -> dict:
+    import openai
+    from benchmarks.common import percentiles
+    from config import settings
+    from llm.scheduler import (
+        OpenAIScheduler,
+        Priority,
+        RateLimit,
+        estimate_tokens,
+        openai_priority,
+    )
+
+    # A fresh pool per mode, so neither inherits the other's connections
+    http_client = httpx.AsyncClient(
+        limits=httpx.Limits(max_connections=settings.OPENAI_MAX_CONNECTIONS)
+    )
+    client = openai.AsyncOpenAI(
+        api_key="sk-openai-scheduler",
+        base_url=f"{stub_url}/v1",
+        http_client=http_client,
+        max_retries=2 if mode == "sdk" else 0,
+    )
+    limit = RateLimit(args.rate_limit_rpm, 0)
+    scheduler = OpenAIScheduler(
+        {EMBEDDING_MODEL: limit, CHAT_MODEL: limit},
+        max_retries=settings.OPENAI_MAX_RETRIES,
+        reserve=settings.OPENAI_INTERACTIVE_RESERVE,
+    )
+    batch = [f"{QUERY} (page {page})" for page in range(args.batch)]
+
+    async def call(model: str, texts: list[str], request):
+        if mode == "sdk":
+            return await request()
+        return await scheduler.run(model, estimate_tokens(texts), request)
+
+    async def embed(texts: list[str]):
+        return await call(
+            EMBEDDING_MODEL,
+            texts,
+            lambda: client.embeddings.create(input=texts, model=EMBEDDING_MODEL),
+        )
+
+    async def chat():
+        return await call(
+            CHAT_MODEL,
+            [QUERY],
+            lambda: client.chat.completions.create(
+                model=CHAT_MODEL, messages=[{"role": "user", "content": QUERY}]
+            ),
+        )
+
+    deadline = time.monotonic() + args.duration
+    embedded, flood_errors = 0, 0
+    latencies: list[float] = []
+    failed_turns = 0
+
+    async def flood() -> None:
+        nonlocal embedded, flood_errors
+        with openai_priority(Priority.BACKGROUND):
+            while time.monotonic() < deadline:
+                try:
+                    await embed(batch)
+                    embedded += len(batch)
+                except openai.APIError:
+                    flood_errors += 1
+
+    async def user() -> None:
+        nonlocal failed_turns
+        while time.monotonic() < deadline:
+            start = time.perf_counter()
+            try:
+                await embed([QUERY])
+                await chat()
+                latencies.append(time.perf_counter() - start)
+            except openai.APIError:
+                failed_turns += 1
+            await asyncio.sleep(args.think_time)
+
+    before = (await http_client.get(f"{stub_url}/stub/stats")).json()
+    start = time.perf_counter()
+    await asyncio.gather(
+        *(flood() for _ in range(args.flood)), *(user() for _ in range(args.users))
+    )
+    elapsed = time.perf_counter() - start
+    after = (await http_client.get(f"{stub_url}/stub/stats")).json()
+    await http_client.aclose()
+    return {
+        "turns": len(latencies),
+        "failed_turns": failed_turns,
+        "turn_latency": percentiles(latencies),
+        "background_chunks_per_second": round(embedded / elapsed, 1),
+        "background_errors": flood_errors,
+        "rate_limited_responses": after["rate_limited"] - before["rate_limited"],
+    }
+
+
+async def main(args: argparse.Namespace) -> None:
+    # One process plays every worker; its local buckets hold the full limits
+    os.environ["WEB_CONCURRENCY"] = "1"
+    os.environ.setdefault("OPENAI_API_KEY", "sk-openai-scheduler")
+    import cache.client
+    import fakeredis
+
+    if not args.redis:
+        cache.client._client = fakeredis.FakeAsyncRedis(decode_responses=True)
+
+    port = free_port()
+    stub = spawn("openai", port, args, {})
+    try:
+        await wait_ready(f"http://127.0.0.1:{port}/docs")
+        results: dict = {
+            "rate_limit_rpm": args.rate_limit_rpm,
+            "flood": args.flood,
+            "batch": args.batch,
+            "users": args.users,
+            "duration": args.duration,
+            "chat_latency_ms": args.chat_latency_ms,
+            "embedding_latency_ms": args.embedding_latency_ms,
+            "modes": {},
+        }
+        for mode in args.modes:
+            results["modes"][mode] = await run_mode(
+                mode, args, f"http://127.0.0.1:{port}"
+            )
+            print(mode, results["modes"][mode])
+            # Let the stub's windows and any shared pause run out
+            await asyncio.sleep(2)
+    finally:
+        stub.terminate()
+        stub.wait(timeout=10)
+
+    from benchmarks.common import write_results
+
+    print("Results written to", write_results("openai_scheduler", results, args.output))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--modes",
+        type=lambda value: value.split(","),
+        default=["sdk", "scheduler"],
+        help="comma separated: sdk, scheduler",
+    )
+    parser.add_argument("--rate-limit-rpm", type=int, default=1200)
+    parser.add_argument("--flood", type=int, default=16, help="background callers")
+    parser.add_argument("--batch", type=int, default=16, help="texts per flood call")
+    parser.add_argument("--users", type=int, default=4, help="interactive callers")
+    parser.add_argument("--think-time", type=float, default=0.2, help="seconds")
+    parser.add_argument("--duration", type=float, default=15, help="seconds per mode")
+    parser.add_argument("--chat-latency-ms", type=float, default=300)
+    parser.add_argument("--embedding-latency-ms", type=float, default=50)
+    parser.add_argument("--jitter", type=float, default=0.2, help="+/- fraction")
+    parser.add_argument("--redis", action="store_true", help="use REDIS_HOST")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", default=None)
+    asyncio.run(main(parser.parse_args()))
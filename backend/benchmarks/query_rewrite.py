@@ -0,0 +1,147 @@
+"""
+Query rewrite strategies compared on latency and retrieval quality.
+
+For each strategy the labeled corpus's queries are rewritten and searched
+(hybrid, in-memory Qdrant with `HashingEmbeddingProvider`, see `retrieval`).
+Reports rewrite and rewrite+search latency percentiles and recall@k / MRR.
+Cached strategies run the query set twice, and the second (warm) pass is
+reported separately.
+
+LLM strategies call the stub OpenAI server from `load_test` unless
+`--openai` is given. The stub echoes the query, so its recall equals "none"
+and only its latency (`--chat-latency-ms`) is meaningful; use `--openai` to
+measure the real models' rewrites.
+
+Usage (from `backend/`):
+    python -m benchmarks.query_rewrite --strategies none,keywords,llm,llm+cache
+    python -m benchmarks.query_rewrite --openai --model gpt-4o-mini
+"""
+
+import argparse
+import asyncio
+import os
+import time
+
+from benchmarks.load_test import free_port, spawn, wait_ready
+
+RECALL_AT = (1, 5)
+
+
+async def evaluate(utils, rewriter, corpus, k: int, collection: str) -> dict:
+    from benchmarks.common import percentiles
+
+    rewrite_latencies, total_latencies = [], []
+    hits = dict.fromkeys(RECALL_AT, 0)
+    reciprocal_ranks = 0.0
+    for query in corpus.queries:
+        start = time.perf_counter()
+        rewritten = await rewriter.rewrite(query.text)
+        rewrite_latencies.append(time.perf_counter() - start)
+        points = await utils.search_documents(
+            collection_name=collection, query=rewritten, k=k
+        )
+        total_latencies.append(time.perf_counter() - start)
+
+        rank = next(
+            (
+                position
+                for position, point in enumerate(points, 1)
+                if point.payload
+                and point.payload.get("source") == query.source
+                and point.payload.get("excerpt_page_number") == query.page
+            ),
+            None,
+        )
+        if rank is None:
+            continue
+        reciprocal_ranks += 1 / rank
+        for cutoff in RECALL_AT:
+            if rank <= cutoff:
+                hits[cutoff] += 1
+
+    total = len(corpus.queries) or 1
+    return {
+        "rewrite_latency": percentiles(rewrite_latencies),
+        "end_to_end_latency": percentiles(total_latencies),
+        **{f"recall@{cutoff}": round(hits[cutoff] / total, 4) for cutoff in RECALL_AT},
+        f"mrr@{k}": round(reciprocal_ranks / total, 4),
+    }
+
+
+async def run(args: argparse.Namespace) -> dict:
+    # Imported once OPENAI_BASE_URL points at the stub
+    import cache.client
+    import fakeredis
+    from benchmarks.corpus import build_corpus
+    from benchmarks.offline import OfflineQdrantUtils
+    from benchmarks.retrieval import COLLECTION, ingest
+    from chat.rewriter import build_query_rewriter
+
+    if not args.redis:
+        cache.client._client = fakeredis.FakeAsyncRedis(decode_responses=True)
+    corpus = build_corpus(
+        documents=args.documents, queries=args.queries, seed=args.seed
+    )
+    utils = OfflineQdrantUtils()
+    results: dict = {
+        "openai": "api" if args.openai else "stub",
+        "chat_latency_ms": None if args.openai else args.chat_latency_ms,
+        "model": args.model,
+        "queries": len(corpus.queries),
+        "k": args.k,
+        "ingestion": await ingest(utils, corpus),
+        "strategies": {},
+    }
+    for name in args.strategies:
+        strategy, _, cached = name.partition("+")
+        rewriter = build_query_rewriter(strategy, args.model, cache=bool(cached))
+        passes = ("cold", "warm") if cached else ("cold",)
+        for label in passes:
+            key = f"{name} ({label})" if cached else name
+            results["strategies"][key] = await evaluate(
+                utils, rewriter, corpus, args.k, COLLECTION
+            )
+            print(key, results["strategies"][key])
+    await utils.delete_collection(COLLECTION)
+    return results
+
+
+async def main(args: argparse.Namespace) -> None:
+    stub = None
+    if not args.openai:
+        port = free_port()
+        args.embedding_latency_ms, args.jitter = 0, 0.0
+        stub = spawn("openai", port, args, {})
+        os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{port}/v1"
+        os.environ["OPENAI_API_KEY"] = "sk-query-rewrite"
+        await wait_ready(f"http://127.0.0.1:{port}/docs")
+    try:
+        results = await run(args)
+    finally:
+        if stub is not None:
+            stub.terminate()
+            stub.wait(timeout=10)
+
+    from benchmarks.common import write_results
+
+    print("Results written to", write_results("query_rewrite", results, args.output))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--strategies",
+        type=lambda value: value.split(","),
+        default=["none", "keywords", "llm", "llm+cache"],
+        help="comma separated; append +cache to cache a strategy",
+    )
+    parser.add_argument("--model", default="gpt-4o", help="model for llm")
+    parser.add_argument("--openai", action="store_true", help="use the real API")
+    parser.add_argument("--redis", action="store_true", help="use REDIS_HOST")
+    parser.add_argument("--chat-latency-ms", type=float, default=800)
+    parser.add_argument("--documents", type=int, default=20)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--output", default=None)
+    asyncio.run(main(parser.parse_args()))
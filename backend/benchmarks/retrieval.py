@@ -0,0 +1,165 @@
+"""
+Offline retrieval benchmark for QdrantUtils.
+
+Ingests a labeled PDF corpus (synthetic by default, or `--fixtures DIR`) into
+an in-process Qdrant with the deterministic `HashingEmbeddingProvider` (or
+`--embedder`), then runs the query set in dense, sparse and hybrid mode, and
+in hybrid mode followed by each `--rerank` stage. Reports ingestion
+throughput, query latency percentiles and recall@k / MRR per mode.
+
+Usage (from `backend/`):
+    python -m benchmarks.retrieval --documents 20 --queries 200
+    python -m benchmarks.retrieval --embedder openai --qdrant-url localhost
+    EMBEDDING_MODEL_PATH=models/minilm python -m benchmarks.retrieval --embedder local
+    python -m benchmarks.retrieval --rerank lexical,cross_encoder
+"""
+
+import argparse
+import asyncio
+import os
+import time
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+
+from benchmarks.common import percentiles, write_results  # noqa: E402
+from benchmarks.corpus import Corpus, build_corpus, load_fixtures  # noqa: E402
+from benchmarks.offline import OfflineQdrantUtils  # noqa: E402
+from config import settings  # noqa: E402
+from vector_db.embeddings import get_embedding_provider  # noqa: E402
+from vector_db.qdrant import QdrantUtils  # noqa: E402
+from vector_db.schemas import RerankMode, SearchMode  # noqa: E402
+
+COLLECTION = "retrieval_benchmark"
+RECALL_AT = (1, 3, 5, 10)
+
+
+def build_utils(args: argparse.Namespace) -> QdrantUtils:
+    return OfflineQdrantUtils(
+        embedder=get_embedding_provider(args.embedder), url=args.qdrant_url
+    )
+
+
+async def ingest(utils: QdrantUtils, corpus: Corpus, **collection) -> dict:
+    """
+    Ingest the corpus into a fresh `COLLECTION`, created with `collection`
+    (`profile`, `dimension`).
+    """
+    await utils.delete_collection(COLLECTION)
+    await utils.create_collection(COLLECTION, **collection)
+    start = time.perf_counter()
+    for filename, data in corpus.documents.items():
+        await utils.document_ingestion(
+            collection_name=COLLECTION,
+            filename=filename,
+            file_content=data,
+            metadata={"document_id": filename},
+        )
+    elapsed = time.perf_counter() - start
+    pages = corpus.page_count
+    return {
+        "documents": len(corpus.documents),
+        "pages": pages,
+        "seconds": round(elapsed, 3),
+        "pages_per_second": round(pages / elapsed, 2) if elapsed else None,
+    }
+
+
+async def evaluate(
+    utils: QdrantUtils,
+    corpus: Corpus,
+    mode: SearchMode,
+    k: int,
+    rerank_mode: RerankMode = RerankMode.NONE,
+    collection: str = COLLECTION,
+):
+    latencies: list[float] = []
+    hits = dict.fromkeys(RECALL_AT, 0)
+    reciprocal_ranks = 0.0
+    for query in corpus.queries:
+        start = time.perf_counter()
+        points = await utils.search_documents(
+            collection_name=collection,
+            query=query.text,
+            k=k,
+            mode=mode,
+            rerank_mode=rerank_mode,
+        )
+        latencies.append(time.perf_counter() - start)
+
+        rank = next(
+            (
+                position
+                for position, point in enumerate(points, 1)
+                if point.payload
+                and point.payload.get("source") == query.source
+                and point.payload.get("excerpt_page_number") == query.page
+            ),
+            None,
+        )
+        if rank is None:
+            continue
+        reciprocal_ranks += 1 / rank
+        for cutoff in RECALL_AT:
+            if rank <= cutoff:
+                hits[cutoff] += 1
+
+    total = len(corpus.queries) or 1
+    return {
+        "latency": percentiles(latencies),
+        **{f"recall@{cutoff}": round(hits[cutoff] / total, 4) for cutoff in RECALL_AT},
+        f"mrr@{k}": round(reciprocal_ranks / total, 4),
+    }
+
+
+async def main(args: argparse.Namespace) -> None:
+    corpus = (
+        load_fixtures(args.fixtures)
+        if args.fixtures
+        else build_corpus(
+            documents=args.documents, queries=args.queries, seed=args.seed
+        )
+    )
+    utils = build_utils(args)
+    results: dict = {
+        "embedder": args.embedder,
+        "qdrant": args.qdrant_url or ":memory:",
+        "queries": len(corpus.queries),
+        "k": args.k,
+        "rerank_candidates": settings.RERANK_CANDIDATES,
+        "ingestion": await ingest(utils, corpus),
+        "modes": {},
+    }
+    print("ingestion", results["ingestion"])
+    for mode in SearchMode:
+        results["modes"][mode.value] = await evaluate(utils, corpus, mode, args.k)
+        print(mode.value, results["modes"][mode.value])
+    for rerank_mode in args.rerank:
+        name = f"{SearchMode.HYBRID.value}+{rerank_mode.value}"
+        results["modes"][name] = await evaluate(
+            utils, corpus, SearchMode.HYBRID, args.k, rerank_mode
+        )
+        print(name, results["modes"][name])
+    await utils.delete_collection(COLLECTION)
+
+    print("Results written to", write_results("retrieval", results, args.output))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--documents", type=int, default=20)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--fixtures", default=None, help="directory of PDFs")
+    parser.add_argument(
+        "--embedder", choices=["hashing", "openai", "local"], default="hashing"
+    )
+    parser.add_argument("--qdrant-url", default=None, help="default: in-memory")
+    parser.add_argument(
+        "--rerank",
+        type=lambda value: [RerankMode(mode) for mode in value.split(",") if mode],
+        default=[RerankMode.LEXICAL],
+        help="comma separated rerank stages to evaluate after hybrid search",
+    )
+    parser.add_argument("--output", default=None)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,119 @@
+"""
+Search response size and serialization cost, before and after lean results.
+
+Ingests the labeled corpus into the in-process Qdrant (see `retrieval`) and,
+for each `--k`, serializes the same search results three ways:
+
+- "full": the whole payload, through `ScoredPoint.dict()` and `JSONResponse`
+  (the previous /qdrant/search response).
+- "lean": the default payload fields as `SearchResponse`, dumped to JSON bytes
+  by pydantic-core the way FastAPI does for a declared response model.
+- "projected": like "lean" with `--fields` only.
+
+Reports response bytes and serialization CPU time per response.
+
+Usage (from `backend/`):
+    python -m benchmarks.search_serialization --k 5,50,200
+"""
+
+import argparse
+import asyncio
+import os
+import time
+import warnings
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+
+from benchmarks.common import percentiles, write_results  # noqa: E402
+from benchmarks.corpus import build_corpus  # noqa: E402
+from benchmarks.offline import OfflineQdrantUtils  # noqa: E402
+from benchmarks.retrieval import COLLECTION, ingest  # noqa: E402
+from fastapi.responses import JSONResponse  # noqa: E402
+from pydantic import TypeAdapter  # noqa: E402
+from vector_db.schemas import SearchField, SearchResponse, SearchResult  # noqa: E402
+
+# `.dict()` is the deprecated pydantic v1 API the old route used
+warnings.filterwarnings("ignore", category=DeprecationWarning)
+
+ADAPTER = TypeAdapter(SearchResponse)
+
+
+def serialize_full(points) -> bytes:
+    return JSONResponse(content={"results": [point.dict() for point in points]}).body
+
+
+def serialize_lean(points) -> bytes:
+    response = SearchResponse(
+        results=[SearchResult.from_point(point) for point in points]
+    )
+    # FastAPI validates the returned model against the route's, then dumps it
+    return ADAPTER.dump_json(ADAPTER.validate_python(response))
+
+
+async def measure(utils, corpus, k: int, fields, serialize, repeat: int) -> dict:
+    sizes, cpu = [], []
+    for query in corpus.queries:
+        points = await utils.search_documents(
+            collection_name=COLLECTION, query=query.text, k=k, fields=fields
+        )
+        start = time.process_time()
+        for _ in range(repeat):
+            body = serialize(points)
+        cpu.append((time.process_time() - start) / repeat)
+        sizes.append(len(body))
+    return {
+        "mean_bytes": round(sum(sizes) / len(sizes)),
+        "serialize_cpu": percentiles(cpu),
+    }
+
+
+async def run(args: argparse.Namespace) -> dict:
+    corpus = build_corpus(
+        documents=args.documents, queries=args.queries, seed=args.seed
+    )
+    utils = OfflineQdrantUtils()
+    results: dict = {
+        "queries": len(corpus.queries),
+        "ingestion": await ingest(utils, corpus),
+        "fields": args.fields,
+        "k": {},
+    }
+    variants = {
+        "full": (list(SearchField), serialize_full),
+        "lean": (None, serialize_lean),
+        "projected": ([SearchField(field) for field in args.fields], serialize_lean),
+    }
+    for k in args.k:
+        results["k"][k] = {
+            name: await measure(utils, corpus, k, fields, serialize, args.repeat)
+            for name, (fields, serialize) in variants.items()
+        }
+        print(f"k={k}", results["k"][k])
+    await utils.delete_collection(COLLECTION)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--k",
+        type=lambda value: [int(k) for k in value.split(",")],
+        default=[5, 50, 200],
+    )
+    parser.add_argument(
+        "--fields",
+        type=lambda value: value.split(","),
+        default=["source", "title", "excerpt_page_number"],
+        help="payload fields for the projected variant",
+    )
+    parser.add_argument("--documents", type=int, default=20)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=20, help="serializations timed")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+    results = asyncio.run(run(args))
+    print(
+        "Results written to",
+        write_results("search_serialization", results, args.output),
+    )
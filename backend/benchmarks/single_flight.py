@@ -0,0 +1,121 @@
+"""
+Upstream calls and latency for a spike of identical searches, with and without single-flight.
+
+Ingests the labeled corpus into the in-process Qdrant (see `retrieval`), then
+fires `--spikes` bursts of `--concurrency` simultaneous hybrid searches, each
+burst drawn from only `--distinct` queries, as when many users ask about the
+same announcement. Embeddings come from `HashingEmbeddingProvider` behind a
+simulated round trip of `--embedding-latency-ms`.
+
+For "off" and "on" it reports search latency percentiles, and how many
+embedding calls and Qdrant queries the bursts cost.
+
+Usage (from `backend/`):
+    python -m benchmarks.single_flight --concurrency 100 --distinct 3
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import time
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+
+import vector_db.qdrant  # noqa: E402
+from benchmarks.common import percentiles, write_results  # noqa: E402
+from benchmarks.corpus import build_corpus  # noqa: E402
+from benchmarks.offline import OfflineQdrantUtils  # noqa: E402
+from benchmarks.retrieval import COLLECTION, ingest  # noqa: E402
+from vector_db.embeddings import HashingEmbeddingProvider  # noqa: E402
+
+FLIGHTS = ("_embedding_flight", "_search_flight")
+
+
+class SlowEmbeddingProvider(HashingEmbeddingProvider):
+    """
+    Hashing embeddings behind a simulated API round trip, counting calls.
+    """
+
+    def __init__(self, latency: float):
+        super().__init__()
+        self.latency = latency
+        self.calls = 0
+
+    async def embed(self, texts, dimension=None):
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        return await super().embed(texts, dimension)
+
+
+class CountingQdrantUtils(OfflineQdrantUtils):
+    queries = 0
+
+    async def search_documents_batch(self, collection_name, queries, **kwargs):
+        self.queries += len(queries)
+        return await super().search_documents_batch(collection_name, queries, **kwargs)
+
+
+async def spike(utils, queries: list[str]) -> list[float]:
+    async def search(query: str) -> float:
+        start = time.perf_counter()
+        await utils.search_documents(collection_name=COLLECTION, query=query)
+        return time.perf_counter() - start
+
+    return list(await asyncio.gather(*(search(query) for query in queries)))
+
+
+async def run(args: argparse.Namespace) -> dict:
+    corpus = build_corpus(documents=args.documents, queries=args.distinct, seed=7)
+    embedder = SlowEmbeddingProvider(args.embedding_latency_ms / 1000)
+    utils = CountingQdrantUtils(embedder=embedder)
+    await ingest(utils, corpus)
+    rng = random.Random(args.seed)
+    bursts = [
+        [rng.choice(corpus.queries).text for _ in range(args.concurrency)]
+        for _ in range(args.spikes)
+    ]
+
+    results: dict = {
+        "concurrency": args.concurrency,
+        "distinct": args.distinct,
+        "spikes": args.spikes,
+        "embedding_latency_ms": args.embedding_latency_ms,
+        "modes": {},
+    }
+    for mode in ("off", "on"):
+        for name in FLIGHTS:
+            getattr(vector_db.qdrant, name).enabled = mode == "on"
+        embedder.calls, utils.queries = 0, 0
+        latencies: list[float] = []
+        start = time.perf_counter()
+        for burst in bursts:
+            latencies.extend(await spike(utils, burst))
+        elapsed = time.perf_counter() - start
+        searches = len(latencies)
+        results["modes"][mode] = {
+            "latency": percentiles(latencies),
+            "searches_per_second": round(searches / elapsed, 1),
+            "embedding_calls": embedder.calls,
+            "qdrant_queries": utils.queries,
+            "upstream_calls_per_search": round(
+                (embedder.calls + utils.queries) / searches, 3
+            ),
+        }
+        print(mode, results["modes"][mode])
+    await utils.delete_collection(COLLECTION)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--distinct", type=int, default=3, help="queries per spike")
+    parser.add_argument("--spikes", type=int, default=10)
+    parser.add_argument("--documents", type=int, default=10)
+    parser.add_argument("--embedding-latency-ms", type=float, default=100)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+    results = asyncio.run(run(args))
+    print("Results written to", write_results("single_flight", results, args.output))
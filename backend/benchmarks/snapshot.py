@@ -0,0 +1,105 @@
+"""
+Rebuilding a collection by re-ingestion against restoring it from a snapshot.
+
+Ingests the labeled corpus (see `retrieval`) through `document_ingestion`,
+exports it with `vector_db.snapshot`, and restores the file into a second
+collection. Reports the time of each step, the snapshot size, the peak Python
+memory of the restore, and dense/hybrid recall@k of both collections, which
+should match. The in-memory Qdrant keeps the restored points in this process,
+so the peak only shows that the restore streams with `--qdrant-url`.
+
+Ingestion here embeds locally with `HashingEmbeddingProvider`; against the
+OpenAI API it also pays one embedding round trip per page, which a restore
+never makes. Pass `--qdrant-url` to run against a server.
+
+Usage (from `backend/`):
+    python -m benchmarks.snapshot --documents 20
+    python -m benchmarks.snapshot --qdrant-url localhost --documents 200 --gzip
+"""
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+import tracemalloc
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+
+from benchmarks.common import write_results  # noqa: E402
+from benchmarks.corpus import build_corpus  # noqa: E402
+from benchmarks.offline import OfflineQdrantUtils  # noqa: E402
+from benchmarks.retrieval import COLLECTION, evaluate, ingest  # noqa: E402
+from vector_db.schemas import SearchMode  # noqa: E402
+from vector_db.snapshot import export_collection, import_collection  # noqa: E402
+
+RESTORED = f"{COLLECTION}_restored"
+
+
+async def recall(utils, corpus, collection: str, k: int) -> dict:
+    results = {}
+    for mode in (SearchMode.DENSE, SearchMode.HYBRID):
+        result = await evaluate(utils, corpus, mode, k, collection=collection)
+        results[mode.value] = result[f"recall@{k}"]
+    return results
+
+
+async def run(args: argparse.Namespace) -> dict:
+    corpus = build_corpus(
+        documents=args.documents, queries=args.queries, seed=args.seed
+    )
+    utils = OfflineQdrantUtils(url=args.qdrant_url)
+    start = time.perf_counter()
+    ingestion = await ingest(utils, corpus)
+    rebuild_seconds = time.perf_counter() - start
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(
+            directory, "snapshot.jsonl.gz" if args.gzip else "snapshot.jsonl"
+        )
+        start = time.perf_counter()
+        exported = await export_collection(utils, COLLECTION, path)
+        export_seconds = time.perf_counter() - start
+        size = os.path.getsize(path)
+
+        await utils.delete_collection(RESTORED)
+        tracemalloc.start()
+        start = time.perf_counter()
+        restored = await import_collection(utils, path, collection_name=RESTORED)
+        restore_seconds = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    results = {
+        "qdrant": args.qdrant_url or "memory",
+        "pages": ingestion["pages"],
+        "rebuild_seconds": round(rebuild_seconds, 3),
+        "export_seconds": round(export_seconds, 3),
+        "restore_seconds": round(restore_seconds, 3),
+        "exported_points": exported,
+        "restored_points": restored,
+        "snapshot_bytes": size,
+        "restore_peak_python_mb": round(peak / 2**20, 1),
+        "recall": {
+            "rebuilt": await recall(utils, corpus, COLLECTION, args.k),
+            "restored": await recall(utils, corpus, RESTORED, args.k),
+        },
+    }
+    await utils.delete_collection(COLLECTION)
+    await utils.delete_collection(RESTORED)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--qdrant-url", default=None, help="default: in-memory")
+    parser.add_argument("--gzip", action="store_true", help="write .jsonl.gz")
+    parser.add_argument("--documents", type=int, default=20)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+    results = asyncio.run(run(args))
+    print(results)
+    print("Results written to", write_results("snapshot", results, args.output))
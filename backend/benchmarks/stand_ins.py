@@ -0,0 +1,228 @@
+"""
+Local stand-ins for the backend's external services.
+
+`install()` swaps MongoDB for mongomock-motor, Redis for fakeredis and Qdrant
+for one shared in-process instance. It must run before `main` (or any module
+that grabs a database handle at import time) is imported. `openai_app()` is a
+stub of the OpenAI endpoints the backend calls, with configurable latency,
+meant to be served on its own port and targeted through `OPENAI_BASE_URL`.
+"""
+
+import array
+import asyncio
+import base64
+import random
+import time
+
+from vector_db.embeddings import HashingEmbeddingProvider
+
+
+def install() -> None:
+    import cache.client
+    import db
+    import fakeredis
+    import redis
+    import vector_db.qdrant
+    from config import settings
+    from mongomock_motor import AsyncMongoMockClient
+    from qdrant_client import AsyncQdrantClient
+
+    db.client = AsyncMongoMockClient()
+    db.db = db.client[settings.PROJECT_NAME]
+
+    server = fakeredis.FakeServer()
+    redis.StrictRedis = redis.Redis = lambda *args, **kwargs: fakeredis.FakeRedis(
+        server=server, decode_responses=kwargs.get("decode_responses", False)
+    )
+    redis.from_url = lambda *args, **kwargs: fakeredis.FakeRedis(server=server)
+    cache.client._client = fakeredis.FakeAsyncRedis(
+        server=server, decode_responses=True
+    )
+
+    # `QdrantUtils` is instantiated per request in places; all of them must see
+    # the same in-memory collections.
+    qdrant = AsyncQdrantClient(location=":memory:")
+    vector_db.qdrant.AsyncQdrantClient = lambda *args, **kwargs: qdrant
+
+
+def openai_app(
+    chat_latency: float = 0.8,
+    embedding_latency: float = 0.1,
+    jitter: float = 0.2,
+    seed: int | None = None,
+    rate_limit_rpm: int = 0,
+):
+    """
+    Build a FastAPI app answering chat completions, embeddings and model lookup.
+
+    Chat completions echo the last user message, which keeps query rewriting
+    meaningful for retrieval. Embeddings come from `HashingEmbeddingProvider`.
+    Every response is delayed by the configured latency (seconds) +/- `jitter`.
+
+    With `rate_limit_rpm`, each model accepts that many requests per minute,
+    counted per second like the API's short windows, and answers the rest
+    with a 429 and OpenAI's rate-limit headers. `GET /stub/stats` returns the
+    accepted and rejected counts, and how many chat completions were finished
+    for a client that was still connected or had already hung up.
+
+    `POST /stub/outage` with `{"model": ..., "status": 500, "latency": 0}`
+    makes the model answer every request with that status after `latency`
+    seconds, like an incident; `status` 200 with a `latency` only slows it
+    down. `DELETE /stub/outage/{model}` ends it.
+    """
+    from fastapi import FastAPI, Request
+    from fastapi.responses import JSONResponse
+
+    app = FastAPI()
+    embedder = HashingEmbeddingProvider()
+    rng = random.Random(seed)
+    windows: dict[str, tuple[int, int]] = {}
+    stats = {
+        "accepted": 0,
+        "rate_limited": 0,
+        "completions": 0,
+        "completions_abandoned": 0,
+        "failed": 0,
+        "completions_by_model": {},
+    }
+    outages: dict[str, dict] = {}
+
+    def throttle(model: str) -> JSONResponse | None:
+        if not rate_limit_rpm:
+            stats["accepted"] += 1
+            return None
+        now = time.time()
+        second, count = windows.get(model, (0, 0))
+        if second != int(now):
+            second, count = int(now), 0
+        if count >= max(1, rate_limit_rpm // 60):
+            stats["rate_limited"] += 1
+            reset_ms = max(1, int((second + 1 - now) * 1000))
+            return JSONResponse(
+                {
+                    "error": {
+                        "message": f"Rate limit reached for {model}",
+                        "type": "requests",
+                        "code": "rate_limit_exceeded",
+                    }
+                },
+                status_code=429,
+                headers={
+                    "retry-after-ms": str(reset_ms),
+                    "x-ratelimit-limit-requests": str(rate_limit_rpm),
+                    "x-ratelimit-remaining-requests": "0",
+                    "x-ratelimit-reset-requests": f"{reset_ms}ms",
+                },
+            )
+        windows[model] = (second, count + 1)
+        stats["accepted"] += 1
+        return None
+
+    async def outage(model: str) -> JSONResponse | None:
+        incident = outages.get(model)
+        if incident is None:
+            return None
+        await asyncio.sleep(incident.get("latency", 0))
+        if incident.get("status", 500) == 200:
+            return None
+        stats["failed"] += 1
+        return JSONResponse(
+            {"error": {"message": "The server had an error", "type": "server_error"}},
+            status_code=incident.get("status", 500),
+        )
+
+    async def delay(latency: float) -> None:
+        await asyncio.sleep(max(0.0, latency * rng.uniform(1 - jitter, 1 + jitter)))
+
+    def count_tokens(text: str) -> int:
+        return max(1, len(text) // 4)
+
+    @app.post("/v1/chat/completions", response_model=None)
+    async def chat_completions(request: Request) -> dict | JSONResponse:
+        body = await request.json()
+        model = body.get("model", "stub")
+        if limited := throttle(model):
+            return limited
+        if failed := await outage(model):
+            return failed
+        messages = body.get("messages", [])
+        prompt = " ".join(str(message.get("content", "")) for message in messages)
+        reply = next(
+            (
+                str(message.get("content", ""))
+                for message in reversed(messages)
+                if message.get("role") == "user"
+            ),
+            "Hello, how can I help you with your insurance plan?",
+        )
+        await delay(chat_latency)
+        if await request.is_disconnected():
+            stats["completions_abandoned"] += 1
+        else:
+            stats["completions"] += 1
+        by_model = stats["completions_by_model"]
+        by_model[model] = by_model.get(model, 0) + 1
+        prompt_tokens, completion_tokens = count_tokens(prompt), count_tokens(reply)
+        return {
+            "id": f"chatcmpl-stub-{time.time_ns()}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [
+                {
+                    "index": 0,
+                    "message": {"role": "assistant", "content": reply},
+                    "finish_reason": "stop",
+                }
+            ],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        }
+
+    @app.get("/v1/models/{model}")
+    async def retrieve_model(model: str) -> dict:
+        return {"id": model, "object": "model", "created": 0, "owned_by": "stub"}
+
+    @app.post("/v1/embeddings", response_model=None)
+    async def embeddings(request: Request) -> dict | JSONResponse:
+        body = await request.json()
+        if limited := throttle(body.get("model", "stub")):
+            return limited
+        if failed := await outage(body.get("model", "stub")):
+            return failed
+        inputs = body["input"] if isinstance(body["input"], list) else [body["input"]]
+        await delay(embedding_latency)
+        data = []
+        for index, text in enumerate(inputs):
+            vector = embedder.embed_text(str(text))
+            if body.get("encoding_format") == "base64":
+                embedding = base64.b64encode(array.array("f", vector).tobytes())
+                data.append({"index": index, "embedding": embedding.decode()})
+            else:
+                data.append({"index": index, "embedding": vector})
+        tokens = sum(count_tokens(str(text)) for text in inputs)
+        return {
+            "object": "list",
+            "data": [{"object": "embedding", **item} for item in data],
+            "model": body.get("model", "stub"),
+            "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+        }
+
+    @app.get("/stub/stats")
+    async def stub_stats() -> dict:
+        return stats
+
+    @app.post("/stub/outage")
+    async def start_outage(request: Request) -> dict:
+        incident = await request.json()
+        outages[incident["model"]] = incident
+        return incident
+
+    @app.delete("/stub/outage/{model}")
+    async def end_outage(model: str) -> dict:
+        return outages.pop(model, {})
+
+    return app
@@ -0,0 +1,110 @@
+"""
+Memory per million chunks against search latency, per storage profile.
+
+For each `--profiles` x `--dimensions` combination the labeled corpus is
+ingested into a collection created with that profile and dense dimension (see
+`vector_db/storage.py`), then the query set is run in dense and hybrid mode.
+Reports latency percentiles and recall@k / MRR next to the estimated RAM the
+vectors and indexes of one million chunks keep resident, from the measured
+mean sparse terms per chunk.
+
+The in-process Qdrant keeps everything in RAM whatever the profile, so
+without `--qdrant-url` only the dimension changes latency; point it at a
+Qdrant server to measure on-disk and quantized storage.
+
+Usage (from `backend/`):
+    python -m benchmarks.storage_profiles --dimensions 1536,512,256
+    python -m benchmarks.storage_profiles --qdrant-url localhost --documents 200
+"""
+
+import argparse
+import asyncio
+import os
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+
+from benchmarks.common import write_results  # noqa: E402
+from benchmarks.corpus import build_corpus  # noqa: E402
+from benchmarks.offline import OfflineQdrantUtils  # noqa: E402
+from benchmarks.retrieval import COLLECTION, evaluate, ingest  # noqa: E402
+from vector_db.embeddings import get_embedding_provider  # noqa: E402
+from vector_db.schemas import SearchMode, StorageProfileName  # noqa: E402
+from vector_db.storage import STORAGE_PROFILES  # noqa: E402
+
+CHUNKS = 1_000_000
+
+
+async def mean_sparse_terms(utils) -> float:
+    points, _ = await utils.qdrant_client.scroll(
+        collection_name=COLLECTION,
+        limit=10_000,
+        with_payload=False,
+        with_vectors=["sparse_vector"],
+    )
+    terms = [len(point.vector["sparse_vector"].indices) for point in points]
+    return sum(terms) / len(terms) if terms else 0.0
+
+
+async def run(args: argparse.Namespace) -> dict:
+    corpus = build_corpus(
+        documents=args.documents, queries=args.queries, seed=args.seed
+    )
+    utils = OfflineQdrantUtils(
+        embedder=get_embedding_provider(args.embedder), url=args.qdrant_url
+    )
+    results: dict = {
+        "embedder": utils.embedder.name,
+        "qdrant": args.qdrant_url or ":memory:",
+        "queries": len(corpus.queries),
+        "k": args.k,
+        "profiles": {},
+    }
+    for name in args.profiles:
+        profile = STORAGE_PROFILES[name]
+        for dimension in args.dimensions:
+            ingestion = await ingest(utils, corpus, profile=name, dimension=dimension)
+            sparse_terms = await mean_sparse_terms(utils)
+            key = f"{name.value}@{dimension}"
+            results["profiles"][key] = {
+                "resident_mb_per_million_chunks": round(
+                    profile.resident_bytes(CHUNKS, dimension, sparse_terms) / 2**20
+                ),
+                "sparse_terms_per_chunk": round(sparse_terms, 1),
+                "ingestion": ingestion,
+                **{
+                    mode.value: await evaluate(utils, corpus, mode, args.k)
+                    for mode in (SearchMode.DENSE, SearchMode.HYBRID)
+                },
+            }
+            print(key, results["profiles"][key])
+    await utils.delete_collection(COLLECTION)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--profiles",
+        type=lambda value: [StorageProfileName(name) for name in value.split(",")],
+        default=list(StorageProfileName),
+    )
+    parser.add_argument(
+        "--dimensions",
+        type=lambda value: [int(dimension) for dimension in value.split(",")],
+        default=[1536, 512, 256],
+    )
+    parser.add_argument(
+        "--embedder", choices=["hashing", "openai", "local"], default="hashing"
+    )
+    parser.add_argument("--qdrant-url", default=None, help="default: in-memory")
+    parser.add_argument("--documents", type=int, default=20)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+    results = asyncio.run(run(args))
+    print(
+        "Results written to",
+        write_results("storage_profiles", results, args.output),
+    )
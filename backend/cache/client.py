@@ -0,0 +1,109 @@
+import asyncio
+import time
+from typing import Any, Iterable, Mapping
+
+import redis.asyncio as aioredis
+from config import settings
+from logger import logger
+
+# Commands per pipeline round trip in the bulk helpers
+PIPELINE_BATCH_SIZE = 500
+
+_client: aioredis.Redis | None = None
+
+
+def _create_client() -> aioredis.Redis:
+    pool = aioredis.BlockingConnectionPool(
+        host=settings.REDIS_HOST or "localhost",
+        port=settings.REDIS_PORT or 6379,
+        max_connections=settings.REDIS_MAX_CONNECTIONS,
+        # Wait this long for a free connection before raising
+        timeout=settings.REDIS_SOCKET_TIMEOUT,
+        socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+        socket_connect_timeout=settings.REDIS_SOCKET_TIMEOUT,
+        health_check_interval=settings.REDIS_HEALTH_CHECK_INTERVAL,
+        decode_responses=True,
+    )
+    return aioredis.Redis(connection_pool=pool)
+
+
+def get_redis() -> aioredis.Redis:
+    """
+    Return the process-wide async Redis client.
+
+    All callers share one bounded connection pool. The client is normally
+    opened by the app lifespan (`open_redis`); it is created lazily here for
+    scripts, and so that every forked worker gets its own connections.
+    """
+    global _client
+    if _client is None:
+        _client = _create_client()
+    return _client
+
+
+async def open_redis() -> None:
+    """
+    Create the client and open a first connection, logging if Redis is down.
+    """
+    status = await check_redis()
+    if status["status"] == "ok":
+        logger.info("Redis connection successful")
+    else:
+        logger.error(f"Redis connection failed: {status['error']}")
+
+
+async def close_redis() -> None:
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+async def check_redis(timeout: float | None = None) -> dict[str, Any]:
+    """
+    Ping Redis and report `{"status": "ok", "latency_ms": ...}` or the error.
+    """
+    start = time.perf_counter()
+    try:
+        await asyncio.wait_for(
+            get_redis().ping(), timeout=timeout or settings.REDIS_SOCKET_TIMEOUT
+        )
+    except Exception as e:
+        return {"status": "error", "error": f"{type(e).__name__}: {e}"}
+    return {
+        "status": "ok",
+        "latency_ms": round((time.perf_counter() - start) * 1000, 2),
+    }
+
+
+def _batches(items: list, size: int = PIPELINE_BATCH_SIZE) -> Iterable[list]:
+    for start in range(0, len(items), size):
+        yield items[start : start + size]
+
+
+async def get_many(keys: list[str]) -> list[str | None]:
+    """
+    Fetch many keys, one `MGET` per batch.
+    """
+    values: list[str | None] = []
+    for batch in _batches(keys):
+        values.extend(await get_redis().mget(batch))
+    return values
+
+
+async def set_many(items: Mapping[str, str], ttl: int | None = None) -> None:
+    """
+    Set many keys with an optional TTL (seconds), pipelined per batch.
+    """
+    for batch in _batches(list(items.items())):
+        async with get_redis().pipeline(transaction=False) as pipe:
+            for key, value in batch:
+                pipe.set(key, value, ex=ttl)
+            await pipe.execute()
+
+
+async def delete_many(keys: list[str]) -> int:
+    deleted = 0
+    for batch in _batches(keys):
+        deleted += await get_redis().delete(*batch)
+    return deleted
@@ -0,0 +1,59 @@
+import hashlib
+import json
+from typing import Any
+
+from cache.client import get_many, set_many
+from logger import logger
+from metrics import record_cache
+
+KEY_PREFIX = "cache"
+
+
+class RedisCache:
+    """
+    Namespaced JSON cache in Redis, shared by all workers.
+
+    Keys are hashed, so any string (a query, a prompt) can be used as a key.
+    Lookups are counted in `chatbot_cache_requests_total{cache=name}`. Redis
+    errors are logged and treated as misses, so an outage only costs the
+    cache, never the request.
+    """
+
+    def __init__(self, name: str, ttl: int | None = None):
+        self.name = name
+        self.ttl = ttl
+
+    def key(self, raw: str) -> str:
+        digest = hashlib.blake2b(raw.encode("utf-8"), digest_size=16).hexdigest()
+        return f"{KEY_PREFIX}:{self.name}:{digest}"
+
+    async def get_many(self, raw_keys: list[str]) -> list[Any | None]:
+        if not raw_keys:
+            return []
+        try:
+            values = await get_many([self.key(raw) for raw in raw_keys])
+        except Exception as e:
+            logger.warning(f"Cache {self.name} read failed: {e}")
+            values = [None] * len(raw_keys)
+        results = []
+        for value in values:
+            record_cache(self.name, value is not None)
+            results.append(json.loads(value) if value is not None else None)
+        return results
+
+    async def set_many(self, items: dict[str, Any]) -> None:
+        if not items:
+            return
+        try:
+            await set_many(
+                {self.key(raw): json.dumps(value) for raw, value in items.items()},
+                ttl=self.ttl,
+            )
+        except Exception as e:
+            logger.warning(f"Cache {self.name} write failed: {e}")
+
+    async def get(self, raw_key: str) -> Any | None:
+        return (await self.get_many([raw_key]))[0]
+
+    async def set(self, raw_key: str, value: Any) -> None:
+        await self.set_many({raw_key: value})
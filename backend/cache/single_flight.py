@@ -0,0 +1,59 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Hashable, TypeVar
+
+from metrics import SINGLE_FLIGHT_CALLS
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """
+    Share one in-flight call between concurrent callers with the same key.
+
+    The first caller (the leader) starts the call as a task; callers arriving
+    before it finishes await the same task instead of repeating the work.
+    Nothing is kept once it finishes, so this only removes duplicates that
+    overlap in time, like many users asking the same question at once.
+    Callers are counted in `chatbot_single_flight_calls_total{call=name}` as
+    "leader" or "coalesced".
+
+    A caller that is cancelled stops waiting without cancelling the others;
+    the call itself is cancelled once no caller is left waiting for it.
+    Results are shared, so callers must not modify them.
+    """
+
+    def __init__(self, name: str, enabled: bool = True):
+        self.name = name
+        self.enabled = enabled
+        # Key -> (task, number of callers waiting for it)
+        self._calls: dict[Hashable, list[Any]] = {}
+
+    async def do(self, key: Hashable, call: Callable[[], Awaitable[T]]) -> T:
+        if not self.enabled:
+            return await call()
+        entry = self._calls.get(key)
+        if entry is None:
+            SINGLE_FLIGHT_CALLS.inc(call=self.name, result="leader")
+            task = asyncio.ensure_future(call())
+            entry = self._calls[key] = [task, 0]
+            task.add_done_callback(lambda _: self._forget(key, task))
+        else:
+            SINGLE_FLIGHT_CALLS.inc(call=self.name, result="coalesced")
+        task = entry[0]
+        entry[1] += 1
+        try:
+            return await asyncio.shield(task)
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0 and not task.done():
+                task.cancel()
+                # New callers start over rather than join the cancelled call
+                self._forget(key, task)
+
+    def _forget(self, key: Hashable, task: asyncio.Future) -> None:
+        if self._calls.get(key, [None])[0] is task:
+            del self._calls[key]
+        # Retrieve the exception of a call nobody waited for, so asyncio does
+        # not log it as never retrieved
+        if task.done() and not task.cancelled():
+            task.exception()
@@ -0,0 +1,61 @@
+import asyncio
+from typing import Awaitable, TypeVar
+
+from config import settings
+from fastapi import HTTPException, Request
+from logger import logger
+from metrics import CLIENT_DISCONNECTS
+
+T = TypeVar("T")
+
+
+class ClientDisconnected(HTTPException):
+    """
+    The client went away before its response was ready; the work was cancelled.
+
+    Responds with nginx's 499, which nobody receives but the request metrics
+    and logs record.
+    """
+
+    def __init__(self) -> None:
+        super().__init__(status_code=499, detail="Client closed request")
+
+
+async def _wait_for_disconnect(request: Request) -> None:
+    # Once the body is read, the server's next message is the disconnect
+    while (await request.receive())["type"] != "http.disconnect":
+        pass
+
+
+async def cancel_on_disconnect(request: Request, work: Awaitable[T]) -> T:
+    """
+    Await `work`, cancelling it if the client disconnects first.
+
+    The cancellation reaches whatever the work is awaiting (an OpenAI call, a
+    search, a database write), and the work's own `CancelledError` handlers
+    clean up before `ClientDisconnected` is raised. Disconnects are counted in
+    `chatbot_client_disconnects_total{handler}`.
+    """
+    if not settings.CANCEL_ON_DISCONNECT:
+        return await work
+    task = asyncio.ensure_future(work)
+    watcher = asyncio.create_task(_wait_for_disconnect(request))
+    try:
+        await asyncio.wait((task, watcher), return_when=asyncio.FIRST_COMPLETED)
+        if not task.done():
+            task.cancel()
+            # Let the work unwind, and its cleanup finish, before responding
+            await asyncio.gather(task, return_exceptions=True)
+            if task.cancelled():
+                handler = getattr(request.scope.get("endpoint"), "__name__", "")
+                CLIENT_DISCONNECTS.inc(handler=handler)
+                logger.info(
+                    f"Client disconnected, cancelled {request.method} "
+                    f"{request.url.path}"
+                )
+                raise ClientDisconnected()
+        return task.result()
+    finally:
+        watcher.cancel()
+        if not task.done():
+            task.cancel()
@@ -4,41 +4,65 @@ from datetime import datetime, timezone
 from typing import List, Union
 
 from bson.objectid import ObjectId
+from chat.context import ContextPacker
+from chat.rewriter import KeywordRewriter, get_query_rewriter
 from chat.schemas import AllChatMessage, ChatMessage, ChatMessageOut, ChatRole
 from config import settings
+from db.repositories import ChatMessageRepository, UserRepository
+from deadlines import Deadline, within
 from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
-from langchain_core.messages.base import BaseMessage
-from langchain_openai.chat_models import ChatOpenAI
+from llm.breaker import CircuitOpenError
+from llm.clients import get_chat_model
+from llm.scheduler import COMPLETION_TOKENS, estimate_tokens, get_scheduler
 from logger import logger
-from vector_db.qdrant import QdrantUtils
+from metrics import FALLBACK_COMPLETIONS, record_llm_usage, stage, timed
+from vector_db.qdrant import get_qdrant_utils
 
 GPT4 = "gpt-4o"
 
 
+def completion_model() -> str:
+    """
+    The model a chat completion started now goes to: gpt-4o, or
+    `CHAT_FALLBACK_MODEL` while gpt-4o's circuit is open. Raises
+    `CircuitOpenError` when neither would be called.
+    """
+    scheduler = get_scheduler()
+    if scheduler.available(GPT4):
+        return GPT4
+    fallback = settings.CHAT_FALLBACK_MODEL
+    if fallback and scheduler.available(fallback):
+        return fallback
+    breaker = scheduler.breaker(fallback or GPT4)
+    raise CircuitOpenError(breaker.name, breaker.retry_after())
+
+
 class Chat:
     def __init__(self, user_id: str, db):
-        self.db = db
+        self.chat_messages = ChatMessageRepository(db)
+        self.users = UserRepository(db)
         self.user_id = ObjectId(user_id)
-        self.qdrant_client = QdrantUtils(
-            url=settings.QDRANT_URL, api_key=settings.QDRANT_API_KEY
-        )
+        self.qdrant_client = get_qdrant_utils()
         self.messages: List[ChatMessage] = []
-        self.chat_model = ChatOpenAI(api_key=settings.OPENAI_API_KEY, model=GPT4)
+        # Set once a completion is being stored, after which the turn is kept
+        # even if it is cancelled
+        self.answering = False
+        self.query_rewriter = get_query_rewriter()
+        self.context_packer = ContextPacker(
+            GPT4, settings.CHAT_CONTEXT_TOKENS, settings.CHAT_EXCERPT_TOKENS
+        )
 
     async def get_messages(self):
-        async with self.db.chat_messages.find({"user_id": self.user_id}) as cursor:
-            return await cursor.sort("created_at", 1).to_list(length=None)
+        return await self.chat_messages.messages(self.user_id, list(ChatRole))
 
     async def initialize_task_chat(
         self,
     ) -> ChatMessageOut:
+        message = None
+        # Shed the request before doing any work if there is no model to answer
+        completion_model()
         try:
-            user_name_task = self.db.users.find_one({"_id": self.user_id}, {"name": 1})
-            # user_data_task = self.db.user_data.find_one(
-            #     {"user_id": self.user_id}, {"pdf_data": 1}
-            # )
-
-            user_name = await asyncio.gather(user_name_task)
+            user_name = await self.users.get_name(self.user_id)
 
             # TODO: Improve the System prompt for better response.
             system_prompt = (
@@ -74,18 +98,14 @@ class Chat:
                 "- Type 1 Diabetes.\n"
                 "- Major surgeries (past or planned).\n\n"
                 "### `knowledge-base` Context:\n"
-            ).format(user_name=user_name[0]["name"])
+            ).format(user_name=user_name)
 
-            message = await self.add_system_message(
-                content=system_prompt,
-                commit=True,
-            )
+            message = await self.add_system_message(content=system_prompt)
 
             message_history = await self.get_message_history()
 
-            completion = await self.chat_model.ainvoke(message_history)
-            message = await self.add_assistant_message(
-                content=str(completion.content), commit=True
+            message = await self.process_completion(
+                message_history, settings.CHAT_COMPLETION_TIMEOUT
             )
 
             return ChatMessageOut(
@@ -95,33 +115,24 @@ class Chat:
                 created_at=message["created_at"],
                 updated_at=message["updated_at"],
             )
+        except (asyncio.CancelledError, CircuitOpenError):
+            # Cancelled, or shed: leave no unanswered message in the history
+            await self.discard_unanswered(message)
+            raise
         except Exception:
             logger.error(f"Error: {traceback.format_exc()}")
             raise
 
+    @timed("message_write")
     async def add_message(
         self,
         role: str,
         content: str,
-        commit: bool = False,
     ):
         try:
-            datetime_now = datetime.now(timezone.utc)
-            message = {
-                "user_id": self.user_id,
-                "role": role,
-                "content": content,
-                "created_at": datetime_now,
-                "updated_at": datetime_now,
-            }
-
-            result = await self.db.chat_messages.insert_one(message)
-            message["_id"] = result.inserted_id
-
-            if commit:
-                await self.db.chat_messages.update_one(
-                    {"_id": message["_id"]}, {"$set": message}
-                )
+            message = await self.chat_messages.add(
+                self.user_id, role, content, datetime.now(timezone.utc)
+            )
 
             self.messages.append(
                 ChatMessage(
@@ -139,27 +150,40 @@ class Chat:
             logger.error(f"Error adding message: {traceback.format_exc()}")
             raise
 
-    async def add_system_message(self, content: str, commit: bool = True):
-        return await self.add_message(role="system", content=content, commit=commit)
+    async def add_system_message(self, content: str):
+        return await self.add_message(role="system", content=content)
+
+    async def add_user_message(self, content: str):
+        return await self.add_message(role="user", content=content)
 
-    async def add_user_message(self, content: str, commit: bool = True):
-        return await self.add_message(role="user", content=content, commit=commit)
+    async def add_assistant_message(self, content: str):
+        return await self.add_message(role="assistant", content=content)
 
-    async def add_assistant_message(self, content: str, commit: bool = True):
-        return await self.add_message(role="assistant", content=content, commit=commit)
+    async def add_answer(self, content: str):
+        # The completion is paid for: store it even if the turn is cancelled
+        # while the write is in flight
+        self.answering = True
+        return await asyncio.shield(self.add_assistant_message(content=content))
+
+    async def discard_unanswered(self, message) -> None:
+        """
+        Delete `message` when its turn was cancelled or shed before an answer
+        was stored, so the next turn's history does not carry it unanswered.
+        """
+        if message is None or self.answering:
+            return
+        await self.chat_messages.delete(message["_id"])
+        self.messages = [
+            stored for stored in self.messages if stored.id != str(message["_id"])
+        ]
+        logger.info(f"Turn ended unanswered, discarded {message['role']} message")
 
     async def get_all_messages_roles(self):
-        messages = (
-            await self.db.chat_messages.find({
-                "user_id": self.user_id,
-                "role": {"$in": [ChatRole.ASSISTANT, ChatRole.USER, ChatRole.SYSTEM]},
-            })
-            .sort("created_at", 1)
-            .to_list(length=None)
+        return await self.chat_messages.history(
+            self.user_id, [ChatRole.ASSISTANT, ChatRole.USER, ChatRole.SYSTEM]
         )
 
-        return messages
-
+    @timed("history_read")
     async def get_message_history(self):
         message_history: List[Union[HumanMessage, AIMessage, SystemMessage]] = []
         messages = await self.get_all_messages_roles()
@@ -172,62 +196,67 @@ class Chat:
                 message_history.append(SystemMessage(content=message["content"]))
         return message_history
 
+    @timed("query_rewrite")
     async def format_query_for_vector_search(
         self,
         query: str,
-    ) -> BaseMessage:
-        # Improved System Prompt for Vector Search
-        system_prompt = """You are tasked with formatting user queries for semantic vector search in Qdrant DB.
-        Follow these guidelines to ensure the query is optimized for accurate vector similarity matching:
-
-        ### Guidelines:
-        1. Retain all medical terms and conditions exactly as stated in the query.
-        2. Preserve specific plan names, numbers, and identifiers without modification.
-        3. Maintain temporal references (e.g., "current", "past 5 years") as they appear in the query.
-        4. Avoid adding or inferring information not explicitly present in the original query.
-        5. Ensure the output is concise, clear, and suitable for vector similarity search.
-
-        ### Example:
-        **Input:**
-        "Can someone with a history of heart disease in the last 3 years get America's Choice 2500 Gold plan?"
-
-        **Output:**
-        "heart disease medical history 3 years eligibility America's Choice 2500 Gold plan"
-        """
-        return await self.chat_model.ainvoke(
-            [SystemMessage(content=system_prompt), HumanMessage(content=query)],
-        )
+    ) -> str:
+        try:
+            return await self.query_rewriter.rewrite(query)
+        except Exception as e:
+            # Keep the turn going with the local rewrite instead of failing it
+            logger.error(f"Query rewrite ({self.query_rewriter.name}) failed: {e}")
+            return await KeywordRewriter().rewrite(query)
 
+    @timed("chat_turn")
     async def task_chat(
         self,
         user_message: str,
     ) -> ChatMessageOut:
+        question = None
+        # Shed the turn before storing the question if there is no model to answer
+        completion_model()
+        # Each stage gets its own timeout, cut short by what is left of the turn
+        deadline = Deadline(settings.CHAT_TURN_DEADLINE)
         try:
             # Add user message and get conversation history
-            await self.add_user_message(content=user_message)
+            question = await self.add_user_message(content=user_message)
             message_history = await self.get_message_history()
 
-            # Format query and perform vector search
-            formatted_query = await self.format_query_for_vector_search(user_message)
-            documents = await self.qdrant_client.search_documents(
-                collection_name=settings.QDRANT_COLLECTION_NAME,
-                query=str(formatted_query.content),
+            # Format query and perform vector search; a stage that runs out of
+            # time is skipped (local rewrite, no context) rather than waited on
+            formatted_query = await within(
+                "query_rewrite",
+                deadline.timeout(settings.CHAT_REWRITE_TIMEOUT),
+                self.format_query_for_vector_search(user_message),
+            )
+            if formatted_query is None:
+                formatted_query = await KeywordRewriter().rewrite(user_message)
+            documents = await within(
+                "retrieval",
+                deadline.timeout(settings.CHAT_RETRIEVAL_TIMEOUT),
+                self.qdrant_client.search_documents(
+                    collection_name=settings.QDRANT_COLLECTION_NAME,
+                    query=formatted_query,
+                ),
             )
+            if documents is None:
+                documents = []
 
             # Process retrieved documents
             if not documents:
                 logger.warning(
-                    f"No relevant documents found for query: {formatted_query.content}"
+                    f"No relevant documents found for query: {formatted_query}"
                 )
 
-            context = []
-            for idx, doc in enumerate(documents):
-                if not doc.payload:
-                    continue
-                context.append(
-                    f"[{idx + 1}] title: {doc.payload.get('title', 'No title')} "
-                    f"content: {doc.payload.get('excerpt', 'No content')}"
+            # Dedupe, trim and pack the excerpts into the context token budget
+            with stage("context_pack", documents=len(documents)):
+                packed = await asyncio.to_thread(
+                    self.context_packer.pack,
+                    formatted_query,
+                    documents,
                 )
+            context = packed.lines
 
             # Update system message with new context
             if context:
@@ -242,16 +271,33 @@ class Chat:
                     message_history[0] = SystemMessage(content=updated_content)
 
             # Log relevant information for debugging
-            logger.info({
-                "user_message": user_message,
-                "formatted_query": formatted_query.content,
-                "context_count": len(context),
-                "message_history_length": len(message_history),
-                "message_history": message_history,
-            })
+            logger.info(
+                "Chat context prepared",
+                extra={
+                    "context_count": len(context),
+                    "context_tokens": packed.tokens,
+                    "context_duplicates": packed.duplicates,
+                    "context_trimmed": packed.trimmed,
+                    "context_dropped": packed.dropped,
+                    "message_history_length": len(message_history),
+                },
+            )
+            # Full turn payload is large; it is sampled and serialized off-loop
+            logger.debug(
+                "Chat turn payload",
+                extra={
+                    "payload": {
+                        "user_message": user_message,
+                        "formatted_query": formatted_query,
+                        "message_history": message_history,
+                    }
+                },
+            )
 
             # Generate and process completion
-            message = await self.process_completion(message_history)
+            message = await self.process_completion(
+                message_history, deadline.timeout(settings.CHAT_COMPLETION_TIMEOUT)
+            )
 
             return ChatMessageOut(
                 id=str(message["_id"]),
@@ -261,18 +307,60 @@ class Chat:
                 updated_at=message["updated_at"],
             )
 
+        except (asyncio.CancelledError, CircuitOpenError):
+            # Cancelled, or shed: leave no unanswered message in the history
+            await self.discard_unanswered(question)
+            raise
         except Exception as e:
             logger.error(f"Error in task_chat: {str(e)}\n{traceback.format_exc()}")
             raise
 
-    async def process_completion(self, message_history):
+    async def schedule_completion(
+        self, message_history, model: str = GPT4, deadline: Deadline | None = None
+    ):
+        # Admitted against the shared rate limits, and retried, by the scheduler
+        return await get_scheduler().run(
+            model,
+            estimate_tokens(
+                (str(message.content) for message in message_history),
+                completion=COMPLETION_TOKENS,
+            ),
+            lambda: get_chat_model(model).ainvoke(message_history),
+            # A long answer is not an outage: only one using up its timeout is
+            slow_call=settings.CHAT_COMPLETION_TIMEOUT,
+            deadline=deadline,
+        )
+
+    async def complete(self, message_history, deadline: Deadline | None = None):
+        model = completion_model()
+        while True:
+            if model != GPT4:
+                FALLBACK_COMPLETIONS.inc(model=model)
+            try:
+                with stage("completion", model=model):
+                    completion = await self.schedule_completion(
+                        message_history, model, deadline
+                    )
+            except CircuitOpenError:
+                # gpt-4o's circuit opened while the turn was waiting for it
+                fallback = settings.CHAT_FALLBACK_MODEL
+                if model != GPT4 or not fallback:
+                    raise
+                model = fallback
+                continue
+            record_llm_usage(model, getattr(completion, "usage_metadata", None))
+            return completion
+
+    async def process_completion(self, message_history, timeout: float):
+        # Started before the timeout, so it has run out when the timeout fires
+        deadline = Deadline(timeout)
         try:
             completion = await asyncio.wait_for(
-                self.chat_model.ainvoke(message_history), timeout=30
-            )
-            return await self.add_assistant_message(
-                content=str(completion.content), commit=True
+                self.complete(message_history, deadline), timeout=timeout
             )
+            return await self.add_answer(content=str(completion.content))
+        except CircuitOpenError:
+            raise
         except asyncio.TimeoutError:
             logger.error("OpenAI API call timed out")
             raise
@@ -281,13 +369,8 @@ class Chat:
             raise
 
     async def get_all_messages(self) -> AllChatMessage:
-        messages = (
-            await self.db.chat_messages.find({
-                "user_id": self.user_id,
-                "role": {"$in": [ChatRole.ASSISTANT, ChatRole.USER]},
-            })
-            .sort("created_at", 1)
-            .to_list(length=None)
+        messages = await self.chat_messages.messages(
+            self.user_id, [ChatRole.ASSISTANT, ChatRole.USER]
         )
         return AllChatMessage(
             all_messages=[
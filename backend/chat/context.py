@@ -0,0 +1,176 @@
+import functools
+import math
+import re
+from dataclasses import dataclass, field
+from typing import Callable
+
+from logger import logger
+from qdrant_client import models
+from vector_db.sparse import sparse_encoder
+
+# Consecutive words compared when looking for overlapping excerpts
+SHINGLE_SIZE = 5
+# Share of the shorter excerpt's shingles found in a kept excerpt that makes
+# it a duplicate
+DUPLICATE_OVERLAP = 0.8
+# Trimmed excerpts are cut at sentence boundaries, and run-on text (tables,
+# lists) into windows of this many words
+WINDOW_WORDS = 40
+# Leftover budget below this is not filled with a heavily trimmed excerpt
+MIN_EXCERPT_TOKENS = 40
+GAP = " … "
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+
+@functools.cache
+def get_token_counter(model: str) -> Callable[[str], int]:
+    """
+    Return a function counting the tokens `model` would see for a text.
+
+    tiktoken downloads its encoding tables on first use. If that fails, counts
+    are estimated at four characters per token so chat keeps working.
+    """
+    try:
+        import tiktoken
+
+        encoding = tiktoken.encoding_for_model(model)
+    except Exception as e:
+        logger.warning(f"Token encoding for {model} unavailable, estimating: {e}")
+        return lambda text: math.ceil(len(text) / 4)
+    return lambda text: len(encoding.encode(text, disallowed_special=()))
+
+
+@dataclass
+class PackedContext:
+    lines: list[str] = field(default_factory=list)
+    # The points behind `lines`, in the same order
+    points: list[models.ScoredPoint] = field(default_factory=list)
+    tokens: int = 0
+    duplicates: int = 0
+    trimmed: int = 0
+    dropped: int = 0
+
+
+class ContextPacker:
+    """
+    Fit retrieved excerpts into a token budget for the chat prompt.
+
+    Points are taken in score order. Excerpts overlapping an already packed
+    one are skipped, excerpts over `excerpt_budget` (or the budget left) are
+    trimmed to their sentences that best match the query, and packing stops
+    once the budget is spent. The prompt size, and with it completion latency
+    and cost, is bounded however long the retrieved pages are.
+    """
+
+    def __init__(self, model: str, budget: int, excerpt_budget: int):
+        self.count = get_token_counter(model)
+        self.budget = budget
+        self.excerpt_budget = excerpt_budget
+
+    @staticmethod
+    def _shingles(text: str) -> set[tuple[str, ...]]:
+        words = text.lower().split()
+        if len(words) <= SHINGLE_SIZE:
+            return {tuple(words)}
+        return {
+            tuple(words[start : start + SHINGLE_SIZE])
+            for start in range(len(words) - SHINGLE_SIZE + 1)
+        }
+
+    @staticmethod
+    def _is_duplicate(
+        shingles: set[tuple[str, ...]], packed: list[set[tuple[str, ...]]]
+    ) -> bool:
+        return any(
+            len(shingles & other) >= DUPLICATE_OVERLAP * min(len(shingles), len(other))
+            for other in packed
+        )
+
+    @staticmethod
+    def _units(text: str) -> list[str]:
+        units = []
+        for sentence in _SENTENCE_END.split(text):
+            words = sentence.split()
+            units.extend(
+                " ".join(words[start : start + WINDOW_WORDS])
+                for start in range(0, len(words), WINDOW_WORDS)
+            )
+        return units
+
+    def trim(self, query_terms: set[str], text: str, budget: int) -> str:
+        """
+        Keep the sentences of `text` sharing the most terms with the query.
+
+        Sentences are chosen best first while they fit in `budget` tokens, then
+        put back in document order, with a marker where text was cut.
+        """
+        units = self._units(text)
+        relevance = [len(query_terms & set(sparse_encoder.tokenize(u))) for u in units]
+        gap_tokens = self.count(GAP)
+        chosen: list[int] = []
+        used = 0
+        for index in sorted(range(len(units)), key=lambda i: (-relevance[i], i)):
+            # Irrelevant text is only kept when nothing matches the query
+            if relevance[index] == 0 and chosen and relevance[chosen[0]] > 0:
+                break
+            cost = self.count(units[index]) + gap_tokens
+            if used + cost <= budget:
+                chosen.append(index)
+                used += cost
+
+        if not chosen:
+            return ""
+        parts: list[str] = []
+        previous = -1
+        for index in sorted(chosen):
+            if index != previous + 1:
+                parts.append(GAP.strip())
+            parts.append(units[index])
+            previous = index
+        if previous != len(units) - 1:
+            parts.append(GAP.strip())
+        return " ".join(parts)
+
+    def pack(self, query: str, points: list[models.ScoredPoint]) -> PackedContext:
+        packed = PackedContext()
+        query_terms = set(sparse_encoder.tokenize(query))
+        seen: list[set[tuple[str, ...]]] = []
+        for point in sorted(points, key=lambda point: point.score, reverse=True):
+            payload = point.payload or {}
+            excerpt = str(payload.get("excerpt") or "").strip()
+            if not excerpt:
+                continue
+            shingles = self._shingles(excerpt)
+            if self._is_duplicate(shingles, seen):
+                packed.duplicates += 1
+                continue
+
+            header = (
+                f"[{len(packed.lines) + 1}] title: {payload.get('title', 'No title')} "
+                "content: "
+            )
+            available = min(
+                self.excerpt_budget,
+                self.budget - packed.tokens - self.count(header),
+            )
+            if available < MIN_EXCERPT_TOKENS:
+                packed.dropped += 1
+                continue
+            if self.count(excerpt) > available:
+                excerpt = self.trim(query_terms, excerpt, available)
+                if not excerpt:
+                    packed.dropped += 1
+                    continue
+                packed.trimmed += 1
+
+            line = header + excerpt
+            tokens = self.count(line)
+            if packed.tokens + tokens > self.budget:
+                packed.dropped += 1
+                continue
+            seen.append(shingles)
+            packed.lines.append(line)
+            packed.points.append(point)
+            packed.tokens += tokens
+        return packed
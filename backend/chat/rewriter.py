@@ -0,0 +1,151 @@
+import functools
+from collections import OrderedDict
+from typing import Protocol
+
+from cache.redis_cache import RedisCache
+from config import settings
+from langchain_core.messages import HumanMessage, SystemMessage
+from llm.clients import get_chat_model
+from llm.scheduler import estimate_tokens, get_scheduler
+from metrics import record_cache, record_llm_usage
+from vector_db.sparse import sparse_encoder
+
+REWRITE_PROMPT = """You are tasked with formatting user queries for semantic vector search in Qdrant DB.
+        Follow these guidelines to ensure the query is optimized for accurate vector similarity matching:
+
+        ### Guidelines:
+        1. Retain all medical terms and conditions exactly as stated in the query.
+        2. Preserve specific plan names, numbers, and identifiers without modification.
+        3. Maintain temporal references (e.g., "current", "past 5 years") as they appear in the query.
+        4. Avoid adding or inferring information not explicitly present in the original query.
+        5. Ensure the output is concise, clear, and suitable for vector similarity search.
+
+        ### Example:
+        **Input:**
+        "Can someone with a history of heart disease in the last 3 years get America's Choice 2500 Gold plan?"
+
+        **Output:**
+        "heart disease medical history 3 years eligibility America's Choice 2500 Gold plan"
+        """  # noqa: E501
+
+
+class QueryRewriter(Protocol):
+    name: str
+
+    async def rewrite(self, query: str) -> str: ...
+
+
+class PassthroughRewriter:
+    name = "none"
+
+    async def rewrite(self, query: str) -> str:
+        return query
+
+
+class KeywordRewriter:
+    """
+    Reduce the query to its keywords without a model call.
+
+    Uses the sparse encoder's tokenizer and stop-word list, so the result keeps
+    exactly the terms sparse search matches on, in their original order.
+    Numbers and plan names survive; filler words and punctuation do not.
+    """
+
+    name = "keywords"
+
+    async def rewrite(self, query: str) -> str:
+        keywords = dict.fromkeys(sparse_encoder.tokenize(query))
+        return " ".join(keywords) or query
+
+
+class LLMRewriter:
+    """
+    Rewrite the query with a chat model, at the cost of a round trip.
+    """
+
+    def __init__(self, model: str):
+        self.model = model
+        self.name = f"llm:{model}"
+
+    async def rewrite(self, query: str) -> str:
+        response = await get_scheduler().run(
+            self.model,
+            estimate_tokens([REWRITE_PROMPT, query], completion=len(query)),
+            lambda: get_chat_model(self.model).ainvoke(
+                [SystemMessage(content=REWRITE_PROMPT), HumanMessage(content=query)],
+            ),
+        )
+        record_llm_usage(self.model, getattr(response, "usage_metadata", None))
+        return str(response.content)
+
+
+class CachedRewriter:
+    """
+    Serve repeated queries from earlier rewrites.
+
+    A per-worker LRU is checked first, then the Redis cache shared by all
+    workers. Queries are normalized (case, whitespace) before lookup, and
+    entries are keyed by the wrapped rewriter so changing the model does not
+    serve stale rewrites.
+    """
+
+    def __init__(self, inner: QueryRewriter, size: int, ttl: int | None):
+        self.inner = inner
+        self.name = f"{inner.name}+cache"
+        self.size = size
+        self.local: OrderedDict[str, str] = OrderedDict()
+        self.shared = RedisCache(f"query_rewrite:{inner.name}", ttl=ttl)
+
+    async def rewrite(self, query: str) -> str:
+        key = " ".join(query.lower().split())
+        if key in self.local:
+            self.local.move_to_end(key)
+            record_cache("query_rewrite_local", True)
+            return self.local[key]
+        record_cache("query_rewrite_local", False)
+
+        rewritten = await self.shared.get(key)
+        if rewritten is None:
+            rewritten = await self.inner.rewrite(query)
+            await self.shared.set(key, rewritten)
+        self.local[key] = rewritten
+        if len(self.local) > self.size:
+            self.local.popitem(last=False)
+        return rewritten
+
+
+def build_query_rewriter(
+    strategy: str, model: str, cache: bool = False
+) -> QueryRewriter:
+    """
+    Build the rewriter for `strategy`: "llm", "keywords" or "none".
+
+    `model` is the chat model for "llm"; a small model such as gpt-4o-mini
+    cuts the round trip. Only "llm" is worth caching.
+    """
+    if strategy == "none":
+        return PassthroughRewriter()
+    if strategy == "keywords":
+        return KeywordRewriter()
+    if strategy != "llm":
+        raise ValueError(f"Unknown query rewrite strategy: {strategy!r}")
+    rewriter = LLMRewriter(model)
+    if not cache:
+        return rewriter
+    return CachedRewriter(
+        rewriter,
+        size=settings.QUERY_REWRITE_CACHE_SIZE,
+        ttl=settings.QUERY_REWRITE_CACHE_TTL,
+    )
+
+
+@functools.cache
+def get_query_rewriter() -> QueryRewriter:
+    """
+    Return the process-wide rewriter configured by `QUERY_REWRITE_*`.
+    """
+    return build_query_rewriter(
+        settings.QUERY_REWRITE_STRATEGY,
+        settings.QUERY_REWRITE_MODEL,
+        cache=settings.QUERY_REWRITE_CACHE,
+    )
@@ -1,30 +1,44 @@
+import math
+
 from auth import dependencies as auth_deps
 from auth.schemas import ValidateRefreshTokenResponse
+from cancellation import cancel_on_disconnect
 from chat.chat import Chat
 from chat.schemas import AllChatMessage, ChatMessageOut
 from db import get_db
 from fastapi import APIRouter, Body, Depends, HTTPException, Request
+from llm.breaker import CircuitOpenError
 from logger import logger
+from metrics import SHED_REQUESTS
 
 router = APIRouter()
 
 
-# On event startup
-@router.on_event("startup")
-async def create_index():
-    db = get_db()
-    await db.chat_messages.create_index([("user_id", 1)])
+def _unavailable(handler: str, error: CircuitOpenError) -> HTTPException:
+    # Fail fast while the models are down, so workers stay free for the rest
+    SHED_REQUESTS.inc(handler=handler)
+    logger.warning(f"Shed {handler}: {error}")
+    return HTTPException(
+        status_code=503,
+        detail="The assistant is temporarily unavailable, please retry shortly.",
+        headers={"Retry-After": str(max(1, math.ceil(error.retry_after)))},
+    )
 
 
 @router.post("/chat/start")
 async def create_chat(
+    request: Request,
     user_id: ValidateRefreshTokenResponse = Depends(auth_deps.valid_refresh_token),
     db=Depends(get_db),
 ) -> ChatMessageOut:
     try:
         chat = Chat(user_id=user_id.user_id, db=db)
-        return await chat.initialize_task_chat()
+        return await cancel_on_disconnect(request, chat.initialize_task_chat())
 
+    except CircuitOpenError as e:
+        raise _unavailable("create_chat", e) from e
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error creating chat: {e}")
         raise HTTPException(
@@ -42,8 +56,12 @@ async def add_message_to_chat(
 ) -> ChatMessageOut:
     try:
         chat = Chat(user_id=user_id.user_id, db=db)
-        return await chat.task_chat(user_message=message)
+        return await cancel_on_disconnect(request, chat.task_chat(user_message=message))
 
+    except CircuitOpenError as e:
+        raise _unavailable("add_message_to_chat", e) from e
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error adding message to chat: {e}")
         raise HTTPException(
@@ -5,20 +5,87 @@ from pydantic import SecretStr
 
 
 class Config:
-    # Development-specific settings
-    DEBUG: bool = True
-    ENVIRONMENT: str = "DEV"
+    # Development-specific settings (DEBUG turns on auto-reload)
+    DEBUG: bool = (os.environ.get("DEBUG") or "false").lower() == "true"
+    ENVIRONMENT: str = os.environ.get("ENVIRONMENT") or "DEV"
 
     APP_VERSION: str = "0.1.0"
     PROJECT_NAME: str = "RAG_ChatBot_PoC"
     SITE_DOMAIN: str = "0.0.0.0"
 
+    # Server settings, used by gunicorn.conf.py in production
+    PORT: int = int(os.environ.get("PORT") or 8000)
+    WORKERS: int = int(os.environ.get("WEB_CONCURRENCY") or os.cpu_count() or 1)
+    # Seconds a stopping worker waits for in-flight requests (a chat turn makes
+    # two OpenAI calls with a 30s completion timeout) and background jobs
+    GRACEFUL_TIMEOUT: int = int(os.environ.get("GRACEFUL_TIMEOUT") or 75)
+    # Cancel a chat or search request's remaining work once its client is gone
+    CANCEL_ON_DISCONNECT: bool = (
+        os.environ.get("CANCEL_ON_DISCONNECT") or "true"
+    ).lower() == "true"
+
     # MongoDB URI
     MONGODB_URI: str | None = os.environ.get("MONGODB_URI")
+    # Connection pool per worker process; pymongo's default of 100 connections
+    # is far more than one worker's requests keep busy
+    MONGODB_MAX_POOL_SIZE: int = int(os.environ.get("MONGODB_MAX_POOL_SIZE") or 20)
+    MONGODB_MIN_POOL_SIZE: int = int(os.environ.get("MONGODB_MIN_POOL_SIZE") or 0)
+    MONGODB_MAX_IDLE_TIME_MS: int = int(
+        os.environ.get("MONGODB_MAX_IDLE_TIME_MS") or 60000
+    )
+    # Wire compression, in order of preference: "zlib", "zstd" (needs the
+    # zstandard package), "snappy" (needs python-snappy); empty disables it
+    MONGODB_COMPRESSORS: str = os.environ.get("MONGODB_COMPRESSORS", "zlib")
+
+    # Logging settings
+    LOG_LEVEL: str = (os.environ.get("LOG_LEVEL") or "INFO").upper()
+    LOG_FORMAT: str = os.environ.get("LOG_FORMAT") or "json"  # "json" or "text"
+    LOG_MAX_BYTES: int = int(os.environ.get("LOG_MAX_BYTES") or 10 * 1024 * 1024)
+    LOG_BACKUP_COUNT: int = int(os.environ.get("LOG_BACKUP_COUNT") or 5)
+    # Fraction of heavy debug payloads (e.g. full message history) that get logged
+    LOG_PAYLOAD_SAMPLE_RATE: float = float(
+        os.environ.get("LOG_PAYLOAD_SAMPLE_RATE") or 0.01
+    )
+
+    # Tracing settings: traces slower than the threshold are exported, to the
+    # OTLP/HTTP collector when an endpoint is set, otherwise to a JSONL file
+    TRACE_ENABLED: bool = (os.environ.get("TRACE_ENABLED") or "true").lower() == "true"
+    TRACE_SLOW_THRESHOLD_MS: float = float(
+        os.environ.get("TRACE_SLOW_THRESHOLD_MS") or 2000
+    )
+    TRACE_EXPORT_PATH: str = os.environ.get("TRACE_EXPORT_PATH") or os.path.join(
+        os.getcwd(), "logs", "traces", "slow_traces.jsonl"
+    )
+    # e.g. http://localhost:4318/v1/traces
+    TRACE_OTLP_ENDPOINT: str = os.environ.get("TRACE_OTLP_ENDPOINT") or ""
+    TRACE_MAX_CHILDREN: int = int(os.environ.get("TRACE_MAX_CHILDREN") or 256)
+
+    # Readiness: dependencies are probed in the background and /ready serves
+    # the cached result; warmup opens connections before the first request
+    READY_PROBE_INTERVAL: float = float(os.environ.get("READY_PROBE_INTERVAL") or 15)
+    READY_PROBE_TIMEOUT: float = float(os.environ.get("READY_PROBE_TIMEOUT") or 3)
+    WARMUP_ENABLED: bool = (
+        os.environ.get("WARMUP_ENABLED") or "true"
+    ).lower() == "true"
+    WARMUP_TIMEOUT: float = float(os.environ.get("WARMUP_TIMEOUT") or 10)
 
     # Redis settings
     REDIS_HOST: str = os.environ.get("REDIS_HOST", "localhost")
     REDIS_PORT: int = int(os.environ.get("REDIS_PORT", 6379))
+    # One pool per worker; requests wait up to the socket timeout for a free
+    # connection instead of opening unbounded ones
+    REDIS_MAX_CONNECTIONS: int = int(os.environ.get("REDIS_MAX_CONNECTIONS") or 50)
+    REDIS_SOCKET_TIMEOUT: float = float(os.environ.get("REDIS_SOCKET_TIMEOUT") or 2)
+    REDIS_HEALTH_CHECK_INTERVAL: int = int(
+        os.environ.get("REDIS_HEALTH_CHECK_INTERVAL") or 30
+    )
+
+    # State shared between workers through Redis
+    INGESTION_JOB_TTL: int = int(os.environ.get("INGESTION_JOB_TTL") or 24 * 60 * 60)
+    # Each worker publishes its metrics this often; /metrics sums all workers
+    METRICS_PUBLISH_INTERVAL: float = float(
+        os.environ.get("METRICS_PUBLISH_INTERVAL") or 5
+    )
 
     # CORS settings
     CORS_ORIGINS: list[str] = ["*"]
@@ -26,12 +93,139 @@ class Config:
 
     # OpenAI API Key
     OPENAI_API_KEY: SecretStr | None = SecretStr(os.environ.get("OPENAI_API_KEY", ""))
+    OPENAI_BASE_URL: str = (
+        os.environ.get("OPENAI_BASE_URL") or "https://api.openai.com/v1"
+    ).rstrip("/")
+    OPENAI_TIMEOUT: float = float(os.environ.get("OPENAI_TIMEOUT") or 60)
+    OPENAI_MAX_CONNECTIONS: int = int(os.environ.get("OPENAI_MAX_CONNECTIONS") or 100)
+    # Per-model limits shared by all workers through Redis, as "model=rpm/tpm"
+    # pairs, e.g. "gpt-4o=500/30000,text-embedding-3-small=3000/1000000".
+    # Unlisted models are not throttled, but every model pauses after a 429.
+    OPENAI_RATE_LIMITS: str = os.environ.get("OPENAI_RATE_LIMITS") or ""
+    OPENAI_MAX_RETRIES: int = int(os.environ.get("OPENAI_MAX_RETRIES") or 4)
+    # Share of each limit that background calls (ingestion) leave to chat
+    OPENAI_INTERACTIVE_RESERVE: float = float(
+        os.environ.get("OPENAI_INTERACTIVE_RESERVE") or 0.2
+    )
+    # Per-model circuit breakers: once CIRCUIT_FAILURE_RATE of at least
+    # CIRCUIT_MIN_CALLS calls in the last CIRCUIT_WINDOW_SECONDS failed (5xx,
+    # connection errors) or took over CIRCUIT_SLOW_CALL_SECONDS (embeddings
+    # and rewrites; CHAT_COMPLETION_TIMEOUT for chat completions), the model's
+    # calls fail at once for CIRCUIT_OPEN_SECONDS. Then CIRCUIT_HALF_OPEN_PROBES
+    # calls are let through, and close the circuit if they all succeed.
+    CIRCUIT_BREAKER_ENABLED: bool = (
+        os.environ.get("CIRCUIT_BREAKER_ENABLED") or "true"
+    ).lower() == "true"
+    CIRCUIT_WINDOW_SECONDS: float = float(
+        os.environ.get("CIRCUIT_WINDOW_SECONDS") or 30
+    )
+    CIRCUIT_MIN_CALLS: int = int(os.environ.get("CIRCUIT_MIN_CALLS") or 10)
+    CIRCUIT_FAILURE_RATE: float = float(os.environ.get("CIRCUIT_FAILURE_RATE") or 0.5)
+    CIRCUIT_SLOW_CALL_SECONDS: float = float(
+        os.environ.get("CIRCUIT_SLOW_CALL_SECONDS") or 10
+    )
+    CIRCUIT_OPEN_SECONDS: float = float(os.environ.get("CIRCUIT_OPEN_SECONDS") or 15)
+    CIRCUIT_HALF_OPEN_PROBES: int = int(os.environ.get("CIRCUIT_HALF_OPEN_PROBES") or 1)
+    # Chat completions go to this model (e.g. gpt-4o-mini) while gpt-4o's
+    # circuit is open; unset, chat requests are refused with a 503 instead
+    CHAT_FALLBACK_MODEL: str = os.environ.get("CHAT_FALLBACK_MODEL") or ""
 
     # Qdrant Config
     QDRANT_COLLECTION_NAME: str = os.environ.get("QDRANT_COLLECTION_NAME", "chatbot")
     QDRANT_API_KEY: str | None = os.environ.get("QDRANT_API_KEY", "")
     QDRANT_URL: str = os.environ.get("QDRANT_URL", "localhost")
 
+    # Embeddings for dense search: "openai", "local" (ONNX model on the CPU,
+    # from EMBEDDING_MODEL_PATH) or "hashing" (network-free, for tests). A
+    # collection records the provider and dimension it was created with.
+    EMBEDDING_PROVIDER: str = os.environ.get("EMBEDDING_PROVIDER") or "openai"
+    EMBEDDING_MODEL: str = os.environ.get("EMBEDDING_MODEL") or "text-embedding-3-small"
+    # For "openai" and "hashing"; a local model has its own
+    EMBEDDING_DIMENSIONS: int = int(os.environ.get("EMBEDDING_DIMENSIONS") or 1536)
+    # Directory with the local model's model.onnx and tokenizer.json
+    EMBEDDING_MODEL_PATH: str = os.environ.get("EMBEDDING_MODEL_PATH") or ""
+    EMBEDDING_BATCH_SIZE: int = int(os.environ.get("EMBEDDING_BATCH_SIZE") or 32)
+    EMBEDDING_MAX_LENGTH: int = int(os.environ.get("EMBEDDING_MAX_LENGTH") or 256)
+
+    # Storage profile and dense dimension of new collections (see
+    # vector_db/storage.py): "memory", "quantized" or "disk". A dimension of 0
+    # keeps the embedding provider's full size; text-embedding-3 models can be
+    # shortened, e.g. to 512.
+    QDRANT_STORAGE_PROFILE: str = os.environ.get("QDRANT_STORAGE_PROFILE") or "memory"
+    QDRANT_DENSE_DIMENSIONS: int = int(os.environ.get("QDRANT_DENSE_DIMENSIONS") or 0)
+    # How uploads extract page text: "text" (plain, fastest), "words" (word
+    # list through pymupdf4llm) or "markdown" (layout-aware, keeps tables)
+    PDF_EXTRACTION_MODE: str = os.environ.get("PDF_EXTRACTION_MODE") or "words"
+    # Pool processes a worker splits one PDF's pages across (0: one thread),
+    # for documents with at least PDF_EXTRACTION_MIN_PAGES pages per process
+    PDF_EXTRACTION_PROCESSES: int = int(os.environ.get("PDF_EXTRACTION_PROCESSES") or 0)
+    PDF_EXTRACTION_MIN_PAGES: int = int(os.environ.get("PDF_EXTRACTION_MIN_PAGES") or 8)
+    # Longest a bulk load waits for Qdrant to rebuild the index once indexing
+    # is switched back on, in seconds
+    QDRANT_BULK_LOAD_TIMEOUT: float = float(
+        os.environ.get("QDRANT_BULK_LOAD_TIMEOUT") or 600
+    )
+
+    # How chat turns rewrite the user message into a search query: "llm",
+    # "keywords" (local, no model call) or "none"
+    QUERY_REWRITE_STRATEGY: str = os.environ.get("QUERY_REWRITE_STRATEGY") or "llm"
+    QUERY_REWRITE_MODEL: str = os.environ.get("QUERY_REWRITE_MODEL") or "gpt-4o"
+    QUERY_REWRITE_CACHE: bool = (
+        os.environ.get("QUERY_REWRITE_CACHE") or "true"
+    ).lower() == "true"
+    QUERY_REWRITE_CACHE_SIZE: int = int(
+        os.environ.get("QUERY_REWRITE_CACHE_SIZE") or 1024
+    )
+    QUERY_REWRITE_CACHE_TTL: int = int(
+        os.environ.get("QUERY_REWRITE_CACHE_TTL") or 86400
+    )
+
+    # Token budget for retrieved excerpts in the chat prompt, in total and per
+    # excerpt
+    CHAT_CONTEXT_TOKENS: int = int(os.environ.get("CHAT_CONTEXT_TOKENS") or 2000)
+    CHAT_EXCERPT_TOKENS: int = int(os.environ.get("CHAT_EXCERPT_TOKENS") or 600)
+
+    # Time budget of one chat turn, in seconds, and the most of it the rewrite,
+    # the retrieval and the completion may take. A rewrite or retrieval that
+    # runs out is skipped (keyword rewrite, answer without context); the
+    # completion gets what is left, up to its own limit.
+    CHAT_TURN_DEADLINE: float = float(os.environ.get("CHAT_TURN_DEADLINE") or 40)
+    CHAT_REWRITE_TIMEOUT: float = float(os.environ.get("CHAT_REWRITE_TIMEOUT") or 3)
+    CHAT_RETRIEVAL_TIMEOUT: float = float(os.environ.get("CHAT_RETRIEVAL_TIMEOUT") or 5)
+    CHAT_COMPLETION_TIMEOUT: float = float(
+        os.environ.get("CHAT_COMPLETION_TIMEOUT") or 30
+    )
+
+    # Hedged requests: a search's embedding call or Qdrant query still running
+    # after the HEDGE_QUANTILE of that call's latencies in the worker is sent
+    # once more, and the first answer wins. Calls are only hedged once
+    # HEDGE_MIN_SAMPLES latencies are known, and never sooner than
+    # HEDGE_MIN_DELAY_MS.
+    HEDGE_ENABLED: bool = (os.environ.get("HEDGE_ENABLED") or "true").lower() == "true"
+    HEDGE_QUANTILE: float = float(os.environ.get("HEDGE_QUANTILE") or 0.95)
+    HEDGE_MIN_SAMPLES: int = int(os.environ.get("HEDGE_MIN_SAMPLES") or 50)
+    HEDGE_MIN_DELAY_MS: float = float(os.environ.get("HEDGE_MIN_DELAY_MS") or 20)
+
+    # Identical embedding, sparse-vector and search calls running at the same
+    # time in a worker share one call (see cache/single_flight.py)
+    SINGLE_FLIGHT_ENABLED: bool = (
+        os.environ.get("SINGLE_FLIGHT_ENABLED") or "true"
+    ).lower() == "true"
+
+    # Most queries accepted by one /qdrant/search/batch request
+    SEARCH_BATCH_MAX_QUERIES: int = int(
+        os.environ.get("SEARCH_BATCH_MAX_QUERIES") or 100
+    )
+
+    # Rerank stage after retrieval: "none", "lexical" or "cross_encoder"
+    RERANK_MODE: str = os.environ.get("RERANK_MODE") or "none"
+    # Candidates fetched from Qdrant per query when reranking
+    RERANK_CANDIDATES: int = int(os.environ.get("RERANK_CANDIDATES") or 30)
+    # Directory with the cross-encoder's model.onnx and tokenizer.json
+    RERANK_MODEL_PATH: str = os.environ.get("RERANK_MODEL_PATH") or ""
+    RERANK_BATCH_SIZE: int = int(os.environ.get("RERANK_BATCH_SIZE") or 16)
+    RERANK_MAX_LENGTH: int = int(os.environ.get("RERANK_MAX_LENGTH") or 512)
+
 
 settings = Config()
 
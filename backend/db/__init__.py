@@ -1,9 +1,54 @@
 from config import settings
+from logger import logger
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ASCENDING, IndexModel
 
-client = AsyncIOMotorClient(settings.MONGODB_URI)
+# connect=False defers the monitor threads to first use, so the client is safe
+# to create before gunicorn forks its workers.
+client = AsyncIOMotorClient(
+    settings.MONGODB_URI,
+    connect=False,
+    maxPoolSize=settings.MONGODB_MAX_POOL_SIZE,
+    minPoolSize=settings.MONGODB_MIN_POOL_SIZE,
+    maxIdleTimeMS=settings.MONGODB_MAX_IDLE_TIME_MS,
+    compressors=settings.MONGODB_COMPRESSORS or None,
+)
 db = client[settings.PROJECT_NAME]
 
+# Every index the queries in `db.repositories` rely on, by collection
+INDEXES: dict[str, list[IndexModel]] = {
+    "users": [IndexModel([("email", ASCENDING)], unique=True)],
+    "refresh_tokens": [
+        IndexModel([("refresh_token", ASCENDING)], unique=True),
+        # Mongo deletes tokens once they expire
+        IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0),
+    ],
+    # Serves the per-user history query, filter and sort
+    "chat_messages": [IndexModel([("user_id", ASCENDING), ("created_at", ASCENDING)])],
+}
+# Indexes that a declared one makes redundant, dropped when present
+RETIRED_INDEXES: dict[str, list[str]] = {"chat_messages": ["user_id_1"]}
+
 
 def get_db():
     return db
+
+
+async def ensure_indexes() -> None:
+    """
+    Create the declared indexes and drop retired ones.
+
+    Creating an index that exists is a no-op, so this runs on every startup.
+    A collection whose indexes fail (e.g. duplicate emails blocking the unique
+    index) is logged and the others still get theirs.
+    """
+    for collection, indexes in INDEXES.items():
+        try:
+            await db[collection].create_indexes(indexes)
+            existing = await db[collection].index_information()
+            for name in RETIRED_INDEXES.get(collection, []):
+                if name in existing:
+                    await db[collection].drop_index(name)
+                    logger.info(f"Dropped retired index {collection}.{name}")
+        except Exception as e:
+            logger.error(f"Failed to ensure indexes on {collection}: {e}")
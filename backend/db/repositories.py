@@ -0,0 +1,149 @@
+"""
+Data access for the MongoDB collections.
+
+Each query asks only for the fields its caller reads, so documents that grow
+(a chat message holds a whole system prompt or answer) do not cross the wire
+for a lookup that needs an id. Every call is timed into
+`chatbot_mongo_query_seconds{collection, operation}` and traced as a
+`mongo.<collection>.<operation>` span.
+"""
+
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Iterator
+
+from bson import ObjectId
+from db import get_db
+from metrics import MONGO_QUERY_LATENCY
+from tracing import span
+
+
+@contextmanager
+def timed_query(collection: str, operation: str) -> Iterator[None]:
+    start = time.perf_counter()
+    with span(f"mongo.{collection}.{operation}"):
+        try:
+            yield
+        finally:
+            MONGO_QUERY_LATENCY.observe(
+                time.perf_counter() - start,
+                collection=collection,
+                operation=operation,
+            )
+
+
+class Repository:
+    collection_name: str
+
+    def __init__(self, db=None):
+        # Resolved per call by default, so a swapped client (see
+        # `benchmarks.stand_ins`) is picked up
+        self._db = db
+
+    @property
+    def collection(self):
+        return (self._db if self._db is not None else get_db())[self.collection_name]
+
+    async def find_one(
+        self, operation: str, query: dict[str, Any], projection: dict[str, int]
+    ) -> dict[str, Any] | None:
+        with timed_query(self.collection_name, operation):
+            return await self.collection.find_one(query, projection)
+
+    async def insert(self, document: dict[str, Any]) -> ObjectId:
+        with timed_query(self.collection_name, "insert_one"):
+            result = await self.collection.insert_one(document)
+        return result.inserted_id
+
+
+class UserRepository(Repository):
+    collection_name = "users"
+
+    async def exists(self, email: str) -> bool:
+        user = await self.find_one("exists", {"email": email.lower()}, {"_id": 1})
+        return user is not None
+
+    async def get_credentials(self, email: str) -> dict[str, Any] | None:
+        """
+        The user's `_id`, `email` and password hash, for logging in.
+        """
+        return await self.find_one(
+            "get_credentials",
+            {"email": email.lower()},
+            {"_id": 1, "email": 1, "password": 1},
+        )
+
+    async def get_name(self, user_id: ObjectId) -> str | None:
+        user = await self.find_one("get_name", {"_id": user_id}, {"_id": 0, "name": 1})
+        return user["name"] if user else None
+
+
+class RefreshTokenRepository(Repository):
+    collection_name = "refresh_tokens"
+
+    async def get(self, refresh_token: str) -> dict[str, Any] | None:
+        """
+        The token's `_id`, `user_id` and `expires_at`.
+        """
+        return await self.find_one(
+            "get",
+            {"refresh_token": refresh_token},
+            {"_id": 1, "user_id": 1, "expires_at": 1},
+        )
+
+
+class ChatMessageRepository(Repository):
+    collection_name = "chat_messages"
+
+    async def _find(
+        self,
+        operation: str,
+        user_id: ObjectId,
+        roles: list[str],
+        projection: dict[str, int],
+    ) -> list[dict[str, Any]]:
+        with timed_query(self.collection_name, operation):
+            return (
+                await self.collection
+                .find({"user_id": user_id, "role": {"$in": roles}}, projection)
+                .sort("created_at", 1)
+                .to_list(length=None)
+            )
+
+    async def history(self, user_id: ObjectId, roles: list[str]) -> list[dict]:
+        """
+        `role` and `content` of the user's messages in `roles`, oldest first,
+        as the model's message history needs them.
+        """
+        return await self._find(
+            "history", user_id, roles, {"_id": 0, "role": 1, "content": 1}
+        )
+
+    async def messages(self, user_id: ObjectId, roles: list[str]) -> list[dict]:
+        """
+        The user's messages in `roles`, oldest first, as the client shows them.
+        """
+        return await self._find(
+            "messages",
+            user_id,
+            roles,
+            {"role": 1, "content": 1, "created_at": 1, "updated_at": 1},
+        )
+
+    async def add(
+        self, user_id: ObjectId, role: str, content: str, created_at: datetime
+    ) -> dict[str, Any]:
+        message = {
+            "user_id": user_id,
+            "role": role,
+            "content": content,
+            "created_at": created_at,
+            "updated_at": created_at,
+        }
+        message["_id"] = await self.insert(message)
+        return message
+
+    async def delete(self, message_id: ObjectId) -> None:
+        with timed_query(self.collection_name, "delete_one"):
+            await self.collection.delete_one({"_id": message_id})
@@ -0,0 +1,175 @@
+"""
+Deadline budgets and hedged requests, for keeping slow calls out of the tail.
+
+A `Deadline` is the time left for an operation, which its stages draw their
+timeouts from. `within` runs a stage that can be skipped when it runs out;
+`hedged` sends an idempotent call a second time when it is slower than usual
+and takes whichever answer comes first.
+"""
+
+import asyncio
+import contextvars
+import time
+from typing import Awaitable, Callable, TypeVar
+
+from config import settings
+from logger import logger
+from metrics import DEGRADED_STAGES, HEDGE_LATENCY, HEDGED_REQUESTS
+
+T = TypeVar("T")
+
+
+class Deadline:
+    """
+    A time budget shared by the stages of one operation, e.g. a chat turn.
+    """
+
+    def __init__(self, seconds: float):
+        self.expires = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires - time.monotonic())
+
+    def timeout(self, limit: float) -> float:
+        """
+        The stage's own `limit`, or less if the budget has less left.
+        """
+        return min(limit, self.remaining())
+
+
+async def within(stage: str, timeout: float, work: Awaitable[T]) -> T | None:
+    """
+    Await `work`, or cancel it and return None after `timeout` seconds.
+
+    For stages a caller can do without; skipped stages are counted in
+    `chatbot_degraded_stages_total{stage}`.
+    """
+    try:
+        return await asyncio.wait_for(work, timeout)
+    except asyncio.TimeoutError:
+        DEGRADED_STAGES.inc(stage=stage)
+        logger.warning(f"{stage} ran out of its {timeout:.2f}s deadline, skipped")
+        return None
+
+
+def hedge_delay(call: str) -> float | None:
+    """
+    How long an attempt of `call` may run before it is hedged: the
+    `HEDGE_QUANTILE` of its attempts in this worker. None while hedging is
+    off or too few attempts are known.
+    """
+    if (
+        not settings.HEDGE_ENABLED
+        or HEDGE_LATENCY.count(call=call) < settings.HEDGE_MIN_SAMPLES
+    ):
+        return None
+    quantile = HEDGE_LATENCY.quantile(settings.HEDGE_QUANTILE, call=call) or 0.0
+    return max(settings.HEDGE_MIN_DELAY_MS / 1000, quantile)
+
+
+class _Attempt:
+    """
+    When an attempt reached its service. Attempts count as admitted from the
+    start, unless their request waits in a queue first (see `queued`).
+    """
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.admitted = asyncio.Event()
+        self.admitted.set()
+
+    async def running_for(self, seconds: float) -> None:
+        """
+        Return once the attempt has been admitted for `seconds`.
+        """
+        while True:
+            await self.admitted.wait()
+            remaining = self.start + seconds - time.perf_counter()
+            if remaining <= 0 and self.admitted.is_set():
+                return
+            await asyncio.sleep(max(0.0, remaining))
+
+
+_attempt_var: contextvars.ContextVar[_Attempt | None] = contextvars.ContextVar(
+    "hedged_attempt", default=None
+)
+
+
+def queued() -> None:
+    """
+    Called by a request about to wait in a queue, e.g. for OpenAI rate limit
+    capacity: a hedged attempt's delay and latency do not count that wait.
+    """
+    attempt = _attempt_var.get()
+    if attempt is not None:
+        attempt.admitted.clear()
+
+
+def admitted() -> None:
+    """
+    Called by a request once it leaves its queue; see `queued`.
+    """
+    attempt = _attempt_var.get()
+    if attempt is not None and not attempt.admitted.is_set():
+        attempt.start = time.perf_counter()
+        attempt.admitted.set()
+
+
+async def _attempt(
+    call: str, request: Callable[[], Awaitable[T]], attempt: _Attempt
+) -> T:
+    token = _attempt_var.set(attempt)
+    try:
+        result = await request()
+    except asyncio.CancelledError:
+        # Usually the slower of two hedged attempts: it took at least this
+        # long, and leaving it out would drag the hedge delay down over time
+        if attempt.admitted.is_set():
+            HEDGE_LATENCY.observe(time.perf_counter() - attempt.start, call=call)
+        raise
+    finally:
+        _attempt_var.reset(token)
+    HEDGE_LATENCY.observe(time.perf_counter() - attempt.start, call=call)
+    return result
+
+
+async def hedged(call: str, request: Callable[[], Awaitable[T]]) -> T:
+    """
+    Await `request()`, starting it once more if the first attempt is still
+    running `hedge_delay(call)` after it was admitted. The first attempt to
+    answer wins and the other is cancelled; an attempt that fails leaves the
+    other to answer.
+
+    Only for idempotent requests: both attempts may reach the service.
+    Winners are counted in `chatbot_hedged_requests_total{call, winner}`.
+    """
+    delay = hedge_delay(call)
+    if delay is None:
+        return await _attempt(call, request, _Attempt())
+    first = _Attempt()
+    primary = asyncio.ensure_future(_attempt(call, request, first))
+    attempts = {primary: "primary"}
+    timer = asyncio.ensure_future(first.running_for(delay))
+    try:
+        await asyncio.wait({primary, timer}, return_when=asyncio.FIRST_COMPLETED)
+        if primary.done():
+            return primary.result()
+        hedge = asyncio.ensure_future(_attempt(call, request, _Attempt()))
+        attempts[hedge] = "hedge"
+        pending: set[asyncio.Future] = set(attempts)
+        error: BaseException | None = None
+        while pending:
+            done, pending = await asyncio.wait(
+                pending, return_when=asyncio.FIRST_COMPLETED
+            )
+            for attempt in done:
+                if attempt.exception() is None:
+                    HEDGED_REQUESTS.inc(call=call, winner=attempts[attempt])
+                    return attempt.result()
+                error = error or attempt.exception()
+        assert error is not None
+        raise error
+    finally:
+        timer.cancel()
+        for attempt in attempts:
+            attempt.cancel()
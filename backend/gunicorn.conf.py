@@ -0,0 +1,43 @@
+"""
+Production server settings: `gunicorn -c gunicorn.conf.py main:app`.
+
+The app is imported once in the master (`preload_app`) and forked into
+`WEB_CONCURRENCY` uvicorn workers. State shared between requests (ingestion
+job status, metrics) lives in Redis, so any worker can serve any request.
+"""
+
+from contextlib import suppress
+
+with suppress(ImportError):
+    from dotenv import find_dotenv, load_dotenv
+
+    load_dotenv(find_dotenv())
+
+from config import settings  # noqa: E402
+
+bind = f"{settings.SITE_DOMAIN}:{settings.PORT}"
+workers = settings.WORKERS
+worker_class = "uvicorn_worker.UvicornWorker"
+preload_app = True
+
+# On SIGTERM a worker stops accepting connections and finishes in-flight
+# requests (and background ingestion jobs) before it is killed.
+graceful_timeout = settings.GRACEFUL_TIMEOUT
+# Chat turns are long-running; only kill workers that stop heartbeating.
+timeout = settings.GRACEFUL_TIMEOUT * 2
+keepalive = 5
+
+
+def when_ready(server):
+    # Runs in the master after the app is preloaded and before any worker is
+    # forked. Modules the app imports lazily are imported once here, so every
+    # worker starts with them instead of importing its own copy.
+    import health
+
+    health.import_lazy_modules()
+
+
+def post_fork(server, worker):
+    import logger
+
+    logger.restart_logs_in_worker()
@@ -0,0 +1,197 @@
+import asyncio
+import importlib
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable
+
+import anyio
+import db
+from cache.client import check_redis, open_redis
+from chat.chat import GPT4
+from chat.context import get_token_counter
+from config import settings
+from llm.clients import ping_openai
+from logger import logger
+from starlette.applications import Starlette
+from vector_db.qdrant import get_qdrant_utils
+from vector_db.rerank import get_reranker
+
+
+async def _probe_mongo() -> None:
+    await db.get_db().command("ping")
+
+
+async def _probe_redis() -> None:
+    status = await check_redis(timeout=settings.READY_PROBE_TIMEOUT)
+    if status["status"] != "ok":
+        raise ConnectionError(status["error"])
+
+
+async def _probe_qdrant() -> None:
+    await get_qdrant_utils().qdrant_client.get_collections()
+
+
+@dataclass
+class Probe:
+    check: Callable[[], Awaitable[None]]
+    # Optional dependencies are reported but do not make the app unready
+    required: bool = True
+    result: dict[str, Any] = field(default_factory=lambda: {"status": "unknown"})
+
+
+class DependencyMonitor:
+    """
+    Probe every dependency in the background and keep the latest results.
+
+    `/ready` serves the cached report, so load balancer polling never reaches
+    the dependencies and a slow dependency cannot make the endpoint slow.
+    """
+
+    def __init__(self, probes: dict[str, Probe]):
+        self.probes = probes
+        self.warmed_up = False
+        self._task: asyncio.Task | None = None
+
+    async def _run(self, name: str, probe: Probe) -> None:
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(probe.check(), timeout=settings.READY_PROBE_TIMEOUT)
+            result: dict[str, Any] = {"status": "ok"}
+        except Exception as e:
+            result = {"status": "error", "error": f"{type(e).__name__}: {e}"}
+            if probe.result.get("status") != "error":
+                logger.warning(f"Dependency {name} is unhealthy: {result['error']}")
+        result["latency_ms"] = round((time.perf_counter() - start) * 1000, 2)
+        result["checked_at"] = datetime.now(timezone.utc).isoformat()
+        result["required"] = probe.required
+        probe.result = result
+
+    async def probe_all(self) -> None:
+        await asyncio.gather(
+            *(self._run(name, probe) for name, probe in self.probes.items())
+        )
+
+    async def _loop(self) -> None:
+        while True:
+            await asyncio.sleep(settings.READY_PROBE_INTERVAL)
+            await self.probe_all()
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def report(self) -> tuple[bool, dict[str, Any]]:
+        ready = self.warmed_up and all(
+            probe.result.get("status") == "ok"
+            for probe in self.probes.values()
+            if probe.required
+        )
+        return ready, {
+            "status": "ready" if ready else "not_ready",
+            "warmed_up": self.warmed_up,
+            "dependencies": {name: probe.result for name, probe in self.probes.items()},
+        }
+
+
+monitor = DependencyMonitor({
+    "mongo": Probe(_probe_mongo),
+    "qdrant": Probe(_probe_qdrant),
+    # Required whatever EMBEDDING_PROVIDER is: chat completions and query
+    # rewrites always go to OpenAI (or the server at OPENAI_BASE_URL)
+    "openai": Probe(ping_openai),
+    # The app degrades without Redis (no job status, per-worker metrics)
+    "redis": Probe(_probe_redis, required=False),
+})
+
+
+# Modules the request path imports on first use rather than with the app,
+# because each takes hundreds of milliseconds (see `benchmarks.import_time`).
+# Neither the probes nor the warmup steps need them. pymupdf4llm is left out
+# on purpose: it is not safe to import before a fork.
+LAZY_MODULES = (
+    "openai",
+    "langchain_openai.chat_models",
+    "sklearn.feature_extraction.text",
+    "pymupdf",
+)
+
+
+def import_lazy_modules() -> None:
+    start = time.perf_counter()
+    for name in LAZY_MODULES:
+        importlib.import_module(name)
+    logger.info(
+        "Lazy modules imported",
+        extra={"duration_ms": round((time.perf_counter() - start) * 1000, 2)},
+    )
+
+
+async def _warm_qdrant() -> None:
+    # Creating the shared client makes a blocking version check; keep it off
+    # the event loop.
+    utils = await asyncio.to_thread(get_qdrant_utils)
+    # The collection is created for the configured embedding provider; a local
+    # model is loaded here too
+    await asyncio.to_thread(getattr, utils, "embedder")
+    await utils.create_collection(settings.QDRANT_COLLECTION_NAME)
+    await utils.warm_up(settings.QDRANT_COLLECTION_NAME)
+
+
+async def _warm_openai() -> None:
+    # Opens (and keeps alive) the TLS connection chat and embeddings share
+    await ping_openai()
+
+
+async def _warm_routes(app: Starlette) -> None:
+    # Route dependency graphs are built when routes are declared; what the
+    # first request pays for (about 20ms) is importing anyio's asyncio backend,
+    # which the middleware and the threadpool for sync dependencies use, and
+    # building the middleware stack. Both are done directly, so no request
+    # shows up in the logs or the HTTP metrics.
+    anyio.get_cancelled_exc_class()
+    await anyio.to_thread.run_sync(lambda: None)
+    app.middleware_stack = app.build_middleware_stack()
+
+
+async def warmup(app: Starlette) -> None:
+    """
+    Open connection pools and create missing collections and indexes.
+
+    Steps run concurrently and failures are only logged: the app still starts,
+    and `/ready` reports the dependency as unhealthy until a probe succeeds.
+    """
+    steps: dict[str, Callable[[], Awaitable[Any]]] = {
+        "redis": open_redis,
+        "mongo_indexes": db.ensure_indexes,
+        "qdrant_collection": _warm_qdrant,
+        "openai_connection": _warm_openai,
+        "routes": lambda: _warm_routes(app),
+        # Loads (or downloads) the encoding the chat context is counted with
+        "token_counter": lambda: asyncio.to_thread(get_token_counter, GPT4),
+        # Loads the cross-encoder, if configured, in this worker
+        "reranker": lambda: asyncio.to_thread(get_reranker),
+    }
+
+    async def run(name: str, step: Callable[[], Awaitable[Any]]) -> float:
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(step(), timeout=settings.WARMUP_TIMEOUT)
+        except Exception as e:
+            logger.error(f"Warmup step {name} failed: {type(e).__name__}: {e}")
+        return round((time.perf_counter() - start) * 1000, 2)
+
+    start = time.perf_counter()
+    durations = await asyncio.gather(*(run(name, step) for name, step in steps.items()))
+    logger.info(
+        "Warmup completed",
+        extra={
+            "duration_ms": round((time.perf_counter() - start) * 1000, 2),
+            "steps_ms": dict(zip(steps, durations)),
+        },
+    )
@@ -0,0 +1,188 @@
+import time
+from collections import deque
+from enum import Enum
+from typing import Awaitable, Callable, TypeVar
+
+from deadlines import Deadline
+from logger import logger
+from metrics import CIRCUIT_REJECTED, CIRCUIT_STATE, CIRCUIT_TRANSITIONS
+
+T = TypeVar("T")
+
+
+class CircuitState(str, Enum):
+    CLOSED = "closed"
+    HALF_OPEN = "half_open"
+    OPEN = "open"
+
+
+# Exported as `chatbot_circuit_state`; workers combine by max, the worst state
+_STATE_VALUES = {
+    CircuitState.CLOSED: 0,
+    CircuitState.HALF_OPEN: 1,
+    CircuitState.OPEN: 2,
+}
+
+
+class CircuitOpenError(Exception):
+    """
+    A call was refused because its circuit is open; `retry_after` is the
+    number of seconds until the circuit lets a probe through.
+    """
+
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"Circuit {name} is open, retry in {retry_after:.1f}s")
+        self.name = name
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    Fail calls to a dependency fast while it is failing, instead of waiting
+    for each one to time out.
+
+    Outcomes of the calls finished in the last `window` seconds are kept; once
+    there are `min_calls` of them and `failure_rate` of them failed, the
+    circuit opens and every call is refused with `CircuitOpenError`. Calls
+    slower than `slow_call` count as failed, so do errors `is_failure`
+    accepts and calls cancelled by their caller's timeout; calls that are slow
+    by nature, like chat completions, pass their own threshold. A call
+    cancelled otherwise, e.g. when the client goes away, is not counted.
+    After `open_seconds` the circuit is half-open: up to `probes` calls go
+    through, and the circuit closes when they all succeed or opens again when
+    one fails; a probe cancelled early only frees its place.
+
+    State is kept per worker and exported as `chatbot_circuit_state{breaker}`
+    (0 closed, 1 half-open, 2 open).
+    """
+
+    def __init__(
+        self,
+        name: str,
+        window: float = 30.0,
+        min_calls: int = 10,
+        failure_rate: float = 0.5,
+        slow_call: float = 10.0,
+        open_seconds: float = 15.0,
+        probes: int = 1,
+        is_failure: Callable[[Exception], bool] = lambda error: True,
+    ):
+        self.name = name
+        self.window = window
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.slow_call = slow_call
+        self.open_seconds = open_seconds
+        self.probes = probes
+        self.is_failure = is_failure
+        # (finished at, failed) for the calls in the window
+        self._outcomes: deque[tuple[float, bool]] = deque()
+        self._state = CircuitState.CLOSED
+        self._opened_at = 0.0
+        self._probing = 0
+        self._probed = 0
+        CIRCUIT_STATE.set(0, breaker=name)
+
+    @property
+    def state(self) -> CircuitState:
+        if (
+            self._state == CircuitState.OPEN
+            and time.monotonic() >= self._opened_at + self.open_seconds
+        ):
+            self._transition(CircuitState.HALF_OPEN)
+        return self._state
+
+    def retry_after(self) -> float:
+        return max(0.0, self._opened_at + self.open_seconds - time.monotonic())
+
+    def allows(self) -> bool:
+        """
+        Whether a call made now would be let through.
+        """
+        state = self.state
+        return state == CircuitState.CLOSED or (
+            state == CircuitState.HALF_OPEN and self._probing < self.probes
+        )
+
+    def check(self) -> None:
+        """
+        Raise `CircuitOpenError` if a call made now would be refused.
+        """
+        if not self.allows():
+            CIRCUIT_REJECTED.inc(breaker=self.name)
+            raise CircuitOpenError(self.name, self.retry_after())
+
+    async def call(
+        self,
+        request: Callable[[], Awaitable[T]],
+        slow_call: float | None = None,
+        deadline: Deadline | None = None,
+    ) -> T:
+        """
+        Await `request()` if the circuit lets it through, and record how it went.
+        The call counts as failed if it takes `slow_call` seconds (default the
+        breaker's) or more, or is cancelled once the caller's `deadline` has
+        run out, e.g. by the `asyncio.wait_for` enforcing it.
+        """
+        self.check()
+        slow_call = slow_call or self.slow_call
+        probe = self._state == CircuitState.HALF_OPEN
+        self._probing += probe
+        start = time.monotonic()
+        # None when the call says nothing about the dependency
+        failed: bool | None = True
+        try:
+            result = await request()
+            failed = time.monotonic() - start >= slow_call
+            return result
+        except Exception as e:
+            failed = self.is_failure(e)
+            raise
+        except BaseException:
+            # Cancelled: by a timeout, a failure; by a disconnect, unknown
+            timed_out = deadline is not None and not deadline.remaining()
+            failed = time.monotonic() - start >= slow_call or timed_out or None
+            raise
+        finally:
+            self._probing = max(0, self._probing - probe)
+            if failed is not None:
+                self._record(failed, probe)
+
+    def _record(self, failed: bool, probe: bool) -> None:
+        now = time.monotonic()
+        if self._state == CircuitState.HALF_OPEN and probe:
+            if failed:
+                self._open(now)
+            else:
+                self._probed += 1
+                if self._probed >= self.probes:
+                    self._outcomes.clear()
+                    self._transition(CircuitState.CLOSED)
+            return
+        if self._state != CircuitState.CLOSED:
+            # Calls let through before the circuit opened
+            return
+        self._outcomes.append((now, failed))
+        while self._outcomes and self._outcomes[0][0] < now - self.window:
+            self._outcomes.popleft()
+        calls = len(self._outcomes)
+        failures = sum(failed for _, failed in self._outcomes)
+        if calls >= self.min_calls and failures >= self.failure_rate * calls:
+            logger.warning(
+                f"Circuit {self.name} opens: {failures} of the last {calls} calls "
+                "failed or were slow"
+            )
+            self._open(now)
+
+    def _open(self, now: float) -> None:
+        self._opened_at = now
+        self._outcomes.clear()
+        self._transition(CircuitState.OPEN)
+
+    def _transition(self, state: CircuitState) -> None:
+        if state == CircuitState.HALF_OPEN:
+            self._probing, self._probed = 0, 0
+        logger.info(f"Circuit {self.name}: {self._state.value} -> {state.value}")
+        self._state = state
+        CIRCUIT_STATE.set(_STATE_VALUES[state], breaker=self.name)
+        CIRCUIT_TRANSITIONS.inc(breaker=self.name, state=state.value)
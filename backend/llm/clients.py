@@ -0,0 +1,81 @@
+import functools
+from typing import TYPE_CHECKING
+
+import httpx
+from config import settings
+
+# The SDKs are imported when the first client is built, not with the app:
+# together they take over a second to import.
+if TYPE_CHECKING:
+    from langchain_openai.chat_models import ChatOpenAI
+    from openai import AsyncOpenAI
+
+
+@functools.cache
+def get_http_client() -> httpx.AsyncClient:
+    """
+    Return the HTTP connection pool shared by every OpenAI client of a worker.
+
+    Building a client costs an SSL context and each new connection a TLS
+    handshake, so they are created once per process (after the fork, on first
+    use) and kept warm instead of per request.
+    """
+    return httpx.AsyncClient(
+        timeout=httpx.Timeout(settings.OPENAI_TIMEOUT, connect=5.0),
+        limits=httpx.Limits(
+            max_connections=settings.OPENAI_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.OPENAI_MAX_CONNECTIONS,
+            keepalive_expiry=60,
+        ),
+    )
+
+
+@functools.cache
+def get_openai_client() -> "AsyncOpenAI":
+    from openai import AsyncOpenAI
+
+    api_key = settings.OPENAI_API_KEY
+    return AsyncOpenAI(
+        api_key=api_key.get_secret_value() if api_key else None,
+        base_url=settings.OPENAI_BASE_URL,
+        http_client=get_http_client(),
+        # Retries go through `llm.scheduler`, which shares rate limits
+        max_retries=0,
+    )
+
+
+@functools.cache
+def get_chat_model(model: str) -> "ChatOpenAI":
+    from langchain_openai.chat_models import ChatOpenAI
+
+    return ChatOpenAI(
+        api_key=settings.OPENAI_API_KEY,
+        model=model,
+        base_url=settings.OPENAI_BASE_URL,
+        http_async_client=get_http_client(),
+        max_retries=0,
+    )
+
+
+async def ping_openai() -> None:
+    """
+    Fetch the embedding model's metadata over the shared pool, without the SDK.
+
+    Used by the readiness probe and warmup, which run before the SDK has been
+    imported.
+    """
+    api_key = settings.OPENAI_API_KEY
+    response = await get_http_client().get(
+        f"{settings.OPENAI_BASE_URL}/models/{settings.EMBEDDING_MODEL}",
+        headers={
+            "Authorization": f"Bearer {api_key.get_secret_value() if api_key else ''}"
+        },
+    )
+    response.raise_for_status()
+
+
+async def close_clients() -> None:
+    if get_http_client.cache_info().currsize:
+        await get_http_client().aclose()
+    for cached in (get_http_client, get_openai_client, get_chat_model):
+        cached.cache_clear()
@@ -0,0 +1,396 @@
+import asyncio
+import contextvars
+import functools
+import math
+import random
+import re
+import time
+from contextlib import contextmanager
+from enum import Enum
+from typing import Any, Awaitable, Callable, Iterable, Iterator, NamedTuple, TypeVar
+
+from cache.client import get_redis
+from config import settings
+from deadlines import Deadline, admitted, queued
+from llm.breaker import CircuitBreaker
+from logger import logger
+from metrics import OPENAI_QUEUE_TIME, OPENAI_RETRIES
+
+T = TypeVar("T")
+
+KEY_PREFIX = "openai:ratelimit"
+# Buckets hold this many seconds of a limit, so bursts stay within what the
+# API enforces over its shorter windows
+BURST_SECONDS = 1.0
+# Completion tokens assumed for a chat call; OpenAI counts them towards the
+# token limit before the completion exists
+COMPLETION_TOKENS = 500
+# Full-jitter exponential backoff between attempts, in seconds
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 20.0
+# Longest wait taken from rate-limit headers before retrying
+RETRY_DELAY_MAX = 60.0
+
+_DURATION = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+# Takes one request and ARGV[3] tokens from the model's buckets, or returns
+# the milliseconds until they are available. ARGV[4] is the share of each
+# bucket the caller must leave for interactive calls. A model with no limits
+# only honours the shared pause set after a 429. A call costing more than the
+# bucket holds waits for a full bucket and is charged in full: the bucket goes
+# negative, and later calls wait until it has refilled.
+_ACQUIRE = """
+local pause = redis.call('PTTL', KEYS[2])
+if pause > 0 then return pause end
+local rpm = tonumber(ARGV[1])
+local tpm = tonumber(ARGV[2])
+if rpm <= 0 and tpm <= 0 then return 0 end
+local burst = tonumber(ARGV[5])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) * 1000 + math.floor(tonumber(clock[2]) / 1000)
+local rate_requests = rpm / 60000
+local rate_tokens = tpm / 60000
+local cap_requests = math.max(1, rate_requests * burst)
+local cap_tokens = math.max(1, rate_tokens * burst)
+local state = redis.call('HMGET', KEYS[1], 'requests', 'tokens', 'ts')
+local requests = tonumber(state[1]) or cap_requests
+local tokens = tonumber(state[2]) or cap_tokens
+local elapsed = math.max(0, now - (tonumber(state[3]) or now))
+requests = math.min(cap_requests, requests + elapsed * rate_requests)
+tokens = math.min(cap_tokens, tokens + elapsed * rate_tokens)
+local cost = tonumber(ARGV[3])
+local reserve = tonumber(ARGV[4])
+local wait = 0
+if rpm > 0 and requests < 1 + reserve * cap_requests then
+    wait = math.max(wait, (1 + reserve * cap_requests - requests) / rate_requests)
+end
+local needed = math.min(cost, cap_tokens) + reserve * cap_tokens
+if tpm > 0 and tokens < needed then
+    wait = math.max(wait, (needed - tokens) / rate_tokens)
+end
+if wait == 0 then
+    requests = requests - 1
+    tokens = tokens - cost
+end
+-- Keep a bucket in debt until it has refilled, or the debt would be forgotten
+local debt = 0
+if tokens < 0 and rate_tokens > 0 then debt = -tokens / rate_tokens end
+redis.call('HSET', KEYS[1], 'requests', requests, 'tokens', tokens, 'ts', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(burst * 2000 + debt))
+return math.ceil(wait)
+"""
+
+
+class Priority(str, Enum):
+    INTERACTIVE = "interactive"
+    BACKGROUND = "background"
+
+
+class RateLimit(NamedTuple):
+    requests_per_minute: int
+    tokens_per_minute: int
+
+
+_priority: contextvars.ContextVar[Priority] = contextvars.ContextVar(
+    "openai_priority", default=Priority.INTERACTIVE
+)
+
+
+@contextmanager
+def openai_priority(priority: Priority) -> Iterator[None]:
+    """
+    Run the OpenAI calls made inside the block (and in tasks started from it)
+    with `priority`. Calls are interactive by default.
+    """
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def parse_rate_limits(value: str) -> dict[str, RateLimit]:
+    """
+    Parse `OPENAI_RATE_LIMITS`: "model=rpm/tpm,...", e.g.
+    "gpt-4o=500/30000,text-embedding-3-small=3000/1000000".
+    """
+    limits = {}
+    for item in value.split(","):
+        if not item.strip():
+            continue
+        model, _, limit = item.partition("=")
+        requests, _, tokens = limit.partition("/")
+        limits[model.strip()] = RateLimit(int(requests or 0), int(tokens or 0))
+    return limits
+
+
+def estimate_tokens(texts: Iterable[str], completion: int = 0) -> int:
+    """
+    Estimate the tokens a request counts against the limit, at four
+    characters per token: cheap, and close enough for accounting.
+    """
+    return math.ceil(sum(len(text) for text in texts) / 4) + completion
+
+
+def _header_delay(headers: Any) -> float:
+    if headers is None:
+        return 0.0
+    if headers.get("retry-after-ms"):
+        return float(headers["retry-after-ms"]) / 1000
+    try:
+        return float(headers.get("retry-after") or "")
+    except ValueError:
+        pass
+    delay = 0.0
+    for kind in ("requests", "tokens"):
+        if headers.get(f"x-ratelimit-remaining-{kind}") == "0":
+            reset = headers.get(f"x-ratelimit-reset-{kind}") or ""
+            delay = max(
+                delay,
+                sum(
+                    float(amount) * _UNITS[unit]
+                    for amount, unit in _DURATION.findall(reset)
+                ),
+            )
+    return delay
+
+
+def retry_reason(error: Exception) -> str | None:
+    """
+    Classify a failed call as "rate_limit", "connection" or "server_error", or
+    None if the error is not worth retrying.
+    """
+    import openai
+
+    if isinstance(error, openai.RateLimitError):
+        # An exhausted quota does not recover by waiting
+        if getattr(error, "code", None) == "insufficient_quota":
+            return None
+        return "rate_limit"
+    if isinstance(error, openai.APIConnectionError):
+        return "connection"
+    if isinstance(error, openai.APIStatusError) and (
+        error.status_code >= 500 or error.status_code in (408, 409)
+    ):
+        return "server_error"
+    return None
+
+
+def retry_delay(error: Exception, attempt: int) -> tuple[float, str] | None:
+    """
+    Return how long to wait before retrying a failed call, and why, or None if
+    the error is not worth retrying.
+
+    Waits are full-jitter exponential backoff, but never shorter than the
+    rate-limit headers of the response ask for.
+    """
+    reason = retry_reason(error)
+    if reason is None:
+        return None
+    backoff = random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2**attempt))
+    response = getattr(error, "response", None)
+    header = min(RETRY_DELAY_MAX, _header_delay(getattr(response, "headers", None)))
+    return max(backoff, header * random.uniform(1.0, 1.1)), reason
+
+
+class _LocalBucket:
+    """
+    The `_ACQUIRE` accounting for one worker, used while Redis is unreachable.
+    """
+
+    def __init__(self, limit: RateLimit):
+        self.limit = limit
+        self.requests = self.capacity(limit.requests_per_minute)
+        self.tokens = self.capacity(limit.tokens_per_minute)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+
+    @staticmethod
+    def capacity(per_minute: int) -> float:
+        return max(1.0, per_minute / 60 * BURST_SECONDS)
+
+    def acquire(self, cost: int, reserve: float) -> float:
+        now = time.monotonic()
+        if now < self.paused_until:
+            return self.paused_until - now
+        rpm, tpm = self.limit
+        if rpm <= 0 and tpm <= 0:
+            return 0.0
+        elapsed, self.updated = now - self.updated, now
+        cap_requests, cap_tokens = self.capacity(rpm), self.capacity(tpm)
+        self.requests = min(cap_requests, self.requests + elapsed * rpm / 60)
+        self.tokens = min(cap_tokens, self.tokens + elapsed * tpm / 60)
+        wait = 0.0
+        if rpm > 0 and self.requests < 1 + reserve * cap_requests:
+            wait = (1 + reserve * cap_requests - self.requests) * 60 / rpm
+        needed = min(cost, cap_tokens) + reserve * cap_tokens
+        if tpm > 0 and self.tokens < needed:
+            wait = max(wait, (needed - self.tokens) * 60 / tpm)
+        if wait == 0:
+            self.requests -= 1
+            self.tokens -= cost
+        return wait
+
+
+class OpenAIScheduler:
+    """
+    Admit OpenAI calls against per-model request and token limits shared by
+    all workers, and retry the ones that fail transiently.
+
+    Each call first takes one request and its estimated tokens from the
+    model's token buckets in Redis, waiting for the refill when they are
+    empty. Background calls (ingestion) must leave `reserve` of each bucket,
+    so interactive calls (chat, search) get through first during bulk loads.
+    A 429 pauses the model for every worker for as long as the response's
+    rate-limit headers ask. Without Redis each worker keeps its own buckets
+    at its share of the limits.
+
+    Each model also has a circuit breaker (see `llm.breaker`): while a model
+    keeps failing or timing out, its calls and their retries fail at once
+    with `CircuitOpenError` rather than queue for it.
+    """
+
+    def __init__(
+        self, limits: dict[str, RateLimit], max_retries: int = 4, reserve: float = 0.2
+    ):
+        self.limits = limits
+        self.max_retries = max_retries
+        self.reserve = reserve
+        self._local: dict[str, _LocalBucket] = {}
+        self._breakers: dict[str, CircuitBreaker] = {}
+        self._redis_available = True
+
+    def _local_bucket(self, model: str) -> _LocalBucket:
+        bucket = self._local.get(model)
+        if bucket is None:
+            rpm, tpm = self.limits.get(model, RateLimit(0, 0))
+            workers = max(1, settings.WORKERS)
+            bucket = self._local[model] = _LocalBucket(
+                RateLimit(math.ceil(rpm / workers), math.ceil(tpm / workers))
+            )
+        return bucket
+
+    def breaker(self, model: str) -> CircuitBreaker:
+        breaker = self._breakers.get(model)
+        if breaker is None:
+            breaker = self._breakers[model] = CircuitBreaker(
+                model,
+                window=settings.CIRCUIT_WINDOW_SECONDS,
+                min_calls=settings.CIRCUIT_MIN_CALLS,
+                failure_rate=settings.CIRCUIT_FAILURE_RATE,
+                slow_call=settings.CIRCUIT_SLOW_CALL_SECONDS,
+                open_seconds=settings.CIRCUIT_OPEN_SECONDS,
+                probes=settings.CIRCUIT_HALF_OPEN_PROBES,
+                # Rate limits are waited out here, not a sign of an outage
+                is_failure=lambda error: (
+                    retry_reason(error) in ("connection", "server_error")
+                ),
+            )
+        return breaker
+
+    def available(self, model: str) -> bool:
+        """
+        Whether a call to `model` made now would get past its circuit breaker.
+        """
+        return not settings.CIRCUIT_BREAKER_ENABLED or self.breaker(model).allows()
+
+    def _redis_failed(self, error: Exception) -> None:
+        if self._redis_available:
+            logger.warning(
+                f"OpenAI rate limits fall back to per-worker accounting: {error}"
+            )
+        self._redis_available = False
+
+    async def _try_acquire(self, model: str, tokens: int, reserve: float) -> float:
+        rpm, tpm = self.limits.get(model, RateLimit(0, 0))
+        try:
+            wait_ms = await get_redis().register_script(_ACQUIRE)(
+                keys=[f"{KEY_PREFIX}:{model}", f"{KEY_PREFIX}:{model}:pause"],
+                args=[rpm, tpm, tokens, reserve, BURST_SECONDS * 1000],
+            )
+        except Exception as e:
+            self._redis_failed(e)
+            return self._local_bucket(model).acquire(tokens, reserve)
+        if not self._redis_available:
+            logger.info("OpenAI rate limits are shared through Redis again")
+            self._redis_available = True
+        return int(wait_ms) / 1000
+
+    async def _acquire(self, model: str, tokens: int, priority: Priority) -> None:
+        reserve = self.reserve if priority == Priority.BACKGROUND else 0.0
+        start = time.perf_counter()
+        while (wait := await self._try_acquire(model, tokens, reserve)) > 0:
+            # Background callers oversleep a little, so interactive callers
+            # waiting on the same refill get it first
+            stretch = 1.0 if priority == Priority.INTERACTIVE else 1.25
+            await asyncio.sleep(wait * stretch * random.uniform(1.0, 1.1))
+        OPENAI_QUEUE_TIME.observe(
+            time.perf_counter() - start, model=model, priority=priority.value
+        )
+
+    async def _pause(self, model: str, seconds: float) -> None:
+        self._local_bucket(model).paused_until = time.monotonic() + seconds
+        try:
+            await get_redis().set(
+                f"{KEY_PREFIX}:{model}:pause", 1, px=max(1, int(seconds * 1000))
+            )
+        except Exception as e:
+            self._redis_failed(e)
+
+    async def run(
+        self,
+        model: str,
+        tokens: int,
+        call: Callable[[], Awaitable[T]],
+        slow_call: float | None = None,
+        deadline: Deadline | None = None,
+    ) -> T:
+        """
+        Await `call()` once `model` has capacity for `tokens`, retrying
+        transient failures. `call` must start a new request on every call.
+        Raises `CircuitOpenError` without calling while `model`'s circuit is
+        open; a call taking `slow_call` seconds (default
+        `CIRCUIT_SLOW_CALL_SECONDS`), or cancelled once the caller's
+        `deadline` has run out, counts against it like an error.
+        """
+        priority = _priority.get()
+        breaker = self.breaker(model) if settings.CIRCUIT_BREAKER_ENABLED else None
+        for attempt in range(self.max_retries + 1):
+            if breaker:
+                breaker.check()
+            # Waiting for capacity is not the service being slow: hedges wait
+            queued()
+            await self._acquire(model, tokens, priority)
+            admitted()
+            try:
+                return await (
+                    breaker.call(call, slow_call, deadline) if breaker else call()
+                )
+            except Exception as e:
+                retry = retry_delay(e, attempt)
+                if retry is None or attempt == self.max_retries:
+                    raise
+                delay, reason = retry
+                OPENAI_RETRIES.inc(model=model, reason=reason)
+                logger.warning(
+                    f"OpenAI {model} call failed ({reason}), retrying in {delay:.2f}s"
+                )
+                if reason == "rate_limit":
+                    await self._pause(model, delay)
+                else:
+                    await asyncio.sleep(delay)
+        raise AssertionError("unreachable")
+
+
+@functools.cache
+def get_scheduler() -> OpenAIScheduler:
+    """
+    Return the worker's scheduler, configured by `OPENAI_RATE_LIMITS`,
+    `OPENAI_MAX_RETRIES` and `OPENAI_INTERACTIVE_RESERVE`.
+    """
+    return OpenAIScheduler(
+        parse_rate_limits(settings.OPENAI_RATE_LIMITS),
+        max_retries=settings.OPENAI_MAX_RETRIES,
+        reserve=settings.OPENAI_INTERACTIVE_RESERVE,
+    )
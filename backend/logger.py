@@ -1,7 +1,13 @@
+import atexit
+import copy
+import json
 import logging
+import logging.handlers
 import os
+import queue
+import random
 from contextlib import suppress  # type: ignore
-from datetime import datetime, timedelta  # type: ignore
+from datetime import datetime, timedelta, timezone  # type: ignore
 
 # from botocore.exceptions import ClientError
 
@@ -10,39 +16,172 @@ with suppress(ImportError):
 
     load_dotenv(find_dotenv())
 
+from config import settings  # noqa: E402
+from tracing import TraceContextFilter  # noqa: E402
 
-def create_logs():
+TEXT_FORMAT = "[%(asctime)s] %(lineno)d - %(filename)s - %(name)s - %(levelname)s - %(funcName)s - %(message)s"
+
+# Attributes every LogRecord carries; anything else was passed through `extra`.
+_RESERVED_ATTRS = frozenset(
+    vars(logging.LogRecord("", logging.INFO, "", 0, "", None, None))
+) | {"message", "asctime", "taskName"}
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Render log records as one JSON object per line.
+
+    Fields passed through `extra` are emitted as top-level keys, so callers can
+    attach structured data without formatting it into the message. Values that
+    are not JSON serializable fall back to their `repr`, which only happens on
+    the listener thread.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "file": record.filename,
+            "line": record.lineno,
+            "func": record.funcName,
+            "message": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=repr, ensure_ascii=False)
+
+
+class PayloadSampler(logging.Filter):
+    """
+    Keep only a fraction of the records that carry a heavy `payload` extra.
+
+    Runs on the caller side of the queue, so dropped payloads are never
+    enqueued or serialized. Records without a payload always pass.
+    """
+
+    def __init__(self, rate: float) -> None:
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if getattr(record, "payload", None) is None:
+            return True
+        return self.rate >= 1 or random.random() < self.rate
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    Queue records without formatting them on the calling thread.
+
+    The stock `QueueHandler.prepare` merges `msg % args` before enqueueing,
+    which would put the cost of large reprs back on the event loop. Records are
+    passed through untouched instead and formatted by the listener thread, so
+    arguments must not be mutated after the logging call.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        if record.exc_info:
+            # Tracebacks hold live frames; render them while they are valid.
+            record = copy.copy(record)
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+_listener: logging.handlers.QueueListener | None = None
+
+
+def create_logs(file_suffix: str = ""):
     """
     Create logs for the application.
 
-    This function sets up the logging configuration for the application. It creates a logger object and configures it to write logs to both a local log file and AWS CloudWatch. The logs are stored in a directory named after the current date, and the log file is named after the current time. The log file path is returned.
+    Records are pushed onto an in-memory queue by the root logger and written by
+    a background listener thread, so request handlers never block on disk I/O.
+    Files live in a directory named after the current date and rotate once they
+    reach `LOG_MAX_BYTES`.
     """
+    global _listener
+
     logger = logging.getLogger(__name__)
     now = datetime.now()
 
     LOG_FILE_FOLDER = now.strftime("%m_%d_%Y")
-    LOG_FILE = now.strftime("%H-%M-%S") + ".log"
+    LOG_FILE = now.strftime("%H-%M-%S") + file_suffix + ".log"
 
     logs_path = os.path.join(os.getcwd(), "logs", LOG_FILE_FOLDER)
     os.makedirs(logs_path, exist_ok=True)
 
     LOG_FILE_PATH = os.path.join(logs_path, LOG_FILE)
 
-    logging.basicConfig(
-        filename=LOG_FILE_PATH,
-        format="[%(asctime)s] %(lineno)d - %(filename)s - %(name)s - %(levelname)s - %(funcName)s - %(message)s",
-        level=logging.INFO,
+    file_handler = logging.handlers.RotatingFileHandler(
+        LOG_FILE_PATH,
+        maxBytes=settings.LOG_MAX_BYTES,
+        backupCount=settings.LOG_BACKUP_COUNT,
+        encoding="utf-8",
+    )
+    file_handler.setFormatter(
+        JsonFormatter()
+        if settings.LOG_FORMAT == "json"
+        else logging.Formatter(TEXT_FORMAT)
+    )
+
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    queue_handler = DeferredQueueHandler(log_queue)
+    queue_handler.addFilter(PayloadSampler(settings.LOG_PAYLOAD_SAMPLE_RATE))
+    queue_handler.addFilter(TraceContextFilter())
+
+    root = logging.getLogger()
+    root.addHandler(queue_handler)
+    root.setLevel(settings.LOG_LEVEL)
+
+    _listener = logging.handlers.QueueListener(
+        log_queue, file_handler, respect_handler_level=True
     )
+    _listener.start()
+    atexit.register(stop_logs)
 
     # Set the log level
-    logger.setLevel(logging.INFO)
-
-    # Cleanup old logs
-    cleanup_old_logs()
+    logger.setLevel(settings.LOG_LEVEL)
 
     return logger
 
 
+def stop_logs():
+    """
+    Flush queued records and stop the listener thread.
+    """
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def restart_logs_in_worker():
+    """
+    Give a forked worker process its own listener thread and log file.
+
+    Threads do not survive `fork`, so records queued by a preloaded app would
+    never be written. Each worker also needs a file of its own, since rotation
+    is not safe across processes.
+    """
+    global _listener
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        if isinstance(handler, DeferredQueueHandler):
+            root.removeHandler(handler)
+    if _listener is not None:
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+    create_logs(file_suffix=f"-{os.getpid()}")
+
+
 def cleanup_old_logs():
     """
     Deletes old log files and folders that are more than 4 days old.
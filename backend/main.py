@@ -1,57 +1,62 @@
-import signal
+import asyncio
+import time
 from contextlib import asynccontextmanager
-from typing import AsyncGenerator
+from typing import Any, AsyncGenerator
 
-import redis
+import health
+import metrics
+import tracing
 from auth.router import router as auth_router
+from cache.client import check_redis, close_redis
 from chat.router import router as chat_router
 from config import app_configs, settings
 from fastapi import FastAPI, Request
-from fastapi.responses import JSONResponse
-from logger import logger
+from fastapi.responses import JSONResponse, PlainTextResponse
+from llm.clients import close_clients
+from logger import cleanup_old_logs, logger
 from starlette.middleware.cors import CORSMiddleware
+from vector_db import jobs
+from vector_db.extraction import close_extraction_pool
 from vector_db.router import router as vector_db_router
 
 logger.info("Starting application")
 
 
-# Redis connection verification
-async def verify_redis_connection(redis_url: str) -> bool:
-    try:
-        redis_client = redis.from_url(url=redis_url)
-        redis_client.ping()
-        logger.info("Redis connection successful")
-        redis_client.close()
-        return True
-    except Exception as e:
-        logger.error(f"Redis connection failed: {str(e)}")
-        return False
-
-
-# Graceful shutdown handler
-def handle_shutdown(signum, frame):
-    logger.info("Received shutdown signal")
-    raise SystemExit(0)
-
-
-signal.signal(signal.SIGTERM, handle_shutdown)
-signal.signal(signal.SIGINT, handle_shutdown)
-
-redis_client = redis.StrictRedis(
-    host=settings.REDIS_HOST or "localhost",
-    port=settings.REDIS_PORT or 6379,
-    decode_responses=True,
-)
-
-
+# Shutdown is driven by the server: on SIGTERM uvicorn stops accepting
+# connections and waits for in-flight requests before running the lifespan
+# cleanup below, which then drains background ingestion jobs.
 @asynccontextmanager
-async def lifespan(_application: FastAPI) -> AsyncGenerator:
-    # Startup
+async def lifespan(application: FastAPI) -> AsyncGenerator:
+    # Startup: connect and create indexes before taking traffic, so the first
+    # request does not pay for it
+    # Old log folders are removed in the background rather than at import
+    background = [asyncio.create_task(asyncio.to_thread(cleanup_old_logs))]
+    if settings.WARMUP_ENABLED:
+        await health.warmup(application)
+    health.monitor.warmed_up = True
+    await health.monitor.probe_all()
+    health.monitor.start()
+    # Heavy modules are imported once the worker is ready rather than before:
+    # a request that needs one early only waits for the rest of its import.
+    # Under gunicorn they are already imported in the master.
+    if settings.WARMUP_ENABLED:
+        background.append(
+            asyncio.create_task(asyncio.to_thread(health.import_lazy_modules))
+        )
+    metrics_publisher = asyncio.create_task(metrics.publish_forever())
     try:
         yield
     except Exception as e:
         logger.error(f"Lifespan error: {str(e)}")
     finally:
+        logger.info("Shutting down, draining background work")
+        await jobs.drain(timeout=settings.GRACEFUL_TIMEOUT)
+        await asyncio.gather(*background, return_exceptions=True)
+        metrics_publisher.cancel()
+        await health.monitor.stop()
+        await close_clients()
+        close_extraction_pool()
+        await close_redis()
         logger.info("Lifespan cleanup completed")
 
 
@@ -71,8 +76,37 @@ app.add_middleware(
 # Request logging middleware
 @app.middleware("http")
 async def log_requests(request: Request, call_next):
-    logger.info(f"Request: {request.method} {request.url}")
-    response = await call_next(request)
+    start = time.perf_counter()
+    root_span = tracing.start_trace(
+        f"{request.method} {request.url.path}",
+        traceparent=request.headers.get("traceparent"),
+        method=request.method,
+        path=request.url.path,
+    )
+    try:
+        response = await call_next(request)
+    except Exception as e:
+        root_span.error = f"{type(e).__name__}: {e}"
+        tracing.finish_trace(root_span)
+        raise
+    duration = time.perf_counter() - start
+    # Label by endpoint name rather than raw path to keep cardinality bounded
+    handler = getattr(request.scope.get("endpoint"), "__name__", "unmatched")
+    metrics.HTTP_REQUEST_LATENCY.observe(
+        duration, method=request.method, handler=handler, status=response.status_code
+    )
+    logger.info(
+        "Request: %s %s",
+        request.method,
+        request.url,
+        extra={
+            "status_code": response.status_code,
+            "duration_ms": round(duration * 1000, 2),
+        },
+    )
+    root_span.set_attribute("status_code", response.status_code)
+    response.headers["X-Trace-Id"] = root_span.trace_id
+    tracing.finish_trace(root_span)
     return response
 
 
@@ -83,31 +117,50 @@ async def global_exception_handler(request: Request, exc: Exception):
     return JSONResponse(status_code=500, content={"detail": "Internal server error"})
 
 
-# Health check endpoint
+# Health check endpoint; the app stays up without Redis, so only report it
 @app.get("/health", include_in_schema=False)
-async def healthcheck() -> dict[str, str]:
+async def healthcheck() -> dict[str, Any]:
     logger.info("Healthcheck")
     return {
         "status": "ok",
         "version": settings.APP_VERSION,
         "project_name": settings.PROJECT_NAME,
+        "redis": await check_redis(),
     }
 
 
+# Readiness endpoint: cached results of the background dependency probes
+@app.get("/ready", include_in_schema=False)
+async def readiness() -> JSONResponse:
+    ready, report = health.monitor.report()
+    return JSONResponse(content=report, status_code=200 if ready else 503)
+
+
+# Metrics endpoint (Prometheus text format), summed over all workers
+@app.get("/metrics", include_in_schema=False)
+async def metrics_endpoint() -> PlainTextResponse:
+    return PlainTextResponse(
+        await metrics.render_shared(),
+        media_type="text/plain; version=0.0.4; charset=utf-8",
+    )
+
+
 # Include routers
 app.include_router(auth_router, tags=["Auth"], prefix="/auth")
 app.include_router(chat_router, tags=["Chat"], prefix="/chatbot")
 app.include_router(vector_db_router, tags=["Vector DB"], prefix="/qdrant")
 
+# Development server; production runs gunicorn with gunicorn.conf.py
 if __name__ == "__main__":
     import uvicorn
 
     config = uvicorn.Config(
         "main:app",
         host=settings.SITE_DOMAIN,
-        port=8000,
+        port=settings.PORT,
         log_level="info",
         reload=settings.DEBUG,
+        timeout_graceful_shutdown=settings.GRACEFUL_TIMEOUT,
     )
 
     server = uvicorn.Server(config)
@@ -0,0 +1,505 @@
+import asyncio
+import copy
+import functools
+import inspect
+import json
+import logging
+import os
+import socket
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Any, Callable, Iterable, Iterator
+
+import tracing
+from cache.client import get_redis
+from config import settings
+
+log = logging.getLogger(__name__)
+
+WORKER_KEY_PREFIX = "metrics:worker:"
+
+# Latency buckets in seconds, covering sub-millisecond cache hits up to the
+# 30s completion timeout.
+DEFAULT_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+)
+
+# Finer than the default around 10ms-1s, where hedging delays are read off
+HEDGE_BUCKETS = (
+    0.005,
+    0.01,
+    0.02,
+    0.03,
+    0.05,
+    0.075,
+    0.1,
+    0.15,
+    0.2,
+    0.3,
+    0.5,
+    0.75,
+    1.0,
+    1.5,
+    2.5,
+    5.0,
+    10.0,
+)
+
+
+class _Metric:
+    TYPE = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _key(self, labels: dict[str, Any]) -> tuple:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def _format_labels(self, key: tuple, extra: str = "") -> str:
+        pairs = [
+            f'{name}="{_escape(value)}"' for name, value in zip(self.labelnames, key)
+        ]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def header(self) -> list[str]:
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.TYPE}",
+        ]
+
+    def snapshot(self) -> list:
+        """
+        Return the current values as JSON-serializable `[labels, value]` pairs.
+        """
+        with self._lock:
+            return [
+                [list(key), copy.deepcopy(value)] for key, value in self._values.items()
+            ]
+
+    def combine(self, current: Any, other: Any) -> Any:
+        raise NotImplementedError
+
+    def merged(self, snapshots: Iterable[dict[str, list]]) -> dict[tuple, Any]:
+        """
+        Combine the local values with other processes' snapshots.
+        """
+        with self._lock:
+            values = copy.deepcopy(self._values)
+        for snapshot in snapshots:
+            for key, value in snapshot.get(self.name, []):
+                key = tuple(key)
+                values[key] = (
+                    self.combine(values[key], value) if key in values else value
+                )
+        return values
+
+    def render(self, values: dict[tuple, Any] | None = None) -> list[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    TYPE = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: dict[tuple, float] = {}
+
+    def inc(self, amount: float = 1, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels: Any) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def combine(self, current: float, other: float) -> float:
+        return current + other
+
+    def render(self, values: dict[tuple, Any] | None = None) -> list[str]:
+        lines = self.header()
+        for key, value in sorted((self._values if values is None else values).items()):
+            lines.append(f"{self.name}{self._format_labels(key)} {value}")
+        return lines
+
+
+class Gauge(Counter):
+    """
+    A value that can go up and down.
+
+    `aggregate` decides how values from several worker processes combine:
+    "sum" for quantities such as in-flight requests, "max" or "min" for states.
+    """
+
+    TYPE = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple = (),
+        aggregate: str = "sum",
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.aggregate = aggregate
+
+    def combine(self, current: float, other: float) -> float:
+        if self.aggregate == "max":
+            return max(current, other)
+        if self.aggregate == "min":
+            return min(current, other)
+        return current + other
+
+    def set(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(_Metric):
+    TYPE = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple = (),
+        buckets: tuple = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [bucket counts (+Inf last), sum, count]
+        self._values: dict[tuple, list] = {}
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    @contextmanager
+    def time(self, **labels: Any) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels: Any) -> int:
+        entry = self._values.get(self._key(labels))
+        return entry[2] if entry else 0
+
+    def quantile(self, q: float, **labels: Any) -> float | None:
+        """
+        Estimate the `q` quantile (0-1) of this worker's observations, by linear
+        interpolation within the bucket it falls in, as Prometheus'
+        `histogram_quantile` does. None without observations; the largest
+        finite bound when it falls in the +Inf bucket.
+        """
+        with self._lock:
+            entry = self._values.get(self._key(labels))
+            counts = list(entry[0]) if entry else []
+        total = sum(counts)
+        if not total:
+            return None
+        rank = q * total
+        cumulative, lower = 0, 0.0
+        for upper, count in zip(self.buckets, counts):
+            if count and cumulative + count >= rank:
+                return lower + (upper - lower) * (rank - cumulative) / count
+            cumulative += count
+            lower = upper
+        return self.buckets[-1]
+
+    def combine(self, current: list, other: list) -> list:
+        return [
+            [a + b for a, b in zip(current[0], other[0])],
+            current[1] + other[1],
+            current[2] + other[2],
+        ]
+
+    def render(self, values: dict[tuple, Any] | None = None) -> list[str]:
+        lines = self.header()
+        values = self._values if values is None else values
+        for key, (counts, total, count) in sorted(values.items()):
+            cumulative = 0
+            for bound, bucket_count in zip((*self.buckets, "+Inf"), counts):
+                cumulative += bucket_count
+                le = f'le="{bound}"'
+                lines.append(
+                    f"{self.name}_bucket{self._format_labels(key, le)} {cumulative}"
+                )
+            lines.append(f"{self.name}_sum{self._format_labels(key)} {total}")
+            lines.append(f"{self.name}_count{self._format_labels(key)} {count}")
+        return lines
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+REGISTRY: list[_Metric] = []
+
+
+def snapshot() -> dict[str, list]:
+    return {metric.name: metric.snapshot() for metric in REGISTRY}
+
+
+def render(snapshots: Iterable[dict[str, list]] = ()) -> str:
+    """
+    Render every registered metric in the Prometheus text exposition format.
+
+    Values from `snapshots` (other processes' `snapshot()` output) are added to
+    the local ones.
+    """
+    snapshots = list(snapshots)
+    lines: list[str] = []
+    for metric in REGISTRY:
+        lines.extend(metric.render(metric.merged(snapshots) if snapshots else None))
+    return "\n".join(lines) + "\n"
+
+
+def _worker_key() -> str:
+    return f"{WORKER_KEY_PREFIX}{socket.gethostname()}:{os.getpid()}"
+
+
+async def publish_forever(interval: float | None = None) -> None:
+    """
+    Periodically store this worker's snapshot in Redis for `render_shared`.
+
+    Snapshots expire after a few missed intervals, so a worker that died stops
+    being counted.
+    """
+    interval = interval or settings.METRICS_PUBLISH_INTERVAL
+    while True:
+        try:
+            await get_redis().set(
+                _worker_key(), json.dumps(snapshot()), ex=max(1, int(interval * 3))
+            )
+        except Exception as e:
+            log.warning(f"Failed to publish metrics: {e}")
+        await asyncio.sleep(interval)
+
+
+async def render_shared() -> str:
+    """
+    Render metrics summed over every worker that published to Redis.
+
+    Falls back to this worker's metrics alone when Redis is unavailable.
+    """
+    try:
+        redis = get_redis()
+        own_key = _worker_key()
+        keys = [
+            key
+            async for key in redis.scan_iter(match=f"{WORKER_KEY_PREFIX}*", count=100)
+            if key != own_key
+        ]
+        snapshots = (
+            [json.loads(value) for value in await redis.mget(keys) if value]
+            if keys
+            else []
+        )
+    except Exception as e:
+        log.warning(f"Failed to read metrics of other workers: {e}")
+        snapshots = []
+    return render(snapshots)
+
+
+HTTP_REQUEST_LATENCY = Histogram(
+    "chatbot_http_request_duration_seconds",
+    "HTTP request latency by endpoint handler and status code.",
+    ("method", "handler", "status"),
+)
+STAGE_LATENCY = Histogram(
+    "chatbot_stage_duration_seconds",
+    "Latency of individual pipeline stages (chat turn, rewrite, embedding, ...).",
+    ("stage",),
+)
+STAGE_ERRORS = Counter(
+    "chatbot_stage_errors_total",
+    "Exceptions raised out of a pipeline stage.",
+    ("stage",),
+)
+LLM_TOKENS = Counter(
+    "chatbot_llm_tokens_total",
+    "OpenAI tokens consumed, by model and kind (prompt, completion, cached_prompt).",
+    ("model", "kind"),
+)
+CACHE_REQUESTS = Counter(
+    "chatbot_cache_requests_total",
+    "Cache lookups by cache name and result (hit or miss).",
+    ("cache", "result"),
+)
+SINGLE_FLIGHT_CALLS = Counter(
+    "chatbot_single_flight_calls_total",
+    "Coalescable calls by call and result (leader ran it, coalesced shared it).",
+    ("call", "result"),
+)
+OPENAI_QUEUE_TIME = Histogram(
+    "chatbot_openai_queue_seconds",
+    "Time OpenAI calls waited for rate-limit capacity, by model and priority.",
+    ("model", "priority"),
+)
+OPENAI_RETRIES = Counter(
+    "chatbot_openai_retries_total",
+    "OpenAI calls retried, by model and reason (rate_limit, connection, ...).",
+    ("model", "reason"),
+)
+STAGE_CANCELLED = Counter(
+    "chatbot_stage_cancelled_total",
+    "Pipeline stages cancelled before they finished, e.g. on client disconnect.",
+    ("stage",),
+)
+WASTED_WORK_SECONDS = Counter(
+    "chatbot_wasted_work_seconds_total",
+    "Seconds spent in pipeline stages that were cancelled, by stage.",
+    ("stage",),
+)
+CLIENT_DISCONNECTS = Counter(
+    "chatbot_client_disconnects_total",
+    "Requests whose work was cancelled because the client disconnected.",
+    ("handler",),
+)
+HEDGE_LATENCY = Histogram(
+    "chatbot_hedge_attempt_seconds",
+    "Latency of hedgeable call attempts from admission, at least for cancelled ones; "
+    "hedging delays derive from it.",
+    ("call",),
+    buckets=HEDGE_BUCKETS,
+)
+HEDGED_REQUESTS = Counter(
+    "chatbot_hedged_requests_total",
+    "Hedged calls by call and the attempt that answered first (primary, hedge).",
+    ("call", "winner"),
+)
+DEGRADED_STAGES = Counter(
+    "chatbot_degraded_stages_total",
+    "Chat turn stages skipped because they ran out of their deadline.",
+    ("stage",),
+)
+CIRCUIT_STATE = Gauge(
+    "chatbot_circuit_state",
+    "Circuit breaker state per OpenAI model: 0 closed, 1 half-open, 2 open.",
+    ("breaker",),
+    aggregate="max",
+)
+CIRCUIT_TRANSITIONS = Counter(
+    "chatbot_circuit_transitions_total",
+    "Circuit breaker state changes, by the state entered.",
+    ("breaker", "state"),
+)
+CIRCUIT_REJECTED = Counter(
+    "chatbot_circuit_rejected_total",
+    "Calls refused without being made because their circuit was open.",
+    ("breaker",),
+)
+FALLBACK_COMPLETIONS = Counter(
+    "chatbot_fallback_completions_total",
+    "Chat completions sent to the fallback model while the primary's circuit was open.",
+    ("model",),
+)
+SHED_REQUESTS = Counter(
+    "chatbot_shed_requests_total",
+    "Requests refused with a 503 because no chat model was available.",
+    ("handler",),
+)
+MONGO_QUERY_LATENCY = Histogram(
+    "chatbot_mongo_query_seconds",
+    "MongoDB query latency by collection and operation.",
+    ("collection", "operation"),
+)
+
+
+@contextmanager
+def stage(name: str, **attributes: Any) -> Iterator[tracing.Span | None]:
+    """
+    Time a block as pipeline stage `name`.
+
+    Records the stage latency histogram and error counter, and opens a trace
+    span of the same name when a request trace is active. A stage that is
+    cancelled counts its time as wasted work instead.
+
+    Yields:
+        The stage span, or None outside of a request trace.
+    """
+    start = time.perf_counter()
+    with tracing.span(name, **attributes) as current:
+        try:
+            yield current
+        except asyncio.CancelledError:
+            STAGE_CANCELLED.inc(stage=name)
+            WASTED_WORK_SECONDS.inc(time.perf_counter() - start, stage=name)
+            raise
+        except Exception:
+            STAGE_ERRORS.inc(stage=name)
+            raise
+        finally:
+            STAGE_LATENCY.observe(time.perf_counter() - start, stage=name)
+
+
+def timed(name: str) -> Callable:
+    """
+    Run a coroutine function as pipeline stage `name` (see `stage`).
+
+    The wrapper keeps the wrapped signature visible through `__wrapped__`, so it
+    can be applied to FastAPI dependencies as well.
+    """
+
+    def decorator(func: Callable) -> Callable:
+        if not inspect.iscoroutinefunction(func):
+            raise TypeError(f"timed() expects a coroutine function, got {func!r}")
+
+        @functools.wraps(func)
+        async def wrapper(*args: Any, **kwargs: Any) -> Any:
+            with stage(name):
+                return await func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def record_cache(cache: str, hit: bool) -> None:
+    CACHE_REQUESTS.inc(cache=cache, result="hit" if hit else "miss")
+
+
+def record_llm_usage(model: str, usage: dict[str, Any] | None) -> None:
+    """
+    Count tokens from a LangChain `usage_metadata` dict.
+
+    Cached prompt tokens reported by OpenAI prompt caching are also recorded as a
+    cache lookup, so the prompt cache hit rate shows up next to the others.
+    """
+    if not usage:
+        return
+    LLM_TOKENS.inc(usage.get("input_tokens", 0), model=model, kind="prompt")
+    LLM_TOKENS.inc(usage.get("output_tokens", 0), model=model, kind="completion")
+    cached = (usage.get("input_token_details") or {}).get("cache_read") or 0
+    LLM_TOKENS.inc(cached, model=model, kind="cached_prompt")
+    record_cache("openai_prompt", cached > 0)
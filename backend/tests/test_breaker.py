@@ -0,0 +1,160 @@
+import asyncio
+
+import pytest
+from deadlines import Deadline
+from llm.breaker import CircuitBreaker, CircuitOpenError, CircuitState
+
+
+async def succeed(seconds: float = 0.0) -> str:
+    await asyncio.sleep(seconds)
+    return "ok"
+
+
+async def fail() -> str:
+    raise ConnectionError("down")
+
+
+async def record_failures(breaker: CircuitBreaker, count: int) -> None:
+    for _ in range(count):
+        with pytest.raises(ConnectionError):
+            await breaker.call(fail)
+
+
+def circuit(**options) -> CircuitBreaker:
+    options = {"min_calls": 4, "failure_rate": 0.5, "open_seconds": 0.05, **options}
+    return CircuitBreaker("test", **options)
+
+
+@pytest.mark.asyncio
+async def test_opens_once_enough_calls_failed():
+    breaker = circuit()
+    await breaker.call(succeed)
+    await record_failures(breaker, 2)
+    # 2 of 3 calls failed, but fewer than min_calls were made
+    assert breaker.state == CircuitState.CLOSED
+
+    await record_failures(breaker, 1)
+
+    assert breaker.state == CircuitState.OPEN
+    with pytest.raises(CircuitOpenError) as refused:
+        await breaker.call(succeed)
+    assert 0 < refused.value.retry_after <= 0.05
+
+
+@pytest.mark.asyncio
+async def test_errors_that_are_not_failures_keep_it_closed():
+    breaker = circuit(is_failure=lambda error: not isinstance(error, ConnectionError))
+
+    await record_failures(breaker, 5)
+
+    assert breaker.state == CircuitState.CLOSED
+
+
+@pytest.mark.asyncio
+async def test_half_open_probe_success_closes_it():
+    breaker = circuit()
+    await record_failures(breaker, 4)
+    await asyncio.sleep(0.06)
+
+    assert breaker.state == CircuitState.HALF_OPEN
+    assert await breaker.call(succeed) == "ok"
+    assert breaker.state == CircuitState.CLOSED
+
+
+@pytest.mark.asyncio
+async def test_half_open_probe_failure_opens_it_again():
+    breaker = circuit()
+    await record_failures(breaker, 4)
+    await asyncio.sleep(0.06)
+
+    await record_failures(breaker, 1)
+
+    assert breaker.state == CircuitState.OPEN
+    assert breaker.retry_after() > 0
+
+
+@pytest.mark.asyncio
+async def test_half_open_lets_only_the_probes_through():
+    breaker = circuit(probes=1)
+    await record_failures(breaker, 4)
+    await asyncio.sleep(0.06)
+    probe = asyncio.ensure_future(breaker.call(lambda: succeed(0.02)))
+    await asyncio.sleep(0)
+
+    with pytest.raises(CircuitOpenError):
+        await breaker.call(succeed)
+    assert await probe == "ok"
+    assert breaker.state == CircuitState.CLOSED
+
+
+@pytest.mark.asyncio
+async def test_slow_successful_calls_open_it():
+    breaker = circuit(slow_call=0.01)
+
+    for _ in range(4):
+        await breaker.call(lambda: succeed(0.02))
+
+    assert breaker.state == CircuitState.OPEN
+
+
+@pytest.mark.asyncio
+async def test_calls_with_their_own_slow_threshold_keep_it_closed():
+    # As chat completions do, with CHAT_COMPLETION_TIMEOUT
+    breaker = circuit(slow_call=0.01)
+
+    for _ in range(4):
+        await breaker.call(lambda: succeed(0.02), slow_call=1.0)
+
+    assert breaker.state == CircuitState.CLOSED
+
+
+@pytest.mark.asyncio
+async def test_calls_timed_out_by_their_caller_open_it():
+    breaker = circuit()
+
+    for _ in range(4):
+        # Started before the timeout, as chat completions do
+        deadline = Deadline(0.01)
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(
+                breaker.call(lambda: succeed(1.0), slow_call=1.0, deadline=deadline),
+                timeout=0.01,
+            )
+
+    assert breaker.state == CircuitState.OPEN
+
+
+@pytest.mark.asyncio
+async def test_calls_cancelled_before_their_deadline_are_not_counted():
+    breaker = circuit()
+
+    for _ in range(4):
+        call = asyncio.ensure_future(
+            breaker.call(lambda: succeed(1.0), deadline=Deadline(1.0))
+        )
+        await asyncio.sleep(0.01)
+        call.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await call
+    await record_failures(breaker, 3)
+
+    # The 3 failures are the only calls known, fewer than min_calls
+    assert breaker.state == CircuitState.CLOSED
+
+
+@pytest.mark.asyncio
+async def test_a_cancelled_probe_does_not_close_it():
+    breaker = circuit(probes=1)
+    await record_failures(breaker, 4)
+    await asyncio.sleep(0.06)
+    probe = asyncio.ensure_future(breaker.call(lambda: succeed(1.0)))
+    await asyncio.sleep(0.01)
+
+    probe.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await probe
+
+    assert breaker.state == CircuitState.HALF_OPEN
+    # The probe's place is free for the next call
+    assert await breaker.call(succeed) == "ok"
+    assert breaker.state == CircuitState.CLOSED
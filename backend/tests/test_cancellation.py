@@ -0,0 +1,99 @@
+import asyncio
+
+import pytest
+from cancellation import ClientDisconnected, cancel_on_disconnect
+from config import settings
+from metrics import CLIENT_DISCONNECTS
+from starlette.requests import Request
+
+
+def request(disconnect_after: float | None) -> Request:
+    """
+    A chat request whose client disconnects after `disconnect_after` seconds,
+    or never.
+    """
+    sent = False
+
+    async def receive() -> dict:
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {"type": "http.request", "body": b"{}", "more_body": False}
+        if disconnect_after is None:
+            await asyncio.Event().wait()
+        await asyncio.sleep(disconnect_after)
+        return {"type": "http.disconnect"}
+
+    scope = {
+        "type": "http",
+        "method": "POST",
+        "path": "/chatbot/chat",
+        "scheme": "http",
+        "server": ("testserver", 80),
+        "root_path": "",
+        "query_string": b"",
+        "headers": [],
+    }
+    return Request(scope, receive)
+
+
+class Work:
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        self.cleaned_up = False
+
+    async def run(self) -> str:
+        try:
+            await asyncio.sleep(self.seconds)
+        except asyncio.CancelledError:
+            await asyncio.sleep(0.01)  # e.g. removing the unanswered message
+            self.cleaned_up = True
+            raise
+        return "answer"
+
+
+@pytest.fixture(autouse=True)
+def cancel_on_disconnect_enabled(monkeypatch):
+    monkeypatch.setattr(settings, "CANCEL_ON_DISCONNECT", True)
+
+
+@pytest.mark.asyncio
+async def test_work_is_cancelled_and_cleaned_up_when_the_client_disconnects():
+    work = Work(1.0)
+    disconnects = CLIENT_DISCONNECTS.value(handler="")
+
+    with pytest.raises(ClientDisconnected) as disconnected:
+        await cancel_on_disconnect(request(disconnect_after=0.01), work.run())
+
+    assert disconnected.value.status_code == 499
+    assert work.cleaned_up
+    assert CLIENT_DISCONNECTS.value(handler="") == disconnects + 1
+
+
+@pytest.mark.asyncio
+async def test_work_finishing_first_returns_its_result():
+    work = Work(0.01)
+
+    result = await cancel_on_disconnect(request(disconnect_after=None), work.run())
+
+    assert result == "answer"
+
+
+@pytest.mark.asyncio
+async def test_errors_of_the_work_are_raised():
+    async def fail() -> str:
+        raise ValueError("no collection")
+
+    with pytest.raises(ValueError, match="no collection"):
+        await cancel_on_disconnect(request(disconnect_after=None), fail())
+
+
+@pytest.mark.asyncio
+async def test_disconnects_are_ignored_when_turned_off(monkeypatch):
+    monkeypatch.setattr(settings, "CANCEL_ON_DISCONNECT", False)
+    work = Work(0.05)
+
+    result = await cancel_on_disconnect(request(disconnect_after=0.0), work.run())
+
+    assert result == "answer"
+    assert not work.cleaned_up
@@ -0,0 +1,76 @@
+from chat.context import GAP, MIN_EXCERPT_TOKENS, ContextPacker
+from qdrant_client import models
+
+QUERY = "deductible of the silver plan"
+
+
+def packer(budget: int, excerpt_budget: int) -> ContextPacker:
+    packer = ContextPacker("gpt-4o", budget, excerpt_budget)
+    # One token per word keeps budgets easy to reason about
+    packer.count = lambda text: len(text.split())
+    return packer
+
+
+def point(number: int, score: float, excerpt: str) -> models.ScoredPoint:
+    return models.ScoredPoint(
+        id=number,
+        version=0,
+        score=score,
+        payload={"title": f"page {number}", "excerpt": excerpt},
+    )
+
+
+def filler(words: int, word: str = "coverage") -> str:
+    return " ".join([word] * words) + "."
+
+
+def test_excerpts_are_packed_best_first_within_the_budget():
+    points = [
+        point(1, 0.2, filler(60, "hospital")),
+        point(2, 0.9, filler(60, "pharmacy")),
+        point(3, 0.5, filler(60, "dental")),
+    ]
+
+    packed = packer(budget=150, excerpt_budget=100).pack(QUERY, points)
+
+    assert [p.id for p in packed.points] == [2, 3]
+    assert packed.lines[0].startswith("[1] title: page 2 content: pharmacy")
+    assert packed.tokens <= 150
+    assert packed.dropped == 1
+
+
+def test_overlapping_excerpts_are_packed_once():
+    text = "The silver plan has a deductible of 2500 dollars per member each year."
+    points = [point(1, 0.9, text), point(2, 0.8, f"{text} Copays apply after.")]
+
+    packed = packer(budget=500, excerpt_budget=100).pack(QUERY, points)
+
+    assert [p.id for p in packed.points] == [1]
+    assert packed.duplicates == 1
+
+
+def test_long_excerpts_keep_the_sentences_matching_the_query():
+    sentences = [
+        filler(30, "introduction"),
+        "The silver plan deductible is 2500 dollars.",
+        filler(30, "appendix"),
+    ]
+
+    packed = packer(budget=500, excerpt_budget=MIN_EXCERPT_TOKENS + 10).pack(
+        QUERY, [point(1, 0.9, " ".join(sentences))]
+    )
+
+    assert packed.trimmed == 1
+    (line,) = packed.lines
+    assert "silver plan deductible is 2500" in line
+    assert "introduction" not in line and "appendix" not in line
+    assert GAP.strip() in line
+
+
+def test_excerpts_are_dropped_once_too_little_budget_is_left():
+    points = [point(1, 0.9, filler(90)), point(2, 0.8, filler(90, "vision"))]
+
+    packed = packer(budget=100, excerpt_budget=100).pack(QUERY, points)
+
+    assert len(packed.lines) == 1
+    assert packed.dropped == 1
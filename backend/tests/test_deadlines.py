@@ -0,0 +1,98 @@
+import asyncio
+
+import pytest
+from config import settings
+from deadlines import admitted, hedged, queued
+from metrics import HEDGE_LATENCY, HEDGED_REQUESTS
+
+
+@pytest.fixture(autouse=True)
+def hedge_after_10ms(monkeypatch):
+    # Hedge from the first call, after HEDGE_MIN_DELAY_MS
+    monkeypatch.setattr(settings, "HEDGE_ENABLED", True)
+    monkeypatch.setattr(settings, "HEDGE_MIN_SAMPLES", 0)
+    monkeypatch.setattr(settings, "HEDGE_MIN_DELAY_MS", 10)
+
+
+class Upstream:
+    """
+    Call i waits `outcomes[i][0]` seconds, then returns or raises `outcomes[i][1]`.
+    """
+
+    def __init__(self, *outcomes: tuple[float, str | Exception]):
+        self.outcomes = list(outcomes)
+        self.calls = 0
+
+    async def call(self) -> str:
+        latency, outcome = self.outcomes[self.calls]
+        self.calls += 1
+        await asyncio.sleep(latency)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+
+@pytest.mark.asyncio
+async def test_hedge_answers_when_the_slow_first_attempt_fails():
+    upstream = Upstream((0.05, ConnectionError("primary")), (0.0, "hedge"))
+    won = HEDGED_REQUESTS.value(call="slow_failure", winner="hedge")
+
+    assert await hedged("slow_failure", upstream.call) == "hedge"
+    assert upstream.calls == 2
+    assert HEDGED_REQUESTS.value(call="slow_failure", winner="hedge") == won + 1
+
+
+@pytest.mark.asyncio
+async def test_hedge_waits_for_the_first_attempt_when_the_hedge_fails():
+    upstream = Upstream((0.05, "primary"), (0.0, ConnectionError("hedge")))
+
+    assert await hedged("hedge_failure", upstream.call) == "primary"
+
+
+@pytest.mark.asyncio
+async def test_error_is_raised_when_both_attempts_fail():
+    upstream = Upstream(
+        (0.05, ConnectionError("primary")), (0.0, ConnectionError("hedge"))
+    )
+
+    with pytest.raises(ConnectionError, match="hedge"):
+        await hedged("both_fail", upstream.call)
+
+
+@pytest.mark.asyncio
+async def test_a_fast_failure_is_raised_without_hedging():
+    upstream = Upstream((0.0, ConnectionError("primary")), (0.0, "hedge"))
+
+    with pytest.raises(ConnectionError, match="primary"):
+        await hedged("fast_failure", upstream.call)
+    assert upstream.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_cancelled_attempts_are_timed_as_lower_bounds():
+    upstream = Upstream((0.05, "primary"), (0.0, "hedge"))
+
+    assert await hedged("cancelled", upstream.call) == "hedge"
+    await asyncio.sleep(0)
+
+    # The hedge, and the primary cancelled after running past the delay
+    assert HEDGE_LATENCY.count(call="cancelled") == 2
+    assert HEDGE_LATENCY.quantile(1.0, call="cancelled") >= 0.01
+
+
+@pytest.mark.asyncio
+async def test_queueing_before_admission_does_not_start_the_hedge():
+    calls = 0
+
+    async def queued_call() -> str:
+        nonlocal calls
+        calls += 1
+        queued()
+        await asyncio.sleep(0.05)  # waiting for rate limit capacity
+        admitted()
+        await asyncio.sleep(0.005)
+        return "answer"
+
+    assert await hedged("queued", queued_call) == "answer"
+    assert calls == 1
+    assert HEDGE_LATENCY.quantile(1.0, call="queued") < 0.05
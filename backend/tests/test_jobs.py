@@ -0,0 +1,105 @@
+import asyncio
+
+import cache.client
+import fakeredis
+import pytest
+from vector_db import jobs
+from vector_db.schemas import DocumentProcessingStatus
+
+
+@pytest.fixture
+def redis(monkeypatch):
+    client = fakeredis.FakeAsyncRedis(decode_responses=True)
+    monkeypatch.setattr(cache.client, "_client", client)
+    return client
+
+
+async def ingest(points: int, seconds: float = 0.0) -> int:
+    await asyncio.sleep(seconds)
+    return points
+
+
+async def fail() -> int:
+    raise ValueError("not a PDF")
+
+
+@pytest.mark.asyncio
+async def test_new_job_is_pending(redis):
+    job_id = await jobs.create_job("report.pdf", "docs", "user-1")
+
+    job = await jobs.get_job(job_id)
+
+    assert job.status == DocumentProcessingStatus.PENDING
+    assert (job.filename, job.collection_name, job.user_id) == (
+        "report.pdf",
+        "docs",
+        "user-1",
+    )
+    assert await redis.ttl(f"{jobs.JOB_KEY_PREFIX}{job_id}") > 0
+
+
+@pytest.mark.asyncio
+async def test_unknown_job_is_none(redis):
+    assert await jobs.get_job("missing") is None
+
+
+@pytest.mark.asyncio
+async def test_tracked_job_is_done_with_its_points(redis):
+    job_id = await jobs.create_job("report.pdf", "docs", "user-1")
+
+    assert await jobs.track(job_id, ingest(12)) == 12
+
+    job = await jobs.get_job(job_id)
+    assert job.status == DocumentProcessingStatus.DONE
+    assert job.points == 12
+
+
+@pytest.mark.asyncio
+async def test_failed_job_records_the_error_and_raises(redis):
+    job_id = await jobs.create_job("report.pdf", "docs", "user-1")
+
+    with pytest.raises(ValueError):
+        await jobs.track(job_id, fail())
+
+    job = await jobs.get_job(job_id)
+    assert job.status == DocumentProcessingStatus.FAILED
+    assert job.error == "ValueError: not a PDF"
+
+
+@pytest.mark.asyncio
+async def test_ingestion_succeeds_while_redis_is_down(monkeypatch):
+    server = fakeredis.FakeServer()
+    server.connected = False
+    monkeypatch.setattr(
+        cache.client,
+        "_client",
+        fakeredis.FakeAsyncRedis(server=server, decode_responses=True),
+    )
+
+    job_id = await jobs.create_job("report.pdf", "docs", "user-1")
+
+    assert await jobs.track(job_id, ingest(3)) == 3
+
+
+@pytest.mark.asyncio
+async def test_drain_waits_for_background_jobs(redis):
+    job_id = await jobs.create_job("report.pdf", "docs", "user-1")
+    jobs.run_in_background(job_id, ingest(5, seconds=0.05))
+
+    await jobs.drain(timeout=1.0)
+
+    assert not jobs._background
+    assert (await jobs.get_job(job_id)).status == DocumentProcessingStatus.DONE
+
+
+@pytest.mark.asyncio
+async def test_drain_cancels_jobs_left_at_the_timeout(redis):
+    job_id = await jobs.create_job("report.pdf", "docs", "user-1")
+    jobs.run_in_background(job_id, ingest(5, seconds=10))
+
+    await jobs.drain(timeout=0.05)
+
+    assert not jobs._background
+    job = await jobs.get_job(job_id)
+    assert job.status == DocumentProcessingStatus.FAILED
+    assert job.error.startswith("CancelledError")
@@ -0,0 +1,74 @@
+import json
+
+import cache.client
+import fakeredis
+import metrics
+import pytest
+from metrics import WORKER_KEY_PREFIX, Counter, Gauge, Histogram
+
+REQUESTS = Counter("test_requests_total", "Requests.", ("route",))
+STATE = Gauge("test_state", "Worst state.", ("name",), aggregate="max")
+LATENCY = Histogram("test_latency_seconds", "Latency.", buckets=(0.1, 1.0))
+
+
+class RedisDown:
+    def __getattr__(self, name: str):
+        raise ConnectionError("Redis is down")
+
+
+@pytest.fixture
+def redis(monkeypatch):
+    client = fakeredis.FakeAsyncRedis(decode_responses=True)
+    monkeypatch.setattr(cache.client, "_client", client)
+    return client
+
+
+def other_worker() -> dict[str, list]:
+    return {
+        REQUESTS.name: [[["/chat"], 3], [["/ingest"], 1]],
+        STATE.name: [[["openai"], 2]],
+        LATENCY.name: [[[], [[1, 0, 0], 0.05, 1]]],
+    }
+
+
+def test_other_workers_values_are_combined():
+    REQUESTS.inc(2, route="/chat")
+    STATE.set(1, name="openai")
+    LATENCY.observe(0.5)
+
+    text = metrics.render([other_worker()])
+
+    assert 'test_requests_total{route="/chat"} 5' in text
+    assert 'test_requests_total{route="/ingest"} 1' in text
+    # States combine by max, not summed
+    assert 'test_state{name="openai"} 2' in text
+    assert 'test_latency_seconds_bucket{le="0.1"} 1' in text
+    assert 'test_latency_seconds_bucket{le="1.0"} 2' in text
+    assert "test_latency_seconds_count 2" in text
+
+
+@pytest.mark.asyncio
+async def test_render_shared_adds_published_workers(redis):
+    REQUESTS.inc(route="/shared")
+    await redis.set(
+        f"{WORKER_KEY_PREFIX}other:1",
+        json.dumps({REQUESTS.name: [[["/shared"], 4]]}),
+    )
+    # This worker's own snapshot is read from memory, not counted twice
+    await redis.set(metrics._worker_key(), json.dumps(metrics.snapshot()))
+
+    text = await metrics.render_shared()
+
+    local = REQUESTS.value(route="/shared")
+    assert f'test_requests_total{{route="/shared"}} {local + 4}' in text
+
+
+@pytest.mark.asyncio
+async def test_render_shared_falls_back_to_this_worker(monkeypatch):
+    monkeypatch.setattr(cache.client, "_client", RedisDown())
+    REQUESTS.inc(route="/alone")
+
+    text = await metrics.render_shared()
+
+    local = REQUESTS.value(route="/alone")
+    assert f'test_requests_total{{route="/alone"}} {local}' in text
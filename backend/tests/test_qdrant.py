@@ -0,0 +1,135 @@
+import asyncio
+from types import SimpleNamespace
+
+import cache.client
+import fakeredis
+import pytest
+from benchmarks.offline import OfflineQdrantUtils
+from qdrant_client import models
+from vector_db.qdrant import BULK_LOAD_KEY_PREFIX
+from vector_db.schemas import Document, SearchMode
+
+COLLECTION = "test"
+
+# The in-process Qdrant always searches exactly, and says so on every query
+pytestmark = pytest.mark.filterwarnings("ignore:Local mode performs exact")
+
+
+def document(utils: OfflineQdrantUtils, text: str, dimension: int) -> Document:
+    return Document(
+        id="00000000-0000-0000-0000-000000000001",
+        title="plan.pdf",
+        source="plan.pdf",
+        excerpt=text,
+        excerpt_page_number=1,
+        dense_vector=utils.embedder.embed_text(text, dimension),
+        metadata={},
+    )
+
+
+@pytest.mark.asyncio
+async def test_search_reads_the_layout_again_after_the_collection_is_recreated():
+    utils = OfflineQdrantUtils()
+    # Another worker, sharing the Qdrant server
+    other = OfflineQdrantUtils()
+    other.qdrant_client = utils.qdrant_client
+    text = "the deductible of the silver plan"
+    await utils.create_collection(COLLECTION)
+    await utils.add_document_to_collection(
+        COLLECTION, [document(utils, text, utils.embedder.dimension)]
+    )
+    assert await utils.search_documents(COLLECTION, text, mode=SearchMode.DENSE)
+
+    await other.delete_collection(COLLECTION)
+    await other.create_collection(COLLECTION, dimension=256)
+    await other.add_document_to_collection(COLLECTION, [document(other, text, 256)])
+
+    (point,) = await utils.search_documents(COLLECTION, text, mode=SearchMode.DENSE)
+    assert point.payload["excerpt"] == text
+    assert (await utils.collection_layout(COLLECTION)).dimension == 256
+
+
+class IndexingClient:
+    """
+    Stands in for Qdrant's collection settings, logging what happens when.
+    """
+
+    def __init__(self, events: list[str]):
+        self.threshold = 5000
+        self.events = events
+
+    async def get_collection(self, collection_name: str):
+        await asyncio.sleep(0.01)
+        return SimpleNamespace(
+            status=models.CollectionStatus.GREEN,
+            config=SimpleNamespace(
+                optimizer_config=SimpleNamespace(indexing_threshold=self.threshold)
+            ),
+        )
+
+    async def update_collection(self, collection_name: str, optimizers_config):
+        await asyncio.sleep(0.01)
+        self.threshold = optimizers_config.indexing_threshold
+        self.events.append(f"threshold {self.threshold}")
+
+
+class RedisDown:
+    def __getattr__(self, name: str):
+        raise ConnectionError("Redis is down")
+
+
+@pytest.fixture
+def redis(monkeypatch):
+    client = fakeredis.FakeAsyncRedis(decode_responses=True)
+    monkeypatch.setattr(cache.client, "_client", client)
+    return client
+
+
+@pytest.fixture
+def events() -> list[str]:
+    return []
+
+
+@pytest.fixture
+def utils(events) -> OfflineQdrantUtils:
+    utils = OfflineQdrantUtils()
+    utils.qdrant_client = IndexingClient(events)
+    return utils
+
+
+async def bulk_load(utils: OfflineQdrantUtils, events: list[str], name: str):
+    async with utils.bulk_load(COLLECTION):
+        events.append(f"{name} writes")
+        await asyncio.sleep(0.05)
+
+
+@pytest.mark.asyncio
+async def test_bulk_loads_write_once_indexing_is_off_and_restore_it_last(
+    redis, utils, events
+):
+    await asyncio.gather(*(bulk_load(utils, events, name) for name in "ab"))
+
+    assert events == ["threshold 0", "a writes", "b writes", "threshold 5000"]
+    state = await redis.hgetall(f"{BULK_LOAD_KEY_PREFIX}:{COLLECTION}")
+    assert state == {"loads": "0", "threshold": "5000"}
+
+
+@pytest.mark.asyncio
+async def test_bulk_loads_are_counted_per_worker_while_redis_is_down(
+    monkeypatch, utils, events
+):
+    monkeypatch.setattr(cache.client, "_client", RedisDown())
+
+    await asyncio.gather(*(bulk_load(utils, events, name) for name in "ab"))
+
+    assert events == ["threshold 0", "a writes", "b writes", "threshold 5000"]
+
+
+@pytest.mark.asyncio
+async def test_indexing_is_left_off_when_redis_fails_during_a_bulk_load(
+    monkeypatch, redis, utils, events
+):
+    async with utils.bulk_load(COLLECTION):
+        monkeypatch.setattr(cache.client, "_client", RedisDown())
+
+    assert events == ["threshold 0"]
@@ -0,0 +1,86 @@
+import cache.client
+import fakeredis
+import pytest
+from chat.rewriter import (
+    CachedRewriter,
+    KeywordRewriter,
+    LLMRewriter,
+    PassthroughRewriter,
+    build_query_rewriter,
+)
+
+
+class CountingRewriter:
+    name = "counting"
+
+    def __init__(self):
+        self.calls = 0
+
+    async def rewrite(self, query: str) -> str:
+        self.calls += 1
+        return query.upper()
+
+
+@pytest.fixture(autouse=True)
+def redis(monkeypatch):
+    monkeypatch.setattr(
+        cache.client, "_client", fakeredis.FakeAsyncRedis(decode_responses=True)
+    )
+
+
+@pytest.mark.asyncio
+async def test_keywords_keep_the_searchable_terms_in_order():
+    rewritten = await KeywordRewriter().rewrite(
+        "Can I get the America's Choice 2500 Gold plan with a heart condition?"
+    )
+
+    assert rewritten == "america choice 2500 gold plan heart condition"
+
+
+@pytest.mark.asyncio
+async def test_a_query_without_keywords_is_kept():
+    assert await KeywordRewriter().rewrite("Is it?") == "Is it?"
+
+
+@pytest.mark.asyncio
+async def test_repeated_queries_are_served_from_the_worker_cache():
+    inner = CountingRewriter()
+    rewriter = CachedRewriter(inner, size=10, ttl=None)
+
+    assert await rewriter.rewrite("silver plan") == "SILVER PLAN"
+    # Case and whitespace do not make a new query
+    assert await rewriter.rewrite("  Silver   PLAN ") == "SILVER PLAN"
+    assert inner.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_rewrites_are_shared_with_other_workers_through_redis():
+    inner = CountingRewriter()
+    await CachedRewriter(inner, size=10, ttl=None).rewrite("silver plan")
+
+    other_worker = CachedRewriter(inner, size=10, ttl=None)
+
+    assert await other_worker.rewrite("silver plan") == "SILVER PLAN"
+    assert inner.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_the_worker_cache_keeps_the_latest_queries():
+    inner = CountingRewriter()
+    rewriter = CachedRewriter(inner, size=2, ttl=None)
+
+    for query in ("gold", "silver", "bronze"):
+        await rewriter.rewrite(query)
+
+    assert list(rewriter.local) == ["silver", "bronze"]
+
+
+def test_strategies_build_their_rewriter():
+    assert isinstance(build_query_rewriter("none", "gpt-4o"), PassthroughRewriter)
+    assert isinstance(build_query_rewriter("keywords", "gpt-4o"), KeywordRewriter)
+    assert isinstance(build_query_rewriter("llm", "gpt-4o"), LLMRewriter)
+    cached = build_query_rewriter("llm", "gpt-4o-mini", cache=True)
+    assert isinstance(cached, CachedRewriter)
+    assert cached.name == "llm:gpt-4o-mini+cache"
+    with pytest.raises(ValueError, match="Unknown query rewrite strategy"):
+        build_query_rewriter("thesaurus", "gpt-4o")
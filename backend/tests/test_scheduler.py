@@ -0,0 +1,39 @@
+import fakeredis
+import pytest
+from llm.scheduler import _ACQUIRE, BURST_SECONDS, KEY_PREFIX, RateLimit, _LocalBucket
+
+# 600 tokens per minute: a one-second bucket holds 10 tokens
+LIMIT = RateLimit(requests_per_minute=0, tokens_per_minute=600)
+
+
+def test_local_bucket_charges_a_request_larger_than_its_burst():
+    bucket = _LocalBucket(LIMIT)
+
+    # A full bucket admits the large request, which leaves it 40 tokens in debt
+    assert bucket.acquire(50, reserve=0.0) == 0
+    assert bucket.tokens == pytest.approx(-40, abs=0.1)
+    # The next token is only available once the debt has been refilled
+    assert bucket.acquire(1, reserve=0.0) == pytest.approx(4.1, abs=0.01)
+
+
+def test_local_bucket_waits_for_a_full_bucket_before_a_large_request():
+    bucket = _LocalBucket(LIMIT)
+    assert bucket.acquire(5, reserve=0.0) == 0
+
+    assert bucket.acquire(50, reserve=0.0) == pytest.approx(0.5, abs=0.01)
+
+
+@pytest.mark.asyncio
+async def test_redis_bucket_charges_a_request_larger_than_its_burst():
+    redis = fakeredis.FakeAsyncRedis()
+    acquire = redis.register_script(_ACQUIRE)
+    keys = [f"{KEY_PREFIX}:gpt-4o", f"{KEY_PREFIX}:gpt-4o:pause"]
+
+    def args(cost: int) -> list:
+        return [*LIMIT, cost, 0.0, BURST_SECONDS * 1000]
+
+    assert await acquire(keys=keys, args=args(50)) == 0
+    assert float(await redis.hget(keys[0], "tokens")) == pytest.approx(-40, abs=1)
+    # Kept until the debt is refilled (4s), not just for the burst window
+    assert await redis.pttl(keys[0]) > 4000
+    assert await acquire(keys=keys, args=args(1)) == pytest.approx(4100, abs=100)
@@ -0,0 +1,44 @@
+import asyncio
+
+import pytest
+from cache.single_flight import SingleFlight
+
+
+class Upstream:
+    def __init__(self):
+        self.calls = 0
+
+    async def call(self) -> int:
+        self.calls += 1
+        call = self.calls
+        await asyncio.sleep(0.01)
+        return call
+
+
+@pytest.mark.asyncio
+async def test_overlapping_calls_with_the_same_key_share_one_call():
+    flight, upstream = SingleFlight("test"), Upstream()
+
+    results = await asyncio.gather(
+        *(flight.do("query", upstream.call) for _ in range(5)),
+        flight.do("other", upstream.call),
+    )
+
+    assert upstream.calls == 2
+    assert sorted(set(results)) == [1, 2]
+    # Nothing is kept once the call has finished
+    assert await flight.do("query", upstream.call) == 3
+
+
+@pytest.mark.asyncio
+async def test_a_cancelled_caller_leaves_the_call_to_the_others():
+    flight, upstream = SingleFlight("test"), Upstream()
+    first = asyncio.ensure_future(flight.do("query", upstream.call))
+    second = asyncio.ensure_future(flight.do("query", upstream.call))
+    await asyncio.sleep(0)
+
+    first.cancel()
+
+    assert await second == 1
+    assert first.cancelled()
+    assert upstream.calls == 1
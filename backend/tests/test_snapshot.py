@@ -0,0 +1,76 @@
+import gzip
+import json
+
+import pytest
+from benchmarks.offline import OfflineQdrantUtils
+from vector_db.qdrant import RagError
+from vector_db.schemas import Document
+from vector_db.snapshot import export_collection, import_collection
+
+pytestmark = pytest.mark.filterwarnings("ignore:Local mode performs exact")
+
+
+async def export_snapshot(tmp_path) -> tuple[OfflineQdrantUtils, str]:
+    utils = OfflineQdrantUtils()
+    await utils.create_collection("source")
+    await utils.add_document_to_collection(
+        "source",
+        [
+            Document(
+                id=f"00000000-0000-0000-0000-00000000000{number}",
+                title="plan.pdf",
+                source="plan.pdf",
+                excerpt=text,
+                excerpt_page_number=number,
+                dense_vector=utils.embedder.embed_text(text),
+                sparse_vector=await utils.create_sparse_vector([text]),
+                metadata={},
+            )
+            for number, text in enumerate(["silver plan", "gold plan"], start=1)
+        ],
+    )
+    # Named without .gz: compression is told from the content
+    path = str(tmp_path / "source.snapshot")
+    await export_collection(utils, "source", str(tmp_path / "source.jsonl.gz"))
+    (tmp_path / "source.jsonl.gz").rename(path)
+    return utils, path
+
+
+def rewrite_header(path: str, **changes) -> None:
+    with gzip.open(path, "rt") as file:
+        header, *points = file.readlines()
+    with gzip.open(path, "wt") as file:
+        file.write(json.dumps({**json.loads(header), **changes}) + "\n")
+        file.writelines(points)
+
+
+@pytest.mark.asyncio
+async def test_import_restores_the_points(tmp_path):
+    utils, path = await export_snapshot(tmp_path)
+
+    assert await import_collection(utils, path, "restored") == 2
+    assert (await utils.qdrant_client.count("restored")).count == 2
+
+
+@pytest.mark.asyncio
+async def test_import_rejects_a_snapshot_without_its_embedding_provider(tmp_path):
+    utils, path = await export_snapshot(tmp_path)
+    rewrite_header(path, embedding_provider=None)
+
+    with pytest.raises(RagError, match="does not record its embedding provider"):
+        await import_collection(utils, path, "restored")
+
+
+@pytest.mark.asyncio
+async def test_import_stops_when_the_collection_cannot_be_created(
+    tmp_path, monkeypatch
+):
+    utils, path = await export_snapshot(tmp_path)
+
+    async def create_collection(*args, **kwargs) -> bool:
+        return False
+
+    monkeypatch.setattr(utils, "create_collection", create_collection)
+
+    with pytest.raises(RagError, match="could not be created"):
+        await import_collection(utils, path, "restored")
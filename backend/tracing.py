@@ -0,0 +1,263 @@
+import asyncio
+import functools
+import inspect
+import json
+import logging
+import os
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Callable, Iterator
+
+from config import settings
+
+# Standard logging (not `from logger import logger`): the logger module installs
+# `TraceContextFilter` from here, so importing it back would be circular.
+log = logging.getLogger(__name__)
+
+_current_span: ContextVar["Span | None"] = ContextVar("current_span", default=None)
+
+# Keep references to in-flight export tasks so they are not garbage collected.
+_export_tasks: set[asyncio.Task] = set()
+
+
+@dataclass
+class Span:
+    name: str
+    trace_id: str
+    span_id: str = field(default_factory=lambda: os.urandom(8).hex())
+    parent_id: str | None = None
+    start_ns: int = field(default_factory=time.time_ns)
+    end_ns: int | None = None
+    attributes: dict[str, Any] = field(default_factory=dict)
+    error: str | None = None
+    children: list["Span"] = field(default_factory=list)
+
+    @property
+    def duration_ms(self) -> float:
+        end = self.end_ns or time.time_ns()
+        return (end - self.start_ns) / 1e6
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def walk(self) -> Iterator["Span"]:
+        yield self
+        for child in self.children:
+            yield from child.walk()
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "name": self.name,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start_ns": self.start_ns,
+            "duration_ms": round(self.duration_ms, 3),
+            "attributes": self.attributes,
+            "error": self.error,
+            "children": [child.to_dict() for child in self.children],
+        }
+
+
+class TraceContextFilter(logging.Filter):
+    """
+    Stamp log records with the active trace and span ids.
+
+    Must run on the caller side of the logging queue, where the context
+    variable is still visible.
+    """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        span = _current_span.get()
+        if span is not None:
+            record.trace_id = span.trace_id
+            record.span_id = span.span_id
+        return True
+
+
+def current_span() -> Span | None:
+    return _current_span.get()
+
+
+def current_trace_id() -> str | None:
+    span = _current_span.get()
+    return span.trace_id if span else None
+
+
+def _parse_traceparent(header: str | None) -> tuple[str | None, str | None]:
+    # W3C trace context: version-traceid-parentid-flags
+    if not header:
+        return None, None
+    parts = header.split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None, None
+    return parts[1], parts[2]
+
+
+def start_trace(name: str, traceparent: str | None = None, **attributes: Any) -> Span:
+    """
+    Open the root span of a new trace and make it current.
+
+    An incoming W3C `traceparent` header is honoured so traces can be joined
+    with an upstream caller.
+    """
+    trace_id, parent_id = _parse_traceparent(traceparent)
+    root = Span(
+        name=name,
+        trace_id=trace_id or uuid.uuid4().hex,
+        parent_id=parent_id,
+        attributes=attributes,
+    )
+    _current_span.set(root)
+    return root
+
+
+def finish_trace(root: Span) -> None:
+    """
+    Close the root span and export the span tree if the request was slow.
+    """
+    root.end_ns = time.time_ns()
+    _current_span.set(None)
+    if not settings.TRACE_ENABLED:
+        return
+    if root.duration_ms < settings.TRACE_SLOW_THRESHOLD_MS:
+        return
+    task = asyncio.get_running_loop().create_task(export_trace(root))
+    _export_tasks.add(task)
+    task.add_done_callback(_export_tasks.discard)
+
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Span | None]:
+    """
+    Record a child span of the current span.
+
+    Outside of a trace (scripts, benchmarks, background jobs) this is a no-op.
+
+    Yields:
+        The new span, or None when no trace is active.
+    """
+    parent = _current_span.get()
+    if parent is None or not settings.TRACE_ENABLED:
+        yield None
+        return
+
+    child = Span(
+        name=name,
+        trace_id=parent.trace_id,
+        parent_id=parent.span_id,
+        attributes=attributes,
+    )
+    # Siblings started from concurrent tasks share the parent; list.append is
+    # atomic, and the cap bounds memory for pathological fan-out.
+    if len(parent.children) < settings.TRACE_MAX_CHILDREN:
+        parent.children.append(child)
+    token = _current_span.set(child)
+    try:
+        yield child
+    except BaseException as e:
+        child.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        child.end_ns = time.time_ns()
+        _current_span.reset(token)
+
+
+def traced(name: str) -> Callable:
+    """
+    Run a coroutine function inside a span named `name`.
+    """
+
+    def decorator(func: Callable) -> Callable:
+        if not inspect.iscoroutinefunction(func):
+            raise TypeError(f"traced() expects a coroutine function, got {func!r}")
+
+        @functools.wraps(func)
+        async def wrapper(*args: Any, **kwargs: Any) -> Any:
+            with span(name):
+                return await func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def _otlp_value(value: Any) -> dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def to_otlp(root: Span) -> dict[str, Any]:
+    """
+    Convert a span tree into an OTLP/HTTP JSON `ExportTraceServiceRequest`.
+    """
+    spans = []
+    for item in root.walk():
+        spans.append({
+            "traceId": item.trace_id,
+            "spanId": item.span_id,
+            "parentSpanId": item.parent_id or "",
+            "name": item.name,
+            "kind": 2 if item is root else 1,  # SERVER for the root, else INTERNAL
+            "startTimeUnixNano": str(item.start_ns),
+            "endTimeUnixNano": str(item.end_ns or item.start_ns),
+            "attributes": [
+                {"key": key, "value": _otlp_value(value)}
+                for key, value in item.attributes.items()
+            ],
+            "status": {"code": 2, "message": item.error} if item.error else {"code": 1},
+        })
+    return {
+        "resourceSpans": [
+            {
+                "resource": {
+                    "attributes": [
+                        {
+                            "key": "service.name",
+                            "value": {"stringValue": settings.PROJECT_NAME},
+                        },
+                        {
+                            "key": "service.version",
+                            "value": {"stringValue": settings.APP_VERSION},
+                        },
+                    ]
+                },
+                "scopeSpans": [{"scope": {"name": "backend"}, "spans": spans}],
+            }
+        ]
+    }
+
+
+def _append_line(path: str, line: str) -> None:
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(line + "\n")
+
+
+async def export_trace(root: Span) -> None:
+    """
+    Ship a slow trace to the OTLP collector if configured, else to a JSONL file.
+    """
+    try:
+        if settings.TRACE_OTLP_ENDPOINT:
+            import httpx
+
+            async with httpx.AsyncClient(timeout=5) as client:
+                response = await client.post(
+                    settings.TRACE_OTLP_ENDPOINT, json=to_otlp(root)
+                )
+                response.raise_for_status()
+        else:
+            line = json.dumps(
+                {"trace_id": root.trace_id, **root.to_dict()}, default=repr
+            )
+            await asyncio.to_thread(_append_line, settings.TRACE_EXPORT_PATH, line)
+    except Exception as e:
+        log.warning(f"Failed to export trace {root.trace_id}: {e}")
@@ -0,0 +1,197 @@
+import asyncio
+import functools
+import math
+import os
+import re
+import zlib
+from typing import Protocol
+
+from config import settings
+from llm.clients import get_openai_client
+from llm.scheduler import estimate_tokens, get_scheduler
+from metrics import LLM_TOKENS
+
+_WORD = re.compile(r"\w+")
+
+
+class EmbeddingProvider(Protocol):
+    # Recorded in each collection's metadata, with the dimension: vectors from
+    # different providers are not comparable
+    name: str
+    # The full output size; `embed` can be asked for fewer dimensions when
+    # `shortens` is set
+    dimension: int
+    shortens: bool
+
+    async def embed(
+        self, texts: list[str], dimension: int | None = None
+    ) -> list[list[float]]: ...
+
+
+class OpenAIEmbeddingProvider:
+    """
+    Embed texts with the OpenAI embeddings API, in one request per call.
+
+    text-embedding-3 models return shortened vectors on request, which keeps
+    most of the retrieval quality at a fraction of the storage.
+    """
+
+    shortens = True
+
+    def __init__(self, model: str, dimension: int):
+        self.model = model
+        self.dimension = dimension
+        self.name = f"openai:{model}"
+
+    async def embed(
+        self, texts: list[str], dimension: int | None = None
+    ) -> list[list[float]]:
+        embedding = await get_scheduler().run(
+            self.model,
+            estimate_tokens(texts),
+            lambda: get_openai_client().embeddings.create(
+                input=texts, model=self.model, dimensions=dimension or self.dimension
+            ),
+        )
+        LLM_TOKENS.inc(embedding.usage.prompt_tokens, model=self.model, kind="prompt")
+        return [
+            item.embedding
+            for item in sorted(embedding.data, key=lambda item: item.index)
+        ]
+
+
+class LocalEmbeddingProvider:
+    """
+    Embed texts on the CPU with a sentence-embedding model exported to ONNX.
+
+    `model_path` is a directory with `model.onnx` and the Hugging Face
+    `tokenizer.json`, e.g. an export of `sentence-transformers/all-MiniLM-L6-v2`.
+    Token embeddings are mean-pooled and L2-normalised. Texts are encoded in
+    batches of `batch_size` in a worker thread, so the event loop keeps
+    serving, and no request leaves the host. Needs the optional `onnxruntime`
+    and `tokenizers` packages (`uv sync --group embeddings`), imported here
+    because onnxruntime's thread pools do not survive a fork.
+    """
+
+    shortens = False
+
+    def __init__(self, model_path: str, batch_size: int = 32, max_length: int = 256):
+        import onnxruntime
+        from tokenizers import Tokenizer
+
+        self.batch_size = batch_size
+        self.name = f"local:{os.path.basename(os.path.normpath(model_path))}"
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_path, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=max_length)
+        self.tokenizer.enable_padding()
+        options = onnxruntime.SessionOptions()
+        # gunicorn already runs a worker per core
+        options.intra_op_num_threads = 1
+        options.inter_op_num_threads = 1
+        self.session = onnxruntime.InferenceSession(
+            os.path.join(model_path, "model.onnx"),
+            sess_options=options,
+            providers=["CPUExecutionProvider"],
+        )
+        self.input_names = {
+            model_input.name for model_input in self.session.get_inputs()
+        }
+        self.dimension = len(self._embed_batch(["dimension probe"])[0])
+
+    def _embed_batch(self, texts: list[str]) -> list[list[float]]:
+        import numpy as np
+
+        encodings = self.tokenizer.encode_batch(texts)
+        mask = np.asarray(
+            [encoding.attention_mask for encoding in encodings], dtype=np.int64
+        )
+        inputs = {
+            "input_ids": np.asarray(
+                [encoding.ids for encoding in encodings], dtype=np.int64
+            ),
+            "attention_mask": mask,
+            "token_type_ids": np.asarray(
+                [encoding.type_ids for encoding in encodings], dtype=np.int64
+            ),
+        }
+        tokens = self.session.run(
+            None,
+            {name: value for name, value in inputs.items() if name in self.input_names},
+        )[0]
+        # Mean over the real (unpadded) tokens of each text
+        weights = mask[:, :, None].astype(tokens.dtype)
+        pooled = (tokens * weights).sum(axis=1) / np.clip(weights.sum(axis=1), 1, None)
+        norms = np.linalg.norm(pooled, axis=1, keepdims=True)
+        return (pooled / np.clip(norms, 1e-12, None)).tolist()
+
+    def _embed(self, texts: list[str]) -> list[list[float]]:
+        vectors: list[list[float]] = []
+        for start in range(0, len(texts), self.batch_size):
+            vectors.extend(self._embed_batch(texts[start : start + self.batch_size]))
+        return vectors
+
+    async def embed(
+        self, texts: list[str], dimension: int | None = None
+    ) -> list[list[float]]:
+        if dimension not in (None, self.dimension):
+            raise ValueError(f"{self.name} only embeds at dimension {self.dimension}")
+        return await asyncio.to_thread(self._embed, texts)
+
+
+class HashingEmbeddingProvider:
+    """
+    Deterministic, network-free embeddings for tests and benchmarks.
+
+    Character trigrams of each word are hashed into a fixed number of signed
+    buckets and the result is L2-normalised. Similar wording gives similar
+    vectors, which is enough to exercise the dense path and to compare runs,
+    but the absolute quality numbers say nothing about a real embedding model.
+    """
+
+    name = "hashing"
+    shortens = True
+
+    def __init__(self, dimension: int = 1536):
+        self.dimension = dimension
+
+    def embed_text(self, text: str, dimension: int | None = None) -> list[float]:
+        dimension = dimension or self.dimension
+        vector = [0.0] * dimension
+        for word in _WORD.findall(text.lower()):
+            padded = f"#{word}#"
+            for i in range(max(1, len(padded) - 2)):
+                digest = zlib.crc32(padded[i : i + 3].encode("utf-8"))
+                sign = 1.0 if digest & 0x80000000 else -1.0
+                vector[digest % dimension] += sign
+        norm = math.sqrt(sum(value * value for value in vector)) or 1.0
+        return [value / norm for value in vector]
+
+    async def embed(
+        self, texts: list[str], dimension: int | None = None
+    ) -> list[list[float]]:
+        return [self.embed_text(text, dimension) for text in texts]
+
+
+@functools.cache
+def get_embedding_provider(provider: str | None = None) -> EmbeddingProvider:
+    """
+    Return the process-wide provider (default `EMBEDDING_PROVIDER`): "openai",
+    "local" or "hashing".
+
+    Unlike the reranker there is no fallback: vectors from another provider
+    would not match the ones already indexed.
+    """
+    provider = provider or settings.EMBEDDING_PROVIDER
+    if provider == "openai":
+        return OpenAIEmbeddingProvider(
+            settings.EMBEDDING_MODEL, settings.EMBEDDING_DIMENSIONS
+        )
+    if provider == "local":
+        return LocalEmbeddingProvider(
+            settings.EMBEDDING_MODEL_PATH,
+            batch_size=settings.EMBEDDING_BATCH_SIZE,
+            max_length=settings.EMBEDDING_MAX_LENGTH,
+        )
+    if provider == "hashing":
+        return HashingEmbeddingProvider(settings.EMBEDDING_DIMENSIONS)
+    raise ValueError(f"Unknown embedding provider: {provider!r}")
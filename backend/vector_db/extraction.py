@@ -0,0 +1,106 @@
+import asyncio
+import functools
+import math
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from config import settings
+from vector_db.schemas import ExtractionMode
+
+
+def _extract(
+    content: bytes, mode: ExtractionMode, pages: list[int]
+) -> list[tuple[int, str]]:
+    """
+    Return `(page number, excerpt)` for the given 0-based `pages`.
+
+    Imported here, and run in a thread or a pool process, so neither pymupdf
+    nor pymupdf4llm (which can pull in onnxruntime) is loaded before a fork.
+    """
+    import pymupdf
+
+    doc = pymupdf.open(stream=content, filetype="pdf")
+    if mode == ExtractionMode.TEXT:
+        return [
+            (number + 1, " ".join(doc[number].get_text().split())) for number in pages
+        ]
+
+    import pymupdf4llm
+
+    chunks = pymupdf4llm.to_markdown(
+        doc,
+        pages=pages,
+        page_chunks=True,
+        extract_words=mode == ExtractionMode.WORDS,
+        show_progress=False,
+    )
+    return [
+        (
+            chunk["metadata"]["page"],  # type: ignore
+            " ".join(word[4] for word in chunk["words"])  # type: ignore
+            if mode == ExtractionMode.WORDS
+            else str(chunk["text"]).strip(),
+        )
+        for chunk in chunks
+    ]
+
+
+def _page_count(content: bytes) -> int:
+    import pymupdf
+
+    return pymupdf.open(stream=content, filetype="pdf").page_count
+
+
+@functools.cache
+def get_extraction_pool() -> ProcessPoolExecutor:
+    # Spawned, not forked: the worker runs threads (HTTP pools, logging) that
+    # a forked child would inherit in an unknown state
+    return ProcessPoolExecutor(
+        max_workers=settings.PDF_EXTRACTION_PROCESSES,
+        mp_context=multiprocessing.get_context("spawn"),
+    )
+
+
+def close_extraction_pool() -> None:
+    if get_extraction_pool.cache_info().currsize:
+        get_extraction_pool().shutdown(wait=False, cancel_futures=True)
+        get_extraction_pool.cache_clear()
+
+
+async def extract_pages(
+    content: bytes, mode: ExtractionMode | None = None
+) -> list[tuple[int, str]]:
+    """
+    Extract the text of every page of a PDF as `(page number, excerpt)`, in
+    page order, with `mode` (default `PDF_EXTRACTION_MODE`).
+
+    Documents of at least `PDF_EXTRACTION_MIN_PAGES` pages per process are
+    split into page ranges extracted in parallel by up to
+    `PDF_EXTRACTION_PROCESSES` pool processes; smaller ones, or all of them
+    when the pool is off, are extracted in one thread. Either way the event
+    loop keeps serving.
+    """
+    mode = mode or ExtractionMode(settings.PDF_EXTRACTION_MODE)
+    page_count = await asyncio.to_thread(_page_count, content)
+    parts = min(
+        settings.PDF_EXTRACTION_PROCESSES,
+        page_count // max(1, settings.PDF_EXTRACTION_MIN_PAGES),
+    )
+    if parts <= 1:
+        return await asyncio.to_thread(_extract, content, mode, list(range(page_count)))
+
+    size = math.ceil(page_count / parts)
+    loop = asyncio.get_running_loop()
+    results = await asyncio.gather(
+        *(
+            loop.run_in_executor(
+                get_extraction_pool(),
+                _extract,
+                content,
+                mode,
+                list(range(start, min(start + size, page_count))),
+            )
+            for start in range(0, page_count, size)
+        )
+    )
+    return [page for result in results for page in result]
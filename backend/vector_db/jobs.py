@@ -0,0 +1,117 @@
+import asyncio
+import traceback
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Coroutine
+
+from cache.client import get_redis
+from config import settings
+from logger import logger
+from redis.exceptions import RedisError
+from vector_db.schemas import DocumentProcessingStatus, IngestionJob
+
+JOB_KEY_PREFIX = "ingestion:job:"
+
+# Ingestion tasks running detached from a request, kept so they are not garbage
+# collected and can be drained on shutdown.
+_background: set[asyncio.Task] = set()
+
+
+def _key(job_id: str) -> str:
+    return f"{JOB_KEY_PREFIX}{job_id}"
+
+
+async def _save(job_id: str, fields: dict[str, Any]) -> None:
+    # Status is bookkeeping: a Redis outage must not fail the ingestion itself.
+    try:
+        async with get_redis().pipeline(transaction=False) as pipe:
+            pipe.hset(
+                _key(job_id),
+                mapping={k: str(v) for k, v in fields.items() if v is not None},
+            )
+            pipe.expire(_key(job_id), settings.INGESTION_JOB_TTL)
+            await pipe.execute()
+    except RedisError as e:
+        logger.warning(f"Could not record status of ingestion job {job_id}: {e}")
+
+
+async def create_job(filename: str, collection_name: str, user_id: str) -> str:
+    job_id = uuid.uuid4().hex
+    now = datetime.now(timezone.utc).isoformat()
+    await _save(
+        job_id,
+        {
+            "job_id": job_id,
+            "status": DocumentProcessingStatus.PENDING.value,
+            "filename": filename,
+            "collection_name": collection_name,
+            "user_id": user_id,
+            "created_at": now,
+            "updated_at": now,
+        },
+    )
+    return job_id
+
+
+async def set_status(
+    job_id: str, status: DocumentProcessingStatus, **fields: Any
+) -> None:
+    await _save(
+        job_id,
+        {
+            "status": status.value,
+            "updated_at": datetime.now(timezone.utc).isoformat(),
+            **fields,
+        },
+    )
+
+
+async def get_job(job_id: str) -> IngestionJob | None:
+    data = await get_redis().hgetall(_key(job_id))
+    return IngestionJob(**data) if data else None
+
+
+async def track(job_id: str, ingestion: Coroutine[Any, Any, int]) -> int:
+    """
+    Await `ingestion`, recording the job's progress in Redis.
+
+    Returns the number of points written.
+    """
+    await set_status(job_id, DocumentProcessingStatus.PROCESSING)
+    try:
+        points = await ingestion
+    except BaseException as e:
+        await set_status(
+            job_id, DocumentProcessingStatus.FAILED, error=f"{type(e).__name__}: {e}"
+        )
+        raise
+    await set_status(job_id, DocumentProcessingStatus.DONE, points=points)
+    return points
+
+
+async def _run_detached(job_id: str, ingestion: Coroutine[Any, Any, int]) -> None:
+    try:
+        await track(job_id, ingestion)
+    except Exception:
+        logger.error(f"Ingestion job {job_id} failed: {traceback.format_exc()}")
+
+
+def run_in_background(job_id: str, ingestion: Coroutine[Any, Any, int]) -> None:
+    task = asyncio.get_running_loop().create_task(_run_detached(job_id, ingestion))
+    _background.add(task)
+    task.add_done_callback(_background.discard)
+
+
+async def drain(timeout: float) -> None:
+    """
+    Wait for background ingestions to finish, cancelling any left at `timeout`.
+    """
+    if not _background:
+        return
+    logger.info(f"Waiting for {len(_background)} ingestion job(s) to finish")
+    _, pending = await asyncio.wait(set(_background), timeout=timeout)
+    for task in pending:
+        task.cancel()
+    if pending:
+        await asyncio.wait(pending)
+        logger.warning(f"Cancelled {len(pending)} unfinished ingestion job(s)")
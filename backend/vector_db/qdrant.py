@@ -1,34 +1,170 @@
-import os
+import asyncio
+import contextlib
+import functools
+import time
 import traceback
 import uuid
-from typing import Any
+from typing import Any, AsyncIterator
 
-import pymupdf
-import pymupdf4llm
+from cache.client import get_redis
+from cache.single_flight import SingleFlight
 from config import settings
+from deadlines import hedged
+from llm.scheduler import Priority, openai_priority
 from logger import logger
-from openai import AsyncOpenAI
+from metrics import stage, timed
 from qdrant_client import AsyncQdrantClient, models
-from scipy.sparse._matrix import spmatrix
-from sklearn.feature_extraction.text import TfidfVectorizer
-from vector_db.schemas import Document, UserId
+from vector_db.embeddings import EmbeddingProvider, get_embedding_provider
+from vector_db.extraction import extract_pages
+from vector_db.rerank import get_reranker, rerank
+from vector_db.schemas import (
+    DEFAULT_SEARCH_FIELDS,
+    Document,
+    ExtractionMode,
+    RerankMode,
+    SearchField,
+    SearchMode,
+    StorageProfileName,
+    UserId,
+)
+from vector_db.sparse import sparse_encoder
+from vector_db.storage import INDEXING_THRESHOLD_KB, STORAGE_PROFILES, CollectionLayout
 
 
 class RagError(Exception):
     """Base exception for RAG operations"""
 
 
+# Shared by every `QdrantUtils` of the worker, since some are built per request
+_embedding_flight = SingleFlight("embedding", settings.SINGLE_FLIGHT_ENABLED)
+_search_flight = SingleFlight("search", settings.SINGLE_FLIGHT_ENABLED)
+
+# Bulk loads in progress by collection, whether the first has switched
+# indexing off, and the indexing threshold to restore when the last one
+# finishes, in a Redis hash shared by all workers. A worker that dies during a
+# load leaves its count behind until the key expires.
+BULK_LOAD_KEY_PREFIX = "qdrant:bulk_load"
+BULK_LOAD_KEY_TTL = 24 * 3600
+# The same for this worker, used while Redis is unavailable
+_bulk_loads: dict[str, int] = {}
+_indexing_off: set[str] = set()
+_indexing_thresholds: dict[str, int] = {}
+# How long a bulk load waits for the one that started first to switch
+# indexing off
+BULK_LOAD_SWITCH_TIMEOUT = 10.0
+
+# Adds ARGV[1] (1 or -1) to the bulk loads of KEYS[1] and returns the count.
+# The "off" flag is cleared as a first load starts or the last one finishes,
+# so a new first load is never taken for one that has switched indexing off.
+_COUNT_BULK_LOAD = """
+local step = tonumber(ARGV[1])
+local loads = redis.call('HINCRBY', KEYS[1], 'loads', step)
+if loads <= 0 or (step > 0 and loads == 1) then
+    redis.call('HDEL', KEYS[1], 'off')
+end
+redis.call('EXPIRE', KEYS[1], ARGV[2])
+return loads
+"""
+
+
+async def _count_bulk_load(collection_name: str, step: int, shared: bool) -> int:
+    """
+    Add `step` to the bulk loads of the collection in progress and return the
+    new count: the count of all workers in Redis when `shared`, which raises
+    if Redis is unavailable, or else this worker's own.
+    """
+    if shared:
+        return int(
+            await get_redis().register_script(_COUNT_BULK_LOAD)(
+                keys=[f"{BULK_LOAD_KEY_PREFIX}:{collection_name}"],
+                args=[step, BULK_LOAD_KEY_TTL],
+            )
+        )
+    loads = _bulk_loads.get(collection_name, 0) + step
+    if loads <= 0 or (step > 0 and loads == 1):
+        _indexing_off.discard(collection_name)
+    if loads > 0:
+        _bulk_loads[collection_name] = loads
+    else:
+        _bulk_loads.pop(collection_name, None)
+    return loads
+
+
+async def _switched_indexing_off(collection_name: str, shared: bool) -> None:
+    if shared:
+        key = f"{BULK_LOAD_KEY_PREFIX}:{collection_name}"
+        await get_redis().hset(key, "off", 1)
+    else:
+        _indexing_off.add(collection_name)
+
+
+async def _wait_until_indexing_off(collection_name: str, shared: bool) -> None:
+    """
+    Wait until the first bulk load of the collection has switched indexing
+    off, for at most `BULK_LOAD_SWITCH_TIMEOUT` seconds; after that the load
+    goes on regardless.
+    """
+    key = f"{BULK_LOAD_KEY_PREFIX}:{collection_name}"
+    deadline = time.monotonic() + BULK_LOAD_SWITCH_TIMEOUT
+    delay = 0.01
+    while not (
+        await get_redis().hexists(key, "off")
+        if shared
+        else collection_name in _indexing_off
+    ):
+        if time.monotonic() >= deadline:
+            logger.warning(
+                f"Indexing of collection {collection_name} is not switched off "
+                "yet, bulk loading anyway"
+            )
+            return
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, 0.5)
+
+
+async def _save_indexing_threshold(
+    collection_name: str, threshold: int, shared: bool
+) -> None:
+    _indexing_thresholds[collection_name] = threshold
+    if shared:
+        key = f"{BULK_LOAD_KEY_PREFIX}:{collection_name}"
+        try:
+            await get_redis().hset(key, "threshold", threshold)
+        except Exception as e:
+            logger.warning(f"Indexing threshold of {collection_name} not shared: {e}")
+
+
+async def _saved_indexing_threshold(collection_name: str, shared: bool) -> int | None:
+    """
+    The threshold saved by the bulk load that switched indexing off; raises if
+    it is `shared` and Redis is unavailable.
+    """
+    if shared:
+        key = f"{BULK_LOAD_KEY_PREFIX}:{collection_name}"
+        threshold = await get_redis().hget(key, "threshold")
+        if threshold is not None:
+            return int(threshold)
+    return _indexing_thresholds.get(collection_name)
+
+
 # TODO: Add functionality for updating the existing collection
 class QdrantUtils:
     def __init__(self, url, api_key):
         self.url = url
         self.api_key = api_key
         self.qdrant_client = AsyncQdrantClient(url=url, api_key=api_key)
-        self.openai_client = AsyncOpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
+        # Layouts of the collections this worker has used, read once
+        self._layouts: dict[str, CollectionLayout] = {}
+
+    @functools.cached_property
+    def embedder(self) -> EmbeddingProvider:
+        # Resolved on first use: a local model is loaded in the worker
+        return get_embedding_provider()
 
     async def delete_collection(self, collection_name: str) -> bool:
         try:
             await self.qdrant_client.delete_collection(collection_name=collection_name)
+            self._layouts.pop(collection_name, None)
             return True
         except Exception as e:
             logger.error(f"Error deleting collection: {e}")
@@ -38,34 +174,50 @@ class QdrantUtils:
         self,
         collection_name: str,
         distance_strategy: str = "COSINE",
+        profile: StorageProfileName | None = None,
+        dimension: int | None = None,
     ) -> bool:
+        """
+        Create the collection unless it exists, returning whether it was created.
+
+        `profile` and `dimension` default to `QDRANT_STORAGE_PROFILE` and
+        `QDRANT_DENSE_DIMENSIONS`. Both are recorded in the collection's
+        metadata, with the embedding provider, so ingestion and search use them
+        for as long as the collection lives. Raises `RagError` for a dimension
+        the embedding provider cannot produce.
+        """
+        storage = STORAGE_PROFILES[
+            profile or StorageProfileName(settings.QDRANT_STORAGE_PROFILE)
+        ]
+        dimension = (
+            dimension or settings.QDRANT_DENSE_DIMENSIONS or self.embedder.dimension
+        )
+        if dimension != self.embedder.dimension and not (
+            self.embedder.shortens and dimension < self.embedder.dimension
+        ):
+            raise RagError(
+                f"{self.embedder.name} cannot embed at dimension {dimension} "
+                f"(full size {self.embedder.dimension})"
+            )
         try:
             if not await self.qdrant_client.collection_exists(collection_name):
-                hnsw_config = models.HnswConfigDiff(
-                    m=16,
-                    ef_construct=100,
-                    full_scan_threshold=10000,
-                    max_indexing_threads=0,
-                    on_disk=False,
-                )
-                dense_vector_params = models.VectorParams(
-                    size=1536,
-                    distance=getattr(models.Distance, distance_strategy),
-                )
-                sparse_vector_params = models.SparseVectorParams(
-                    index=models.SparseIndexParams(
-                        on_disk=False,
-                    )
-                )
                 await self.qdrant_client.create_collection(
                     collection_name=collection_name,
                     vectors_config={
-                        "dense_vector": dense_vector_params,
+                        "dense_vector": storage.vector_params(
+                            dimension, getattr(models.Distance, distance_strategy)
+                        ),
                     },
                     sparse_vectors_config={
-                        "sparse_vector": sparse_vector_params,
+                        "sparse_vector": storage.sparse_vector_params(),
+                    },
+                    hnsw_config=storage.hnsw_config(),
+                    quantization_config=storage.quantization_config(),
+                    metadata={
+                        "embedding_provider": self.embedder.name,
+                        "embedding_dimension": dimension,
+                        "storage_profile": storage.name.value,
                     },
-                    hnsw_config=hnsw_config,
                 )
                 return True
             return False
@@ -73,6 +225,7 @@ class QdrantUtils:
             logger.error(f"Error creating collection: {traceback.format_exc()}")
             return False
 
+    @timed("qdrant_upsert")
     async def add_document_to_collection(
         self, collection_name: str, documents: list[Document]
     ) -> bool:
@@ -110,77 +263,471 @@ class QdrantUtils:
             logger.error(f"Error adding documents: {e}")
             return False
 
+    @contextlib.asynccontextmanager
+    async def bulk_load(self, collection_name: str) -> AsyncIterator[None]:
+        """
+        Switch off HNSW indexing of the collection for the duration of the
+        block, then switch it back on and wait until the index is rebuilt.
+
+        Without an index every upsert is a cheap append, instead of Qdrant
+        re-indexing segments while points keep arriving. Points are searchable
+        throughout (by full scan) and fast to search once the block exits.
+        Nested and concurrent bulk loads share one switch, across workers
+        while Redis is up and per worker otherwise: the first to start
+        switches indexing off, the others wait until it has, and the last to
+        finish restores it and waits. If Redis fails during the load, the
+        others may still be loading, so indexing is left off.
+        """
+        try:
+            loads, shared = await _count_bulk_load(collection_name, 1, True), True
+        except Exception as e:
+            logger.warning(f"Counting bulk loads of {collection_name} per worker: {e}")
+            loads, shared = await _count_bulk_load(collection_name, 1, False), False
+        try:
+            if loads == 1:
+                info = await self.qdrant_client.get_collection(collection_name)
+                # A threshold of 0 is left by a bulk load that was interrupted,
+                # or is still restoring it
+                threshold = info.config.optimizer_config.indexing_threshold
+                if not threshold:
+                    with contextlib.suppress(Exception):
+                        threshold = await _saved_indexing_threshold(
+                            collection_name, shared
+                        )
+                threshold = threshold or INDEXING_THRESHOLD_KB
+                await _save_indexing_threshold(collection_name, threshold, shared)
+                await self.qdrant_client.update_collection(
+                    collection_name=collection_name,
+                    optimizers_config=models.OptimizersConfigDiff(indexing_threshold=0),
+                )
+                await _switched_indexing_off(collection_name, shared)
+                logger.info(f"Indexing of collection {collection_name} switched off")
+            else:
+                # The first bulk load may still be switching indexing off
+                await _wait_until_indexing_off(collection_name, shared)
+        except BaseException:
+            try:
+                await _count_bulk_load(collection_name, -1, shared)
+            except Exception as e:
+                logger.error(f"Bulk load of {collection_name} left counted: {e}")
+            raise
+        try:
+            yield
+        finally:
+            try:
+                loads = await _count_bulk_load(collection_name, -1, shared)
+                threshold = await _saved_indexing_threshold(collection_name, shared)
+            except Exception as e:
+                # Other workers may still be loading: better unindexed for now
+                # than indexed while they write
+                logger.error(
+                    f"Bulk loads of {collection_name} unknown, indexing left off: {e}"
+                )
+                loads, threshold = 1, None
+            if loads <= 0 and threshold:
+                await self.qdrant_client.update_collection(
+                    collection_name=collection_name,
+                    optimizers_config=models.OptimizersConfigDiff(
+                        indexing_threshold=threshold
+                    ),
+                )
+                await self.wait_until_indexed(collection_name)
+
+    @timed("qdrant_indexing")
+    async def wait_until_indexed(
+        self, collection_name: str, timeout: float | None = None
+    ) -> bool:
+        """
+        Wait until the collection's optimizers are idle (status green), for at
+        most `timeout` seconds (default `QDRANT_BULK_LOAD_TIMEOUT`). Returns
+        whether they finished in time.
+        """
+        deadline = time.monotonic() + (timeout or settings.QDRANT_BULK_LOAD_TIMEOUT)
+        delay = 0.05
+        while True:
+            info = await self.qdrant_client.get_collection(collection_name)
+            if info.status == models.CollectionStatus.GREEN:
+                return True
+            if time.monotonic() >= deadline:
+                logger.warning(
+                    f"Collection {collection_name} is still being indexed "
+                    f"(status {info.status.value})"
+                )
+                return False
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 1.0)
+
+    @timed("ingestion")
     async def document_ingestion(
         self,
         collection_name: str,
         filename: str,
         file_content: bytes,
         metadata: dict,
-    ):
-        # Open the PDF document from the byte stream
-        doc = pymupdf.open(stream=file_content, filetype="pdf")
-
-        # Process the PDF
-        pdf_data = pymupdf4llm.to_markdown(doc, page_chunks=True, extract_words=True)
-        documents = []
-        for page in pdf_data:
-            documents.append({
+        bulk_load: bool = False,
+        extraction_mode: ExtractionMode | None = None,
+    ) -> int:
+        """
+        Extract, embed and upsert the pages of a PDF; returns the points written.
+
+        Pages are extracted with `extraction_mode` (default
+        `PDF_EXTRACTION_MODE`, see `vector_db.extraction`). With `bulk_load`
+        the upsert runs in `bulk_load` mode: it returns once the collection is
+        indexed again.
+        """
+        with stage("extraction", mode=extraction_mode or settings.PDF_EXTRACTION_MODE):
+            pages = await extract_pages(file_content, extraction_mode)
+        documents = [
+            {
                 "source": filename,
                 "title": filename,
-                "excerpt": " ".join([word[4] for word in page["words"]]),  # type: ignore
-                "excerpt_page_number": page["metadata"]["page"],  # type: ignore
+                "excerpt": excerpt,
+                "excerpt_page_number": number,
                 "metadata": metadata,
-            })
-
-        # Create points for Qdrant
-        final_data = await self.create_point(documents)
+            }
+            for number, excerpt in pages
+        ]
 
         if not await self.qdrant_client.collection_exists(collection_name):
             await self.create_collection(collection_name=collection_name)
+        # Read again: the collection may have been recreated since it was cached
+        layout = await self.collection_layout(collection_name, refresh=True)
 
-        if final_data:
-            await self.add_document_to_collection(
+        # Create points for Qdrant. Their embedding calls yield to chat turns
+        # when the OpenAI rate limits are tight.
+        with openai_priority(Priority.BACKGROUND):
+            final_data = await self.create_point(documents, dimension=layout.dimension)
+
+        written = 0
+        async with (
+            self.bulk_load(collection_name) if bulk_load else contextlib.nullcontext()
+        ):
+            if final_data and await self.add_document_to_collection(
                 collection_name=collection_name, documents=final_data
-            )
+            ):
+                written = len(final_data)
         logger.info(f"File {filename} uploaded.")
+        return written
+
+    async def ingest_documents(
+        self,
+        collection_name: str,
+        files: list[tuple[str, bytes, dict]],
+        bulk_load: bool = True,
+        extraction_mode: ExtractionMode | None = None,
+    ) -> int:
+        """
+        Ingest `(filename, content, metadata)` PDFs one after the other, within
+        one bulk load by default. Returns the points written.
+        """
+        if not await self.qdrant_client.collection_exists(collection_name):
+            await self.create_collection(collection_name=collection_name)
+        written = 0
+        async with (
+            self.bulk_load(collection_name) if bulk_load else contextlib.nullcontext()
+        ):
+            for filename, content, metadata in files:
+                written += await self.document_ingestion(
+                    collection_name=collection_name,
+                    filename=filename,
+                    file_content=content,
+                    metadata=metadata,
+                    extraction_mode=extraction_mode,
+                )
+        return written
+
+    def _search_request(
+        self,
+        mode: SearchMode,
+        limit: int,
+        dense_vector: list[float] | None,
+        sparse_vector: models.SparseVector | None,
+        fields: list[str],
+        params: models.SearchParams,
+    ) -> models.QueryRequest:
+        # Only the payload keys the caller reads, and never the vectors
+        with_payload = models.PayloadSelectorInclude(include=fields)
+        if mode == SearchMode.DENSE:
+            return models.QueryRequest(
+                query=dense_vector,
+                using="dense_vector",
+                params=params,
+                limit=limit,
+                with_payload=with_payload,
+                with_vector=False,
+            )
+        if mode == SearchMode.SPARSE:
+            return models.QueryRequest(
+                query=sparse_vector,
+                using="sparse_vector",
+                params=params,
+                limit=limit,
+                with_payload=with_payload,
+                with_vector=False,
+            )
+        return models.QueryRequest(
+            prefetch=[
+                models.Prefetch(
+                    query=sparse_vector, using="sparse_vector", limit=limit
+                ),
+                models.Prefetch(query=dense_vector, using="dense_vector", limit=limit),
+            ],
+            query=models.FusionQuery(fusion=models.Fusion.DBSF),
+            # DBSF-normalized scores, so the threshold is comparable
+            score_threshold=0.5,
+            params=params,
+            limit=limit,
+            with_payload=with_payload,
+            with_vector=False,
+        )
 
-    # TODO: Check with adding diffrent filters
     async def search_documents(
         self,
         collection_name: str,
         query: str,
         k: int = 5,
+        mode: SearchMode = SearchMode.HYBRID,
+        rerank_mode: RerankMode | None = None,
+        fields: list[SearchField] | None = None,
     ) -> list[models.ScoredPoint]:
+        """
+        Search for one query. Identical searches already running in the worker
+        are joined rather than repeated; the points are shared between them.
+        """
+        key = (
+            self.url,
+            collection_name,
+            query,
+            k,
+            mode,
+            rerank_mode or settings.RERANK_MODE,
+            tuple(fields or DEFAULT_SEARCH_FIELDS),
+        )
+        (points,) = await _search_flight.do(
+            key,
+            lambda: self.search_documents_batch(
+                collection_name,
+                [query],
+                k=k,
+                mode=mode,
+                rerank_mode=rerank_mode,
+                fields=fields,
+            ),
+        )
+        return list(points)
+
+    # TODO: Check with adding diffrent filters
+    @timed("search")
+    async def search_documents_batch(
+        self,
+        collection_name: str,
+        queries: list[str],
+        k: int = 5,
+        mode: SearchMode = SearchMode.HYBRID,
+        rerank_mode: RerankMode | None = None,
+        fields: list[SearchField] | None = None,
+    ) -> list[list[models.ScoredPoint]]:
+        """
+        Search for every query with one embedding call and one Qdrant request.
+
+        Returns the points for each query, in the order of `queries`. Points
+        carry no vectors, and only the payload `fields` (default
+        `DEFAULT_SEARCH_FIELDS`).
+        """
+        search = functools.partial(
+            self._search_documents_batch,
+            collection_name,
+            queries,
+            k=k,
+            mode=mode,
+            rerank_mode=rerank_mode,
+            fields=fields,
+        )
         try:
-            response = await self.qdrant_client.query_points(
-                collection_name=collection_name,
-                prefetch=[
-                    models.Prefetch(
-                        query=await self.create_sparse_vector([query]),
-                        using="sparse_vector",
-                        limit=k,
-                    ),
-                    models.Prefetch(
-                        query=await self.create_embedding(query),
-                        using="dense_vector",
-                        limit=k,
-                    ),
-                ],
-                query=models.FusionQuery(fusion=models.Fusion.DBSF),
-                search_params=models.SearchParams(exact=True, hnsw_ef=128),
-                score_threshold=0.5,
-            )
-            return response.points
+            try:
+                return await search()
+            except Exception:
+                # The collection may have been recreated with another layout,
+                # by another worker or a snapshot import: search again if so
+                cached = self._layouts.get(collection_name)
+                if cached is None or cached == await self.collection_layout(
+                    collection_name, refresh=True
+                ):
+                    raise
+                logger.info(f"Layout of collection {collection_name} changed")
+                return await search()
         except Exception as e:
             logger.error(f"Error searching documents with Qdrant: {e}")
-            return []
+            return [[] for _ in queries]
+
+    async def _search_documents_batch(
+        self,
+        collection_name: str,
+        queries: list[str],
+        k: int = 5,
+        mode: SearchMode = SearchMode.HYBRID,
+        rerank_mode: RerankMode | None = None,
+        fields: list[SearchField] | None = None,
+    ) -> list[list[models.ScoredPoint]]:
+        layout = await self.collection_layout(collection_name)
+        # With a reranker, over-fetch candidates and let it pick the best k
+        reranker = get_reranker(rerank_mode)
+        limit = max(k, settings.RERANK_CANDIDATES) if reranker else k
+        keys = [field.value for field in fields or DEFAULT_SEARCH_FIELDS]
+        # The reranker scores the excerpt even when the caller skips it
+        fetched = keys
+        if reranker and SearchField.EXCERPT.value not in keys:
+            fetched = [*keys, SearchField.EXCERPT.value]
+        dense_vectors: list = [None] * len(queries)
+        sparse_vectors: list = [None] * len(queries)
+        if mode == SearchMode.DENSE:
+            dense_vectors = await self.create_embeddings(
+                queries, layout.dimension, hedge=True
+            )
+        elif mode == SearchMode.SPARSE:
+            sparse_vectors = await self.create_sparse_vectors(queries)
+        else:
+            sparse_vectors, dense_vectors = await asyncio.gather(
+                self.create_sparse_vectors(queries),
+                self.create_embeddings(queries, layout.dimension, hedge=True),
+            )
+        requests = [
+            self._search_request(
+                mode,
+                limit,
+                dense_vector,
+                sparse_vector,
+                fetched,
+                layout.profile.search_params(),
+            )
+            for dense_vector, sparse_vector in zip(dense_vectors, sparse_vectors)
+        ]
+        with stage(
+            "qdrant_query",
+            collection=collection_name,
+            k=limit,
+            mode=mode.value,
+            queries=len(queries),
+        ):
+            # Searches are idempotent: a slow one is sent again
+            responses = await hedged(
+                "qdrant_query",
+                lambda: self.qdrant_client.query_batch_points(
+                    collection_name=collection_name, requests=requests
+                ),
+            )
+        results = [response.points for response in responses]
+        if reranker is None:
+            return results
+        with stage("rerank", candidates=sum(map(len, results)), k=k):
+            results = list(
+                await asyncio.gather(
+                    *(
+                        rerank(reranker, query, points, k)
+                        for query, points in zip(queries, results)
+                    )
+                )
+            )
+        if fetched is keys:
+            return results
+        return [
+            [
+                point.model_copy(
+                    update={
+                        "payload": {
+                            key: value
+                            for key, value in (point.payload or {}).items()
+                            if key in keys
+                        }
+                    }
+                )
+                for point in points
+            ]
+            for points in results
+        ]
+
+    async def collection_layout(
+        self, collection_name: str, refresh: bool = False
+    ) -> CollectionLayout:
+        """
+        Return the embedding dimension and storage profile the collection was
+        created with, read from its metadata once per worker, or again with
+        `refresh`.
+
+        Raises `RagError` if the collection was built with another embedding
+        provider, or at a dimension this one cannot produce. Collections
+        created before the metadata was recorded are read as the in-memory
+        profile at their dense vector size.
+        """
+        layout = self._layouts.get(collection_name)
+        if layout is not None and not refresh:
+            return layout
+        self._layouts.pop(collection_name, None)
+        config = (await self.qdrant_client.get_collection(collection_name)).config
+        metadata = config.metadata or {}
+        vectors = config.params.vectors
+        dense = vectors.get("dense_vector") if isinstance(vectors, dict) else None
+        layout = CollectionLayout(
+            provider=metadata.get("embedding_provider"),
+            dimension=int(
+                metadata.get("embedding_dimension")
+                or (dense.size if dense else self.embedder.dimension)
+            ),
+            profile=STORAGE_PROFILES[
+                StorageProfileName(
+                    metadata.get("storage_profile") or StorageProfileName.MEMORY
+                )
+            ],
+        )
+        if (layout.provider and layout.provider != self.embedder.name) or (
+            layout.dimension > self.embedder.dimension
+            or (
+                layout.dimension < self.embedder.dimension
+                and not self.embedder.shortens
+            )
+        ):
+            raise RagError(
+                f"Collection {collection_name} holds {layout.provider or 'unknown'} "
+                f"embeddings of dimension {layout.dimension}, but the configured "
+                f"provider is {self.embedder.name} with dimension "
+                f"{self.embedder.dimension}"
+            )
+        self._layouts[collection_name] = layout
+        return layout
+
+    async def warm_up(self, collection_name: str) -> None:
+        """
+        Send one hybrid query shaped like `search_documents`, without encoding.
+
+        The client inspects every request model type the first time it sends
+        one; doing that here keeps it off the first user search. An embedding
+        provider mismatch is reported here too, before any search fails on it.
+        """
+        layout = await self.collection_layout(collection_name)
+        await self.qdrant_client.query_batch_points(
+            collection_name=collection_name,
+            requests=[
+                self._search_request(
+                    SearchMode.HYBRID,
+                    1,
+                    [1.0] * layout.dimension,
+                    models.SparseVector(indices=[0], values=[1.0]),
+                    [field.value for field in DEFAULT_SEARCH_FIELDS],
+                    layout.profile.search_params(),
+                )
+            ],
+        )
 
-    async def create_point(self, data: list[dict[str, Any]]) -> list[Document] | None:
+    async def create_point(
+        self, data: list[dict[str, Any]], dimension: int | None = None
+    ) -> list[Document] | None:
         try:
             documents = []
             for item in data:
                 if item["excerpt"]:
-                    dense_vector = await self.create_embedding(item["excerpt"])
+                    dense_vector = await self.create_embedding(
+                        item["excerpt"], dimension
+                    )
                     sparse_vector = await self.create_sparse_vector([item["excerpt"]])
 
                     document = Document(
@@ -199,29 +746,53 @@ class QdrantUtils:
             logger.error(f"Error creating point: {e}")
             return None
 
-    async def create_embedding(self, query: str) -> list[float]:
+    async def create_embedding(
+        self, query: str, dimension: int | None = None
+    ) -> list[float]:
+        # Identical texts embedded at the same time share one provider call
+        (embedding,) = await _embedding_flight.do(
+            (self.embedder.name, query, dimension),
+            lambda: self.create_embeddings([query], dimension),
+        )
+        return embedding
+
+    @timed("embedding")
+    async def create_embeddings(
+        self, texts: list[str], dimension: int | None = None, hedge: bool = False
+    ) -> list[list[float]]:
+        """
+        Embed many texts in one provider call; vectors come back in input order.
+
+        `dimension` is the collection's, when it stores shortened vectors.
+        With `hedge`, a slow provider call is sent once more (see `hedged`);
+        searches hedge, ingestion does not.
+        """
         try:
-            embedding = await self.openai_client.embeddings.create(
-                input=query, model="text-embedding-3-small", dimensions=1536
-            )
-            return embedding.data[0].embedding
+            if hedge:
+                return await hedged(
+                    "embedding", lambda: self.embedder.embed(texts, dimension)
+                )
+            return await self.embedder.embed(texts, dimension)
         except Exception as e:
-            logger.error(f"Error creating embedding: {e}")
-            return []
+            logger.error(f"Error creating embeddings: {e}")
+            return [[] for _ in texts]
 
+    @timed("sparse_vector")
+    async def create_sparse_vectors(
+        self, texts: list[str]
+    ) -> list[models.SparseVector | None]:
+        try:
+            return [sparse_encoder.encode(text) for text in texts]
+        except Exception as e:
+            logger.error(f"Error creating sparse vectors: {e}")
+            return [None for _ in texts]
+
+    @timed("sparse_vector")
     async def create_sparse_vector(
         self, corpus: list[str]
     ) -> models.SparseVector | None:
         try:
-            vectorizer = TfidfVectorizer(
-                lowercase=True,
-                max_features=10000,
-                stop_words="english",
-            )
-            sparse_matrix: spmatrix = vectorizer.fit_transform(corpus)
-            indices = sparse_matrix.indices.tolist()  # type: ignore
-            values = sparse_matrix.data.tolist()  # type: ignore
-            return models.SparseVector(indices=indices, values=values)
+            return sparse_encoder.encode(" ".join(corpus))
         except Exception as e:
             logger.error(f"Error creating sparse vector: {e}")
             return None
@@ -252,3 +823,14 @@ class QdrantUtils:
             raise ve
         except Exception as e:
             raise Exception(f"Failed to delete document: {e!s}")
+
+
+@functools.cache
+def get_qdrant_utils() -> QdrantUtils:
+    """
+    Return the worker's shared `QdrantUtils`.
+
+    Creating one opens new HTTP pools and makes a blocking version-check call to
+    Qdrant, so it is done once per process rather than per request.
+    """
+    return QdrantUtils(url=settings.QDRANT_URL, api_key=settings.QDRANT_API_KEY)
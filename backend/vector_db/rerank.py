@@ -0,0 +1,155 @@
+import asyncio
+import functools
+import math
+import os
+from collections import Counter
+from typing import Protocol
+
+from config import settings
+from logger import logger
+from qdrant_client import models
+from vector_db.schemas import RerankMode
+from vector_db.sparse import sparse_encoder
+
+
+class Reranker(Protocol):
+    def score(self, query: str, passages: list[str]) -> list[float]: ...
+
+
+class LexicalReranker:
+    """
+    Score passages with BM25 over the candidate set.
+
+    Uses the sparse encoder's tokenizer, so terms match what was indexed. IDF
+    comes from the candidates themselves: a term every candidate contains does
+    not help to order them.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+
+    def score(self, query: str, passages: list[str]) -> list[float]:
+        terms = set(sparse_encoder.tokenize(query))
+        documents = [Counter(sparse_encoder.tokenize(passage)) for passage in passages]
+        if not terms or not documents:
+            return [0.0] * len(passages)
+
+        lengths = [sum(document.values()) for document in documents]
+        average_length = sum(lengths) / len(lengths) or 1.0
+        idf = {}
+        for term in terms:
+            frequency = sum(term in document for document in documents)
+            idf[term] = math.log(
+                1 + (len(documents) - frequency + 0.5) / (frequency + 0.5)
+            )
+
+        scores = []
+        for document, length in zip(documents, lengths):
+            norm = self.k1 * (1 - self.b + self.b * length / average_length)
+            scores.append(
+                sum(
+                    idf[term] * document[term] * (self.k1 + 1) / (document[term] + norm)
+                    for term in terms
+                    if term in document
+                )
+            )
+        return scores
+
+
+class CrossEncoderReranker:
+    """
+    Score (query, passage) pairs with a cross-encoder exported to ONNX.
+
+    `model_path` is a directory with `model.onnx` and the Hugging Face
+    `tokenizer.json`, e.g. an export of `cross-encoder/ms-marco-MiniLM-L-6-v2`.
+    Needs the optional `onnxruntime` and `tokenizers` packages (`uv sync
+    --group rerank`). They are imported here rather than with the module,
+    because onnxruntime's thread pools do not survive a fork.
+    """
+
+    def __init__(self, model_path: str, batch_size: int = 16, max_length: int = 512):
+        import onnxruntime
+        from tokenizers import Tokenizer
+
+        self.batch_size = batch_size
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_path, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=max_length)
+        self.tokenizer.enable_padding()
+        options = onnxruntime.SessionOptions()
+        # gunicorn already runs a worker per core
+        options.intra_op_num_threads = 1
+        options.inter_op_num_threads = 1
+        self.session = onnxruntime.InferenceSession(
+            os.path.join(model_path, "model.onnx"),
+            sess_options=options,
+            providers=["CPUExecutionProvider"],
+        )
+        self.input_names = {
+            model_input.name for model_input in self.session.get_inputs()
+        }
+
+    def score(self, query: str, passages: list[str]) -> list[float]:
+        import numpy as np
+
+        scores: list[float] = []
+        for start in range(0, len(passages), self.batch_size):
+            batch = passages[start : start + self.batch_size]
+            encodings = self.tokenizer.encode_batch([(query, text) for text in batch])
+            inputs = {
+                "input_ids": [encoding.ids for encoding in encodings],
+                "attention_mask": [encoding.attention_mask for encoding in encodings],
+                "token_type_ids": [encoding.type_ids for encoding in encodings],
+            }
+            logits = self.session.run(
+                None,
+                {
+                    name: np.asarray(values, dtype=np.int64)
+                    for name, values in inputs.items()
+                    if name in self.input_names
+                },
+            )[0]
+            # Relevance models have one output logit; for two-class heads the
+            # last column is the "relevant" class.
+            scores.extend(logits.reshape(len(batch), -1)[:, -1].tolist())
+        return scores
+
+
+@functools.cache
+def get_reranker(mode: RerankMode | None = None) -> Reranker | None:
+    """
+    Return the process-wide reranker for `mode` (default `RERANK_MODE`).
+
+    Falls back to the lexical reranker if the cross-encoder cannot be loaded,
+    so a missing model degrades ranking quality instead of failing searches.
+    """
+    mode = mode or RerankMode(settings.RERANK_MODE)
+    if mode == RerankMode.CROSS_ENCODER:
+        try:
+            return CrossEncoderReranker(
+                settings.RERANK_MODEL_PATH,
+                batch_size=settings.RERANK_BATCH_SIZE,
+                max_length=settings.RERANK_MAX_LENGTH,
+            )
+        except Exception as e:
+            logger.error(f"Cross-encoder unavailable, reranking lexically: {e}")
+            return LexicalReranker()
+    if mode == RerankMode.LEXICAL:
+        return LexicalReranker()
+    return None
+
+
+async def rerank(
+    reranker: Reranker, query: str, points: list[models.ScoredPoint], k: int
+) -> list[models.ScoredPoint]:
+    """
+    Reorder candidate points by reranker score and keep the best `k`.
+
+    All candidates are scored in one call, in a worker thread so the event loop
+    keeps serving. The returned points carry the rerank score; ties keep the
+    retrieval order.
+    """
+    passages = [str((point.payload or {}).get("excerpt", "")) for point in points]
+    scores = await asyncio.to_thread(reranker.score, query, passages)
+    ranked = sorted(zip(scores, points), key=lambda pair: pair[0], reverse=True)
+    return [point.model_copy(update={"score": score}) for score, point in ranked[:k]]
@@ -1,25 +1,44 @@
 from auth.dependencies import valid_refresh_token
 from auth.schemas import ValidateRefreshTokenResponse
+from cancellation import cancel_on_disconnect
 from config import settings
-from fastapi import APIRouter, Body, Depends, File, HTTPException, UploadFile
+from fastapi import APIRouter, Body, Depends, File, HTTPException, Request, UploadFile
 from fastapi.responses import JSONResponse
 from logger import logger
-from vector_db.qdrant import QdrantUtils
-from vector_db.schemas import DocumentTypes, UserId
+from vector_db import jobs
+from vector_db.qdrant import QdrantUtils, RagError, get_qdrant_utils
+from vector_db.schemas import (
+    BatchSearchResponse,
+    DocumentTypes,
+    ExtractionMode,
+    IngestionJob,
+    RerankMode,
+    SearchField,
+    SearchMode,
+    SearchResponse,
+    SearchResult,
+    StorageProfileName,
+    UserId,
+)
 
 router = APIRouter()
-qdrant_client = QdrantUtils(url=settings.QDRANT_URL, api_key=settings.QDRANT_API_KEY)
 
 
 @router.post("/collection/create")
 async def create_collection(
     user: ValidateRefreshTokenResponse = Depends(valid_refresh_token),
+    qdrant_client: QdrantUtils = Depends(get_qdrant_utils),
     collection_name: str = Body(..., embed=True),
     distance_strategy: str = Body(default="COSINE", embed=True),
+    profile: StorageProfileName | None = Body(default=None, embed=True),
+    dimension: int | None = Body(default=None, embed=True, gt=0),
 ) -> JSONResponse:
     try:
         result = await qdrant_client.create_collection(
-            collection_name=collection_name, distance_strategy=distance_strategy
+            collection_name=collection_name,
+            distance_strategy=distance_strategy,
+            profile=profile,
+            dimension=dimension,
         )
         if result:
             return JSONResponse(
@@ -32,6 +51,8 @@ async def create_collection(
             content={"message": f"Collection {collection_name} already exists"},
             status_code=200,
         )
+    except RagError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error creating collection: {e}")
         raise HTTPException(
@@ -43,6 +64,7 @@ async def create_collection(
 async def delete_collection(
     collection_name: str,
     user: ValidateRefreshTokenResponse = Depends(valid_refresh_token),
+    qdrant_client: QdrantUtils = Depends(get_qdrant_utils),
 ) -> JSONResponse:
     try:
         result = await qdrant_client.delete_collection(collection_name=collection_name)
@@ -69,7 +91,11 @@ async def upload_document(
     collection_name: str = Body(default=settings.QDRANT_COLLECTION_NAME),
     document_type: DocumentTypes = Body(default=DocumentTypes.PROJECT_DOCUMENT),
     file: UploadFile = File(...),
+    wait: bool = Body(default=True),
+    bulk_load: bool = Body(default=False),
+    extraction_mode: ExtractionMode | None = Body(default=None),
     user: ValidateRefreshTokenResponse = Depends(valid_refresh_token),
+    qdrant_client: QdrantUtils = Depends(get_qdrant_utils),
 ) -> JSONResponse:
     try:
         if not str(file.filename).endswith(".pdf"):
@@ -83,15 +109,36 @@ async def upload_document(
             "file_name": file.filename,
         }
 
-        await qdrant_client.document_ingestion(
+        filename = str(file.filename) if file.filename else ""
+        job_id = await jobs.create_job(
+            filename=filename, collection_name=collection_name, user_id=user.user_id
+        )
+        ingestion = qdrant_client.document_ingestion(
             collection_name=collection_name,
-            filename=str(file.filename) if file.filename else "",
+            filename=filename,
             file_content=file_content,
             metadata=metadata,
+            bulk_load=bulk_load,
+            extraction_mode=extraction_mode,
         )
 
+        # Job status lives in Redis, so any worker can answer the status poll
+        if not wait:
+            jobs.run_in_background(job_id, ingestion)
+            return JSONResponse(
+                content={
+                    "message": f"Document {file.filename} accepted for processing",
+                    "job_id": job_id,
+                },
+                status_code=202,
+            )
+
+        await jobs.track(job_id, ingestion)
         return JSONResponse(
-            content={"message": f"Document {file.filename} uploaded successfully"},
+            content={
+                "message": f"Document {file.filename} uploaded successfully",
+                "job_id": job_id,
+            },
             status_code=201,
         )
     except Exception as e:
@@ -101,10 +148,100 @@ async def upload_document(
         )
 
 
+@router.post("/document/upload/batch")
+async def upload_documents(
+    collection_name: str = Body(default=settings.QDRANT_COLLECTION_NAME),
+    document_type: DocumentTypes = Body(default=DocumentTypes.PROJECT_DOCUMENT),
+    files: list[UploadFile] = File(...),
+    wait: bool = Body(default=True),
+    bulk_load: bool = Body(default=True),
+    extraction_mode: ExtractionMode | None = Body(default=None),
+    user: ValidateRefreshTokenResponse = Depends(valid_refresh_token),
+    qdrant_client: QdrantUtils = Depends(get_qdrant_utils),
+) -> JSONResponse:
+    """
+    Ingest several PDFs as one job, by default in bulk-load mode: indexing is
+    switched off until the last file is written, then rebuilt once.
+    """
+    try:
+        filenames = [str(file.filename or "") for file in files]
+        if not all(filename.endswith(".pdf") for filename in filenames):
+            raise HTTPException(status_code=400, detail="Only PDF files are supported")
+
+        documents = [
+            (
+                filename,
+                await file.read(),
+                {
+                    "document_id": filename,
+                    "user_id": user.user_id,
+                    "document_type": document_type.value,
+                    "file_name": filename,
+                },
+            )
+            for filename, file in zip(filenames, files)
+        ]
+        job_id = await jobs.create_job(
+            filename=", ".join(filenames),
+            collection_name=collection_name,
+            user_id=user.user_id,
+        )
+        ingestion = qdrant_client.ingest_documents(
+            collection_name=collection_name,
+            files=documents,
+            bulk_load=bulk_load,
+            extraction_mode=extraction_mode,
+        )
+
+        if not wait:
+            jobs.run_in_background(job_id, ingestion)
+            return JSONResponse(
+                content={
+                    "message": f"{len(files)} documents accepted for processing",
+                    "job_id": job_id,
+                },
+                status_code=202,
+            )
+
+        await jobs.track(job_id, ingestion)
+        return JSONResponse(
+            content={
+                "message": f"{len(files)} documents uploaded successfully",
+                "job_id": job_id,
+            },
+            status_code=201,
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error uploading documents: {e}")
+        raise HTTPException(
+            status_code=500, detail=f"Failed to upload documents: {str(e)}"
+        )
+
+
+@router.get("/document/jobs/{job_id}")
+async def get_ingestion_job(
+    job_id: str,
+    user: ValidateRefreshTokenResponse = Depends(valid_refresh_token),
+) -> IngestionJob:
+    try:
+        job = await jobs.get_job(job_id)
+    except Exception as e:
+        logger.error(f"Error fetching ingestion job: {e}")
+        raise HTTPException(
+            status_code=503, detail=f"Failed to fetch ingestion job: {str(e)}"
+        )
+    if job is None or job.user_id != user.user_id:
+        raise HTTPException(status_code=404, detail="Ingestion job not found")
+    return job
+
+
 @router.delete("/document/{document_id}")
 async def delete_document(
     document_id: str,
     user: ValidateRefreshTokenResponse = Depends(valid_refresh_token),
+    qdrant_client: QdrantUtils = Depends(get_qdrant_utils),
     collection_name: str = settings.QDRANT_COLLECTION_NAME,
 ) -> JSONResponse:
     try:
@@ -125,20 +262,80 @@ async def delete_document(
 
 
 # TODO: Update the function to perform proper search on the file (To Test the search), This is to test the Query search accuracy
+# Results are declared response models, so FastAPI serializes them straight to
+# JSON bytes in pydantic-core. `fields` picks the payload keys returned.
 @router.post("/search")
 async def search_documents(
+    request: Request,
     query: str = Body(..., embed=True),
     k: int = Body(default=5, embed=True),
     collection_name: str = Body(default=settings.QDRANT_COLLECTION_NAME, embed=True),
+    mode: SearchMode = Body(default=SearchMode.HYBRID, embed=True),
+    rerank: RerankMode | None = Body(default=None, embed=True),
+    fields: list[SearchField] | None = Body(default=None, embed=True),
     user: ValidateRefreshTokenResponse = Depends(valid_refresh_token),
-) -> JSONResponse:
+    qdrant_client: QdrantUtils = Depends(get_qdrant_utils),
+) -> SearchResponse:
     try:
-        results = await qdrant_client.search_documents(
-            collection_name=collection_name, query=query, k=k
+        results = await cancel_on_disconnect(
+            request,
+            qdrant_client.search_documents(
+                collection_name=collection_name,
+                query=query,
+                k=k,
+                mode=mode,
+                rerank_mode=rerank,
+                fields=fields,
+            ),
         )
-        return JSONResponse(
-            content={"results": [result.dict() for result in results]}, status_code=200
+        return SearchResponse(
+            results=[SearchResult.from_point(point) for point in results]
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error searching documents: {e}")
+        raise HTTPException(
+            status_code=500, detail=f"Failed to search documents: {str(e)}"
+        )
+
+
+@router.post("/search/batch")
+async def search_documents_batch(
+    request: Request,
+    queries: list[str] = Body(
+        ..., embed=True, min_length=1, max_length=settings.SEARCH_BATCH_MAX_QUERIES
+    ),
+    k: int = Body(default=5, embed=True),
+    collection_name: str = Body(default=settings.QDRANT_COLLECTION_NAME, embed=True),
+    mode: SearchMode = Body(default=SearchMode.HYBRID, embed=True),
+    rerank: RerankMode | None = Body(default=None, embed=True),
+    fields: list[SearchField] | None = Body(default=None, embed=True),
+    user: ValidateRefreshTokenResponse = Depends(valid_refresh_token),
+    qdrant_client: QdrantUtils = Depends(get_qdrant_utils),
+) -> BatchSearchResponse:
+    # One embedding call and one Qdrant request for the whole batch;
+    # results[i] holds the points for queries[i]
+    try:
+        results = await cancel_on_disconnect(
+            request,
+            qdrant_client.search_documents_batch(
+                collection_name=collection_name,
+                queries=queries,
+                k=k,
+                mode=mode,
+                rerank_mode=rerank,
+                fields=fields,
+            ),
+        )
+        return BatchSearchResponse(
+            results=[
+                [SearchResult.from_point(point) for point in points]
+                for points in results
+            ]
         )
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error searching documents: {e}")
         raise HTTPException(
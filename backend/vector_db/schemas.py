@@ -1,3 +1,4 @@
+from datetime import datetime
 from enum import Enum
 from typing import Any
 
@@ -14,6 +15,69 @@ class UserId(BaseModel):
     user_id: str
 
 
+class SearchMode(str, Enum):
+    DENSE = "dense"
+    SPARSE = "sparse"
+    HYBRID = "hybrid"
+
+
+class RerankMode(str, Enum):
+    NONE = "none"
+    LEXICAL = "lexical"
+    CROSS_ENCODER = "cross_encoder"
+
+
+class StorageProfileName(str, Enum):
+    MEMORY = "memory"
+    QUANTIZED = "quantized"
+    DISK = "disk"
+
+
+class ExtractionMode(str, Enum):
+    # Plain page text: fastest
+    TEXT = "text"
+    # The page's words through pymupdf4llm, as uploads always did
+    WORDS = "words"
+    # Layout-aware markdown, keeping tables and headings
+    MARKDOWN = "markdown"
+
+
+class SearchField(str, Enum):
+    SOURCE = "source"
+    TITLE = "title"
+    EXCERPT = "excerpt"
+    EXCERPT_PAGE_NUMBER = "excerpt_page_number"
+    METADATA = "metadata"
+
+
+# Payload returned by search unless the caller picks its own fields. Document
+# metadata is left out: no reader of search results needs it.
+DEFAULT_SEARCH_FIELDS = [
+    SearchField.SOURCE,
+    SearchField.TITLE,
+    SearchField.EXCERPT,
+    SearchField.EXCERPT_PAGE_NUMBER,
+]
+
+
+class SearchResult(BaseModel):
+    id: int | str
+    score: float
+    payload: dict[str, Any]
+
+    @classmethod
+    def from_point(cls, point: models.ScoredPoint) -> "SearchResult":
+        return cls(id=point.id, score=point.score, payload=point.payload or {})
+
+
+class SearchResponse(BaseModel):
+    results: list[SearchResult]
+
+
+class BatchSearchResponse(BaseModel):
+    results: list[list[SearchResult]]
+
+
 class DocumentProcessingStatus(str, Enum):
     PENDING = "Pending"
     PROCESSING = "Processing"
@@ -21,6 +85,18 @@ class DocumentProcessingStatus(str, Enum):
     FAILED = "Failed"
 
 
+class IngestionJob(BaseModel):
+    job_id: str
+    status: DocumentProcessingStatus
+    filename: str
+    collection_name: str
+    user_id: str
+    points: int | None = None
+    error: str | None = None
+    created_at: datetime
+    updated_at: datetime
+
+
 class Document(BaseModel):
     id: str
     source: str
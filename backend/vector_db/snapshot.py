@@ -0,0 +1,279 @@
+"""
+Export a collection to a local file and restore it, without re-embedding.
+
+A snapshot is JSON lines, gzip-compressed when exported to a `.gz` path: a
+header with the collection's layout (embedding provider and dimension,
+storage profile, distance) and the sparse encoder's settings, then one point
+per line with its vectors and payload. Restoring streams the file in batches
+inside a bulk load, so memory stays flat however large the collection is.
+
+Usage (from `backend/`):
+    python -m vector_db.snapshot export chatbot snapshots/chatbot.jsonl.gz
+    python -m vector_db.snapshot import snapshots/chatbot.jsonl.gz --collection chatbot
+"""
+
+import argparse
+import asyncio
+import gzip
+import json
+import os
+from datetime import datetime, timezone
+from typing import IO, Any
+
+from logger import logger
+from qdrant_client import models
+from vector_db.qdrant import QdrantUtils, RagError
+from vector_db.schemas import StorageProfileName
+from vector_db.sparse import sparse_encoder
+
+FORMAT = "rag-chatbot-collection"
+VERSION = 1
+BATCH_SIZE = 256
+
+
+def _open(path: str, mode: str, compressed: bool) -> IO[str]:
+    if compressed:
+        return gzip.open(path, f"{mode}t", encoding="utf-8", compresslevel=6)
+    return open(path, mode, encoding="utf-8")
+
+
+def _open_snapshot(path: str) -> IO[str]:
+    # gzip-compressed or not, whatever its name
+    with open(path, "rb") as file:
+        compressed = file.read(2) == b"\x1f\x8b"
+    return _open(path, "r", compressed)
+
+
+def _read_lines(file: IO[str], count: int) -> list[str]:
+    lines = []
+    for line in file:
+        if line.strip():
+            lines.append(line)
+            if len(lines) == count:
+                break
+    return lines
+
+
+def _sparse_settings() -> dict[str, Any]:
+    # Terms are hashed to indices, so there is no vocabulary to ship; the
+    # settings that decide the indices have to match instead. Qdrant computes
+    # IDF from the restored points.
+    return {
+        "hashing": "crc32",
+        "stop_words": sparse_encoder.stop_words,
+        "lowercase": sparse_encoder.lowercase,
+    }
+
+
+def _point_line(point: models.Record) -> str:
+    vectors = point.vector if isinstance(point.vector, dict) else {}
+    dense = vectors.get("dense_vector")
+    sparse = vectors.get("sparse_vector")
+    return json.dumps({
+        "id": point.id,
+        "dense_vector": dense,
+        "sparse_vector": (
+            {"indices": sparse.indices, "values": sparse.values}
+            if isinstance(sparse, models.SparseVector)
+            else None
+        ),
+        "payload": point.payload,
+    })
+
+
+def _points(lines: list[str]) -> models.Batch | list[models.PointStruct]:
+    """
+    Build the upsert for a batch of point lines, column-wise when every point
+    has both vectors. qdrant-client walks every float of a `PointStruct`
+    looking for inference objects, which costs more than the upsert itself; a
+    `Batch` is inspected once.
+    """
+    rows = [json.loads(line) for line in lines]
+    if all(row.get("dense_vector") and row.get("sparse_vector") for row in rows):
+        return models.Batch(
+            ids=[row["id"] for row in rows],
+            vectors={
+                "dense_vector": [row["dense_vector"] for row in rows],
+                "sparse_vector": [
+                    models.SparseVector(**row["sparse_vector"]) for row in rows
+                ],
+            },
+            payloads=[row["payload"] for row in rows],
+        )
+    points = []
+    for row in rows:
+        vector: dict[str, Any] = {}
+        if row.get("dense_vector"):
+            vector["dense_vector"] = row["dense_vector"]
+        if row.get("sparse_vector"):
+            vector["sparse_vector"] = models.SparseVector(**row["sparse_vector"])
+        points.append(
+            models.PointStruct(id=row["id"], vector=vector, payload=row["payload"])
+        )
+    return points
+
+
+async def export_collection(
+    utils: QdrantUtils, collection_name: str, path: str, batch_size: int = BATCH_SIZE
+) -> int:
+    """
+    Write the collection to `path`, page by page; returns the points written.
+    The file is written next to `path` and moved into place when complete.
+    """
+    # Read from the collection rather than through `collection_layout`, so a
+    # node configured with another embedding provider can still export it
+    info = await utils.qdrant_client.get_collection(collection_name)
+    metadata = info.config.metadata or {}
+    vectors = info.config.params.vectors
+    dense = vectors.get("dense_vector") if isinstance(vectors, dict) else None
+    if dense is None:
+        raise RagError(f"Collection {collection_name} has no dense vectors")
+    header = {
+        "format": FORMAT,
+        "version": VERSION,
+        "collection": collection_name,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "embedding_provider": metadata.get("embedding_provider"),
+        "embedding_dimension": dense.size,
+        "storage_profile": metadata.get("storage_profile")
+        or StorageProfileName.MEMORY.value,
+        "distance": dense.distance.value,
+        "sparse_encoder": _sparse_settings(),
+        "points": info.points_count,
+    }
+    if header["embedding_provider"] is None:
+        logger.warning(
+            f"Collection {collection_name} does not record its embedding "
+            "provider; its snapshot cannot be imported"
+        )
+    partial = f"{path}.partial"
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    written = 0
+    file = await asyncio.to_thread(_open, partial, "w", path.endswith(".gz"))
+    try:
+        await asyncio.to_thread(file.write, json.dumps(header) + "\n")
+        offset = None
+        while True:
+            points, offset = await utils.qdrant_client.scroll(
+                collection_name=collection_name,
+                limit=batch_size,
+                offset=offset,
+                with_payload=True,
+                with_vectors=True,
+            )
+            chunk = "".join(_point_line(point) + "\n" for point in points)
+            await asyncio.to_thread(file.write, chunk)
+            written += len(points)
+            if offset is None:
+                break
+    finally:
+        await asyncio.to_thread(file.close)
+    os.replace(partial, path)
+    logger.info(f"Exported {written} points of {collection_name} to {path}")
+    return written
+
+
+async def import_collection(
+    utils: QdrantUtils,
+    path: str,
+    collection_name: str | None = None,
+    overwrite: bool = False,
+    batch_size: int = BATCH_SIZE,
+) -> int:
+    """
+    Restore the snapshot at `path` into `collection_name` (default: the
+    exported collection's name), created with the snapshot's layout. Returns
+    the points written.
+
+    Raises `RagError` if the snapshot is not one, was encoded with another or
+    an unrecorded embedding provider or with another sparse encoder, or the
+    collection exists and `overwrite` is not set.
+    """
+    file = await asyncio.to_thread(_open_snapshot, path)
+    try:
+        (line,) = await asyncio.to_thread(_read_lines, file, 1) or [""]
+        header = json.loads(line or "{}")
+        if header.get("format") != FORMAT or header.get("version") != VERSION:
+            raise RagError(f"{path} is not a version {VERSION} collection snapshot")
+        if header["embedding_provider"] is None:
+            # Exported from a collection created before the provider was
+            # recorded: its vectors may not match this node's queries
+            raise RagError(
+                f"Snapshot does not record its embedding provider, so it cannot "
+                f"be checked against {utils.embedder.name}"
+            )
+        if header["embedding_provider"] != utils.embedder.name:
+            raise RagError(
+                f"Snapshot holds {header['embedding_provider']} embeddings, but "
+                f"the configured provider is {utils.embedder.name}"
+            )
+        if header["sparse_encoder"] != _sparse_settings():
+            raise RagError(
+                f"Snapshot sparse vectors were encoded with "
+                f"{header['sparse_encoder']}, not {_sparse_settings()}"
+            )
+
+        collection_name = collection_name or header["collection"]
+        if await utils.qdrant_client.collection_exists(collection_name):
+            if not overwrite:
+                raise RagError(f"Collection {collection_name} already exists")
+            await utils.delete_collection(collection_name)
+        if not await utils.create_collection(
+            collection_name,
+            distance_strategy=models.Distance(header["distance"]).name,
+            profile=StorageProfileName(header["storage_profile"]),
+            dimension=header["embedding_dimension"],
+        ):
+            raise RagError(
+                f"Collection {collection_name} could not be created, nothing "
+                "was imported"
+            )
+
+        written = 0
+        async with utils.bulk_load(collection_name):
+            while lines := await asyncio.to_thread(_read_lines, file, batch_size):
+                await utils.qdrant_client.upsert(
+                    collection_name=collection_name,
+                    points=_points(lines),
+                )
+                written += len(lines)
+    finally:
+        await asyncio.to_thread(file.close)
+    logger.info(f"Imported {written} points from {path} into {collection_name}")
+    return written
+
+
+async def main(args: argparse.Namespace) -> None:
+    from vector_db.qdrant import get_qdrant_utils
+
+    utils = get_qdrant_utils()
+    if args.command == "export":
+        points = await export_collection(
+            utils, args.collection, args.path, batch_size=args.batch_size
+        )
+    else:
+        points = await import_collection(
+            utils,
+            args.path,
+            collection_name=args.collection,
+            overwrite=args.overwrite,
+            batch_size=args.batch_size,
+        )
+    print(f"{args.command}: {points} points")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    commands = parser.add_subparsers(dest="command", required=True)
+    export_parser = commands.add_parser("export", help="collection -> file")
+    export_parser.add_argument("collection")
+    export_parser.add_argument("path", help="*.jsonl or *.jsonl.gz")
+    import_parser = commands.add_parser("import", help="file -> collection")
+    import_parser.add_argument("path")
+    import_parser.add_argument(
+        "--collection", default=None, help="default: as exported"
+    )
+    import_parser.add_argument("--overwrite", action="store_true")
+    for command in (export_parser, import_parser):
+        command.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    asyncio.run(main(parser.parse_args()))
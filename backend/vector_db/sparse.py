@@ -0,0 +1,57 @@
+import functools
+import math
+import zlib
+from collections import Counter
+from typing import Callable
+
+from qdrant_client import models
+
+# Sparse indices are u32 in Qdrant; keep them in the positive int32 range.
+INDEX_MASK = 0x7FFFFFFF
+
+
+class SparseEncoder:
+    """
+    Encode text as a term-frequency sparse vector with stable indices.
+
+    Each term is hashed to its index, so documents and queries encoded at
+    different times (or in different workers) share one index space without a
+    fitted vocabulary. Inverse document frequency is applied by Qdrant through
+    the `IDF` modifier on the collection's sparse vector.
+    """
+
+    def __init__(self, stop_words: str | None = "english", lowercase: bool = True):
+        self.stop_words = stop_words
+        self.lowercase = lowercase
+
+    @functools.cached_property
+    def _analyzer(self) -> Callable[[str], list[str]]:
+        # Reuse scikit-learn's tokenizer and stop-word list so tokens match what
+        # the TF-IDF setup produced. Imported on first use: scikit-learn pulls
+        # in scipy, which takes over a second to import.
+        from sklearn.feature_extraction.text import TfidfVectorizer
+
+        return TfidfVectorizer(
+            lowercase=self.lowercase, stop_words=self.stop_words
+        ).build_analyzer()
+
+    def tokenize(self, text: str) -> list[str]:
+        return self._analyzer(text)
+
+    @staticmethod
+    def term_index(term: str) -> int:
+        return zlib.crc32(term.encode("utf-8")) & INDEX_MASK
+
+    def encode(self, text: str) -> models.SparseVector:
+        weights: dict[int, float] = {}
+        for term, count in Counter(self.tokenize(text)).items():
+            index = self.term_index(term)
+            # Sublinear tf; colliding terms add up rather than overwrite.
+            weights[index] = weights.get(index, 0.0) + 1.0 + math.log(count)
+        indices = sorted(weights)
+        return models.SparseVector(
+            indices=indices, values=[weights[index] for index in indices]
+        )
+
+
+sparse_encoder = SparseEncoder()
@@ -0,0 +1,133 @@
+from dataclasses import dataclass
+
+from qdrant_client import models
+from vector_db.schemas import StorageProfileName
+
+# HNSW links per node (`m`); level 0 stores twice as many
+HNSW_M = 16
+# Bytes of one u32 link, and of one sparse entry (u32 term id + f32 weight)
+LINK_BYTES = 4
+SPARSE_ENTRY_BYTES = 8
+# Segment size (KB) above which Qdrant builds the HNSW index; its default.
+# Bulk loads set it to 0 (no indexing) and restore it afterwards.
+INDEXING_THRESHOLD_KB = 20000
+
+
+@dataclass(frozen=True)
+class StorageProfile:
+    """
+    Where a collection keeps its vectors and indexes, and how it is queried.
+
+    The profile is recorded in the collection's metadata when it is created,
+    and searches read it back from there.
+    """
+
+    name: StorageProfileName
+    # Dense vectors are memory-mapped from disk instead of held in RAM
+    vectors_on_disk: bool = False
+    hnsw_on_disk: bool = False
+    sparse_on_disk: bool = False
+    # int8 scalar-quantized copies of the dense vectors, kept in RAM. Queries
+    # search the copies and rescore an oversampled top with the originals.
+    quantized: bool = False
+    # Score every point against the originals instead of walking the index
+    exact: bool = True
+
+    def vector_params(self, dimension: int, distance: models.Distance):
+        return models.VectorParams(
+            size=dimension,
+            distance=distance,
+            on_disk=self.vectors_on_disk,
+        )
+
+    def hnsw_config(self) -> models.HnswConfigDiff:
+        return models.HnswConfigDiff(
+            m=HNSW_M,
+            ef_construct=100,
+            full_scan_threshold=10000,
+            max_indexing_threads=0,
+            on_disk=self.hnsw_on_disk,
+        )
+
+    def sparse_vector_params(self) -> models.SparseVectorParams:
+        return models.SparseVectorParams(
+            index=models.SparseIndexParams(on_disk=self.sparse_on_disk),
+            # Sparse vectors carry term frequencies; Qdrant applies IDF
+            modifier=models.Modifier.IDF,
+        )
+
+    def quantization_config(self) -> models.ScalarQuantization | None:
+        if not self.quantized:
+            return None
+        return models.ScalarQuantization(
+            scalar=models.ScalarQuantizationConfig(
+                type=models.ScalarType.INT8, quantile=0.99, always_ram=True
+            )
+        )
+
+    def search_params(self) -> models.SearchParams:
+        if not self.quantized:
+            return models.SearchParams(exact=self.exact, hnsw_ef=128)
+        return models.SearchParams(
+            exact=self.exact,
+            hnsw_ef=128,
+            quantization=models.QuantizationSearchParams(
+                rescore=True, oversampling=2.0
+            ),
+        )
+
+    def resident_bytes(self, points: int, dimension: int, sparse_terms: float) -> int:
+        """
+        Estimate the RAM the vectors and indexes of `points` chunks keep
+        resident. Memory-mapped data is left out: the OS pages it in and out
+        as queries touch it. Payloads and per-segment overhead are not counted.
+        """
+        total = 0
+        if not self.vectors_on_disk:
+            total += points * dimension * 4
+        if self.quantized:
+            total += points * dimension
+        if not self.hnsw_on_disk:
+            total += points * 2 * HNSW_M * LINK_BYTES
+        if not self.sparse_on_disk:
+            total += round(points * sparse_terms * SPARSE_ENTRY_BYTES)
+        return total
+
+
+STORAGE_PROFILES = {
+    profile.name: profile
+    for profile in (
+        # Everything in RAM, exact search: the smallest latency, and the
+        # corpus has to fit in memory
+        StorageProfile(StorageProfileName.MEMORY),
+        # Originals on disk, int8 copies and indexes in RAM: about a quarter
+        # of the memory, queries mostly stay in RAM
+        StorageProfile(
+            StorageProfileName.QUANTIZED,
+            vectors_on_disk=True,
+            quantized=True,
+            exact=False,
+        ),
+        # Only the int8 copies in RAM; the index and sparse lookups read disk
+        StorageProfile(
+            StorageProfileName.DISK,
+            vectors_on_disk=True,
+            hnsw_on_disk=True,
+            sparse_on_disk=True,
+            quantized=True,
+            exact=False,
+        ),
+    )
+}
+
+
+@dataclass(frozen=True)
+class CollectionLayout:
+    """
+    What a collection was created with, as recorded in its metadata.
+    """
+
+    # None for collections created before the provider was recorded
+    provider: str | None
+    dimension: int
+    profile: StorageProfile